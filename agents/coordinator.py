@@ -1,61 +1,120 @@
 """Coordinator Agent - Routes requests"""
-import google.generativeai as genai
 from config import Config
+from services.model_registry import model_registry
 from services.session_service import session_service
 from services.memory_bank import memory_bank
+from services.async_runner import run_sync, iterate_sync
+from services.intent_router import intent_router, INTENT_QUIZ, INTENT_PROGRESS
+from services.metrics import metrics, timed, agent_latency
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+routed = metrics.counter("routed_requests_total", "Requests routed by the coordinator", ("agent",))
+
+# intents with their own agent, everything else is explained by the teacher
+AGENTS = {INTENT_QUIZ: "quizzer", INTENT_PROGRESS: "memory"}
+
 class CoordinatorAgent:
     """Main orchestrator agent"""
     
     def __init__(self):
-        genai.configure(api_key=Config.GOOGLE_API_KEY)
-        self.model = genai.GenerativeModel(Config.MODEL_NAME)
         self.name = "Coordinator"
     
+    @property
+    def model(self):
+        """Shared model client, created on first use"""
+        return model_registry.get(Config.MODEL_NAME)
+    
     def route_request(self, student_id: str, message: str):
         """Route student request to appropriate agent"""
         logger.info(f"Routing request for {student_id}")
         
         session = session_service.get_or_create_session(student_id)
-        profile = memory_bank.get_student_profile(student_id)
+        # routing needs no quiz history, so the SQLite backend reads only the student row
+        profile = memory_bank.get_student_profile(student_id, include_history=False)
         
-        # simple routing logic
-        message_lower = message.lower()
-        
-        if any(word in message_lower for word in ["quiz", "test", "questions"]):
-            agent = "quizzer"
-        elif any(word in message_lower for word in ["progress", "stats", "how am i doing"]):
-            agent = "memory"
-        else:
-            agent = "teacher"
+        route = intent_router.classify(message)
+        agent = AGENTS.get(route.intent, "teacher")
         
         logger.info(f"Routed to {agent}")
+        routed.inc(agent=agent)
         
         return {
             "agent": agent,
             "session": session,
             "profile": profile,
-            "original_message": message
+            "original_message": message,
+            "route": route
         }
     
     def coordinate_response(self, student_id: str, message: str, 
                           teacher_agent, quizzer_agent, memory_agent) -> str:
         """Coordinate response from agents"""
-        routing_info = self.route_request(student_id, message)
+        return run_sync(self.coordinate_response_async(
+            student_id, message, teacher_agent, quizzer_agent, memory_agent
+        ))
+    
+    @timed(agent_latency, agent="coordinator", method="coordinate_response")
+    async def coordinate_response_async(self, student_id: str, message: str,
+                                        teacher_agent, quizzer_agent, memory_agent) -> str:
+        """Coordinate response from agents without blocking the event loop
+
+        Session and profile storage calls run in worker threads, as the
+        loop is shared by every student's request.
+        """
+        routing_info = await asyncio.to_thread(self.route_request, student_id, message)
         
         if routing_info["agent"] == "teacher":
-            response = teacher_agent.explain(message, routing_info)
+            response = await teacher_agent.explain_async(message, routing_info)
         elif routing_info["agent"] == "quizzer":
-            response = quizzer_agent.generate_quiz(message, routing_info)
+            response = await quizzer_agent.generate_quiz_async(message, routing_info)
         else:
-            response = memory_agent.get_progress(student_id)
-        
-        routing_info["session"].add_message("student", message)
-        routing_info["session"].add_message("assistant", response)
+            response = await asyncio.to_thread(memory_agent.get_progress, student_id)
         
+        await asyncio.to_thread(self._record_turn, routing_info["session"], message, response)
         return response
+    
+    def coordinate_response_stream(self, student_id: str, message: str,
+                                   teacher_agent, quizzer_agent, memory_agent):
+        """Yield the response in chunks as the routed agent produces it"""
+        return iterate_sync(self.coordinate_response_stream_async(
+            student_id, message, teacher_agent, quizzer_agent, memory_agent
+        ))
+    
+    @timed(agent_latency, agent="coordinator", method="coordinate_response_stream")
+    async def coordinate_response_stream_async(self, student_id: str, message: str,
+                                               teacher_agent, quizzer_agent, memory_agent):
+        """Async generator version of coordinate_response_stream"""
+        routing_info = await asyncio.to_thread(self.route_request, student_id, message)
+        
+        if routing_info["agent"] == "teacher":
+            chunks = teacher_agent.explain_stream_async(message, routing_info)
+        elif routing_info["agent"] == "quizzer":
+            chunks = quizzer_agent.generate_quiz_stream_async(message, routing_info)
+        else:
+            chunks = None
+        
+        parts = []
+        if chunks is None:
+            parts.append(await asyncio.to_thread(memory_agent.get_progress, student_id))
+            yield parts[0]
+        else:
+            async for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+        
+        await asyncio.to_thread(self._record_turn, routing_info["session"], message, "".join(parts))
+    
+    def _record_turn(self, session, message: str, response: str):
+        """Add the exchange to the student's session and save it"""
+        def change(current):
+            # current is a reloaded copy when another worker saved the session meanwhile
+            current.current_topic = session.current_topic
+            current.add_message("student", message)
+            current.add_message("assistant", response)
+        
+        session_service.update(session.student_id, change)
 
 coordinator = CoordinatorAgent()
\ No newline at end of file
@@ -1,6 +1,8 @@
 """Memory Agent - Tracks progress"""
 from services.memory_bank import memory_bank
+from services.metrics import timed, agent_latency, errors
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -10,25 +12,50 @@ class MemoryAgent:
     def __init__(self):
         self.name = "Memory"
     
+    @timed(agent_latency, agent="memory", method="get_progress")
     def get_progress(self, student_id: str) -> str:
         """Get progress report"""
         logger.info(f"Getting progress for {student_id}")
         
         try:
-            summary = memory_bank.get_progress_summary(student_id)
-            profile = memory_bank.get_student_profile(student_id)
-            
-            # add recent quizzes
-            recent = profile.get("quiz_history", [])[-3:]
-            if recent:
-                summary += "\n\n**Recent Quizzes:**\n"
-                for quiz in recent:
-                    summary += f"• {quiz['topic']}: {quiz['score']*100:.0f}%\n"
-            
-            return summary
+            report = memory_bank.cached_render(
+                student_id, "progress_report", lambda: self._render_progress(student_id)
+            )
+            # due times move with the clock, so they are never cached
+            reviews = self._render_reviews(student_id)
+            return report.rstrip() + reviews if reviews else report
             
         except Exception as e:
             logger.error(f"Error: {e}")
+            errors.inc(component="memory")
             return "Unable to retrieve progress."
+    
+    def _render_progress(self, student_id: str) -> str:
+        """Build the progress report text"""
+        summary = memory_bank.get_progress_summary(student_id)
+        
+        # add recent quizzes
+        recent = memory_bank.get_recent_quizzes(student_id, 3)
+        if recent:
+            summary += "\n\n**Recent Quizzes:**\n"
+            for quiz in recent:
+                summary += f"• {quiz['topic']}: {quiz['score']*100:.0f}%\n"
+        
+        return summary
+    
+    def _render_reviews(self, student_id: str) -> str:
+        """Upcoming spaced-repetition reviews"""
+        if memory_bank.reviews is None:
+            return ""
+        upcoming = memory_bank.reviews.next_reviews(student_id, 3)
+        if not upcoming:
+            return ""
+        now = time.time()
+        lines = "\n\n**Next Reviews:**\n"
+        for topic, due in upcoming:
+            days = max(1, round((due - now) / 86400))
+            when = "due now" if due <= now else f"in {days} day{'s' if days > 1 else ''}"
+            lines += f"• {topic}: {when}\n"
+        return lines
 
 memory_agent = MemoryAgent()
\ No newline at end of file
@@ -1,9 +1,18 @@
 """Quizzer Agent - Generates quizzes"""
-import google.generativeai as genai
 from config import Config
+from services.model_registry import model_registry
 from services.memory_bank import memory_bank
+from services.llm_service import llm_service
+from services.llm_scheduler import CircuitOpenError, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from services.quiz_pool import quiz_pool
+from services.session_service import session_service
+from services.quiz import Quiz, QuizStreamParser, QUIZ_GENERATION_CONFIG
+from services.async_runner import run_sync, iterate_sync
+from services.metrics import timed, agent_latency, errors
+from services.intent_router import intent_router
+from services.topic_index import topic_index
+import asyncio
 import logging
-import re
 
 logger = logging.getLogger(__name__)
 
@@ -11,89 +20,184 @@ class QuizzerAgent:
     """Creates and evaluates quizzes"""
     
     def __init__(self):
-        genai.configure(api_key=Config.GOOGLE_API_KEY)
-        self.model = genai.GenerativeModel(Config.MODEL_NAME)
         self.name = "Quizzer"
     
-    def generate_quiz(self, request: str, context: dict) -> str:
-        """Generate quiz questions"""
-        logger.info(f"Generating quiz")
-        
-        # Extract topic from request
-        topic = self._extract_topic(request)
-        if not topic:
-            topic = context["session"].current_topic or "general knowledge"
-        
-        # Update session topic
-        context["session"].current_topic = topic
+    @property
+    def model(self):
+        """Shared model client asked for JSON quizzes, created on first use"""
+        return model_registry.get(Config.MODEL_NAME, QUIZ_GENERATION_CONFIG)
+    
+    def generate_quiz(self, request: str, context: dict, fresh: bool = False) -> str:
+        """Generate quiz questions, fresh=True bypasses the response cache and pool"""
+        return run_sync(self.generate_quiz_async(request, context, fresh=fresh))
+    
+    @timed(agent_latency, agent="quizzer", method="generate_quiz")
+    async def generate_quiz_async(self, request: str, context: dict, fresh: bool = False) -> str:
+        """Generate quiz questions without blocking the event loop"""
+        logger.info("Generating quiz")
         
-        prompt = f"""Create a quiz on: {topic}
-
-Generate exactly 5 multiple-choice questions. Format:
-
-Q1: [Question]
-A) [Option A]
-B) [Option B]
-C) [Option C]
-D) [Option D]
-Correct: [A/B/C/D]
-
-Make questions test understanding."""
+        # topic lookups and the pool may touch disk, so they run off the event loop
+        topic = await asyncio.to_thread(self._resolve_topic, request, context)
+        student_id = context["session"].student_id
 
         try:
-            response = self.model.generate_content(prompt)
-            quiz_text = response.text
-            
-            # store quiz
-            context["session"].context["current_quiz"] = {
-                "topic": topic,
-                "quiz_text": quiz_text
-            }
+            quiz = await asyncio.to_thread(self._take_pooled_quiz, topic, student_id, fresh)
+            if quiz is None:
+                quiz = await self._create_quiz(topic, fresh=fresh)
+                if Config.QUIZ_POOL_ENABLED and not fresh and await asyncio.to_thread(
+                        quiz_pool.has_seen, student_id, quiz):
+                    # the cached quiz was already served to this student
+                    quiz = await self._create_quiz(topic, fresh=True)
+                if Config.QUIZ_POOL_ENABLED:
+                    await asyncio.to_thread(quiz_pool.mark_seen, student_id, quiz)
             
-            # format for student (hide answers)
-            lines = quiz_text.split('\n')
-            formatted = [line for line in lines if not line.startswith('Correct:')]
+            await asyncio.to_thread(self._store_quiz, context, topic, quiz)
             
             result = f"**Quiz: {topic}**\n\n"
-            result += '\n'.join(formatted)
+            result += quiz.render()
             result += "\n\n**Submit answers as:** `1.A 2.B 3.C 4.D 5.A`"
             
             return result
             
+        except CircuitOpenError as e:
+            logger.warning(f"Quiz skipped: {e}")
+            return f"The quiz service is busy right now. Please try again in {e.retry_after:.0f} seconds."
         except Exception as e:
             logger.error(f"Error: {e}")
+            errors.inc(component="quizzer")
             return "I had trouble creating a quiz. Please try again."
     
-    def evaluate_answers(self, student_id: str, answers: str, session) -> str:
+    def generate_quiz_stream(self, request: str, context: dict, fresh: bool = False):
+        """Yield the quiz one question at a time as the questions arrive"""
+        return iterate_sync(self.generate_quiz_stream_async(request, context, fresh=fresh))
+    
+    @timed(agent_latency, agent="quizzer", method="generate_quiz_stream")
+    async def generate_quiz_stream_async(self, request: str, context: dict, fresh: bool = False):
+        """Async generator version of generate_quiz_stream"""
+        logger.info("Streaming quiz")
+        
+        topic = await asyncio.to_thread(self._resolve_topic, request, context)
+        student_id = context["session"].student_id
+
+        try:
+            quiz = await asyncio.to_thread(self._take_pooled_quiz, topic, student_id, fresh)
+            yield f"**Quiz: {topic}**\n\n"
+            if quiz is not None:
+                yield quiz.render()
+            else:
+                # a cached quiz may already have been served to this student,
+                # and once streamed it cannot be swapped, so ask for a new one
+                chunks = []
+                parser = QuizStreamParser()
+                streamed = 0
+                async for chunk in llm_service.stream_async(
+                    self.model, self._quiz_prompt(topic),
+                    fresh=fresh or Config.QUIZ_POOL_ENABLED
+                ):
+                    chunks.append(chunk)
+                    for question in parser.feed(chunk):
+                        streamed += 1
+                        yield ("\n\n" if streamed > 1 else "") + question.render(streamed)
+                
+                quiz = self._parse_quiz(topic, "".join(chunks))
+                # replies that were not JSON are shown once they are complete
+                for number, question in enumerate(quiz.questions[streamed:], streamed + 1):
+                    yield ("\n\n" if number > 1 else "") + question.render(number)
+                if Config.QUIZ_POOL_ENABLED:
+                    await asyncio.to_thread(quiz_pool.mark_seen, student_id, quiz)
+            
+            await asyncio.to_thread(self._store_quiz, context, topic, quiz)
+            yield "\n\n**Submit answers as:** `1.A 2.B 3.C 4.D 5.A`"
+            
+        except CircuitOpenError as e:
+            logger.warning(f"Quiz skipped: {e}")
+            yield f"The quiz service is busy right now. Please try again in {e.retry_after:.0f} seconds."
+        except Exception as e:
+            logger.error(f"Error: {e}")
+            errors.inc(component="quizzer")
+            yield "I had trouble creating a quiz. Please try again."
+    
+    def _resolve_topic(self, request: str, context: dict) -> str:
+        """Pick the quiz topic and make it the session's current topic"""
+        # Extract topic from request
+        route = context.get("route")
+        topic = route.topic if route is not None else self._extract_topic(request)
+        if not topic:
+            topic = context["session"].current_topic or "general knowledge"
+        elif Config.TOPIC_INDEX_ENABLED:
+            # paraphrased topics share one pool queue and one cached quiz
+            topic = topic_index.resolve(topic)
+        
+        # Update session topic
+        context["session"].current_topic = topic
+        return topic
+    
+    def _take_pooled_quiz(self, topic: str, student_id: str, fresh: bool):
+        if not Config.QUIZ_POOL_ENABLED:
+            return None
+        quiz_pool.start(self._pregenerate_quiz)
+        return None if fresh else quiz_pool.take(topic, student_id)
+    
+    def _store_quiz(self, context: dict, topic: str, quiz: Quiz):
+        session = context["session"]
+        
+        def change(current):
+            current.current_topic = topic
+            current.context["current_quiz"] = quiz
+        
+        # the answers may arrive at another worker process
+        session_service.update(session.student_id, change)
+    
+    def _quiz_prompt(self, topic: str) -> str:
+        return f"""Create a quiz on: {topic}
+
+Generate exactly 5 multiple-choice questions, each with four options.
+Reply in JSON: {{"questions": [{{"question": "...", "options": ["...", "...", "...", "..."], "answer": "A"}}]}}
+where answer is the letter (A-D) of the correct option.
+
+Make questions test understanding."""
+    
+    async def _create_quiz(self, topic: str, fresh: bool = False,
+                           priority: int = PRIORITY_INTERACTIVE) -> Quiz:
+        """Ask the model for a quiz"""
+        quiz_text = await llm_service.generate_async(self.model, self._quiz_prompt(topic),
+                                                     fresh=fresh, priority=priority)
+        return self._parse_quiz(topic, quiz_text)
+    
+    def _parse_quiz(self, topic: str, quiz_text: str) -> Quiz:
+        """Parse the reply once, the Quiz holds the answer key and the student-facing text"""
+        quiz = Quiz.parse(topic, quiz_text)
+        if not quiz.questions:
+            raise ValueError(f"No questions in the quiz reply for {topic}")
+        return quiz
+    
+    def _pregenerate_quiz(self, topic: str) -> Quiz:
+        """Pool refill hook, always asks the model for a new quiz"""
+        # queued behind interactive requests by the LLM scheduler
+        return run_sync(self._create_quiz(topic, fresh=True, priority=PRIORITY_BACKGROUND))
+    
+    @timed(agent_latency, agent="quizzer", method="evaluate_answers")
+    def evaluate_answers(self, student_id: str, answers: str) -> str:
         """Evaluate quiz answers"""
-        logger.info(f"Evaluating answers")
+        logger.info("Evaluating answers")
         
-        quiz_data = session.context.get("current_quiz")
-        if not quiz_data:
+        # taking the quiz out under the student's lock grades each quiz once,
+        # however often or concurrently the answers are sent
+        quiz = session_service.update(student_id,
+                                      lambda session: session.context.pop("current_quiz", None))
+        if not quiz:
             return "No active quiz found!"
         
-        # Parse student answers
-        student_ans = {}
-        matches = re.findall(r'(\d+)\.([A-Da-d])', answers)
-        for num, letter in matches:
-            student_ans[int(num)] = letter.upper()
-        
-        # Extract correct answers
-        correct_ans = {}
-        for line in quiz_data["quiz_text"].split('\n'):
-            if line.startswith('Correct:'):
-                q_num = len(correct_ans) + 1
-                correct_ans[q_num] = line.split(':')[-1].strip().upper()
+        # Parse student answers and compare them with the answer key
+        graded = quiz.grade(intent_router.parse_answers(answers))
         
         # Calculate score
-        correct_count = sum(1 for q in student_ans if student_ans.get(q) == correct_ans.get(q))
-        total = len(correct_ans)
+        correct_count = sum(1 for student, correct in graded if student == correct)
+        total = len(graded)
         score = correct_count / total if total > 0 else 0
         
-        feedback = f"📊 **Quiz Results: {quiz_data['topic']}**\n\n"
-        for i in range(1, total + 1):
-            student = student_ans.get(i, "?")
-            correct = correct_ans.get(i, "?")
+        feedback = f"📊 **Quiz Results: {quiz.topic}**\n\n"
+        for i, (student, correct) in enumerate(graded, 1):
             if student == correct:
                 feedback += f"✅ Q{i}: Correct!\n"
             else:
@@ -110,30 +214,13 @@ Make questions test understanding."""
         
         # Save to memory
         memory_bank.add_quiz_result(
-            student_id, quiz_data["topic"], score, total, correct_count, []
+            student_id, quiz.topic, score, total, correct_count, []
         )
         
         return feedback
     
     def _extract_topic(self, request: str) -> str:
         """Extract topic from quiz request"""
-        request_lower = request.lower()
-        
-        # Common patterns
-        patterns = [
-            r'quiz me on (.+)',
-            r'quiz me about (.+)',
-            r'quiz on (.+)',
-            r'quiz about (.+)',
-            r'test me on (.+)',
-            r'(.+) quiz'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, request_lower)
-            if match:
-                return match.group(1).strip()
-        
-        return None
+        return intent_router.extract_topic(request)
 
 quizzer_agent = QuizzerAgent()
\ No newline at end of file
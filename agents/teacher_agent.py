@@ -1,8 +1,15 @@
 """Teacher Agent - Explains concepts"""
-import google.generativeai as genai
 from config import Config
+from services.model_registry import model_registry
+from services.llm_service import llm_service
+from services.llm_scheduler import CircuitOpenError
+from services.metrics import timed, agent_latency, errors
+from services.async_runner import run_sync, iterate_sync
+from services.topic_index import topic_index
+from tools.diagram_library import diagram_library, clean_mermaid, render_diagram
+import asyncio
 import logging
-import re
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -10,47 +17,149 @@ class TeacherAgent:
     """Explains concepts with visuals"""
     
     def __init__(self):
-        genai.configure(api_key=Config.GOOGLE_API_KEY)
-        self.model = genai.GenerativeModel(Config.MODEL_NAME)
         self.name = "Teacher"
+        self._background_tasks = set()
     
-    def explain(self, topic: str, context: dict) -> str:
-        """Explain a topic"""
+    @property
+    def model(self):
+        """Shared model client, created on first use"""
+        return model_registry.get(Config.MODEL_NAME)
+    
+    def explain(self, topic: str, context: dict, fresh: bool = False) -> str:
+        """Explain a topic, fresh=True bypasses the response cache"""
+        return run_sync(self.explain_async(topic, context, fresh=fresh))
+    
+    @timed(agent_latency, agent="teacher", method="explain")
+    async def explain_async(self, topic: str, context: dict, fresh: bool = False) -> str:
+        """Explain a topic without blocking the event loop"""
+        request, topic = topic, await asyncio.to_thread(self._canonical, topic)
         logger.info(f"Explaining: {topic}")
         
-        prompt = f"""You are an expert teacher. Explain this topic clearly and engagingly:
-
-Topic: {topic}
-
-Provide:
-1. Simple definition
-2. Step-by-step breakdown
-3. Real-world example
-4. Key takeaway
-
-Keep it 200-300 words, conversational tone."""
+        diagram_task = self._start_diagram(topic, fresh)
+        started = time.monotonic()
 
         try:
-            response = self.model.generate_content(prompt)
-            explanation = response.text
+            explanation = await llm_service.generate_async(
+                self.model, self._explain_prompt(request), fresh=fresh,
+                cache_key=self._explain_prompt(topic)
+            )
             
-            # generate visual diagram for applicable topics
-            if Config.ENABLE_VISUAL_LEARNING:
-                visual_keywords = ["cycle", "process", "system", "photosynthesis", "respiration", 
-                                 "circuit", "ecosystem", "reaction", "structure", "mechanism"]
-                if any(keyword in topic.lower() for keyword in visual_keywords):
-                    diagram = self._generate_diagram(topic)
-                    if diagram:
-                        explanation += f"\n\n{diagram}"
+            if diagram_task is not None:
+                diagram = await self._await_diagram(diagram_task, topic, started)
+                if diagram:
+                    explanation += f"\n\n{diagram}"
             
             context["session"].current_topic = topic
             return explanation
             
+        except CircuitOpenError as e:
+            logger.warning(f"Explanation skipped: {e}")
+            if diagram_task is not None:
+                diagram_task.cancel()
+            return f"The tutor is busy right now. Please try again in {e.retry_after:.0f} seconds."
         except Exception as e:
             logger.error(f"Error: {e}")
+            errors.inc(component="teacher")
+            if diagram_task is not None:
+                diagram_task.cancel()
             return f"I had trouble explaining {topic}. Could you rephrase your question?"
     
-    def _generate_diagram(self, topic: str) -> str:
+    def explain_stream(self, topic: str, context: dict, fresh: bool = False):
+        """Yield the explanation in chunks as the model writes it"""
+        return iterate_sync(self.explain_stream_async(topic, context, fresh=fresh))
+    
+    @timed(agent_latency, agent="teacher", method="explain_stream")
+    async def explain_stream_async(self, topic: str, context: dict, fresh: bool = False):
+        """Async generator version of explain_stream"""
+        request, topic = topic, await asyncio.to_thread(self._canonical, topic)
+        logger.info(f"Streaming explanation: {topic}")
+        
+        diagram_task = self._start_diagram(topic, fresh)
+        started = time.monotonic()
+        streamed = False
+
+        try:
+            async for chunk in llm_service.stream_async(
+                self.model, self._explain_prompt(request), fresh=fresh,
+                cache_key=self._explain_prompt(topic)
+            ):
+                streamed = True
+                yield chunk
+            
+            if diagram_task is not None:
+                diagram = await self._await_diagram(diagram_task, topic, started)
+                if diagram:
+                    yield f"\n\n{diagram}"
+            
+            context["session"].current_topic = topic
+            
+        except CircuitOpenError as e:
+            logger.warning(f"Explanation skipped: {e}")
+            if diagram_task is not None:
+                diagram_task.cancel()
+            if not streamed:
+                yield f"The tutor is busy right now. Please try again in {e.retry_after:.0f} seconds."
+        except Exception as e:
+            logger.error(f"Error: {e}")
+            errors.inc(component="teacher")
+            if diagram_task is not None:
+                diagram_task.cancel()
+            if not streamed:
+                yield f"I had trouble explaining {topic}. Could you rephrase your question?"
+    
+    def _canonical(self, topic: str) -> str:
+        """Canonical topic, paraphrases share its cached explanation and diagram
+
+        Only the cache keys use it: the model is asked in the student's own words.
+        """
+        return topic_index.resolve(topic) if Config.TOPIC_INDEX_ENABLED else topic
+    
+    def _explain_prompt(self, topic: str) -> str:
+        return f"""You are an expert teacher. Explain this topic clearly and engagingly:
+
+Topic: {topic}
+
+Provide:
+1. Simple definition
+2. Step-by-step breakdown
+3. Real-world example
+4. Key takeaway
+
+Keep it 200-300 words, conversational tone."""
+    
+    def _start_diagram(self, topic: str, fresh: bool):
+        """Start the diagram alongside the explanation for visual topics"""
+        if not Config.ENABLE_VISUAL_LEARNING:
+            return None
+        visual_keywords = ["cycle", "process", "system", "photosynthesis", "respiration", 
+                         "circuit", "ecosystem", "reaction", "structure", "mechanism",
+                         "mitosis", "cell division", "tectonics", "food chain", "food web",
+                         "digestion", "circulation", "scientific method"]
+        if not any(keyword in topic.lower() for keyword in visual_keywords):
+            return None
+        code = diagram_library.lookup(topic) if Config.DIAGRAM_LIBRARY_ENABLED and not fresh else None
+        if code is not None:
+            # known topic, no model call: hand back an already finished future
+            ready = asyncio.get_running_loop().create_future()
+            ready.set_result(render_diagram(code))
+            return ready
+        return asyncio.create_task(self._generate_diagram(topic, fresh=fresh))
+    
+    async def _await_diagram(self, diagram_task, topic: str, started: float) -> str:
+        """Wait for the diagram until the deadline, then fall back to a template"""
+        remaining = Config.DIAGRAM_DEADLINE_SECONDS - (time.monotonic() - started)
+        done, _ = await asyncio.wait({diagram_task}, timeout=max(remaining, 0))
+        if diagram_task in done:
+            return diagram_task.result()
+        
+        logger.warning(f"Diagram for {topic} missed its deadline, using fallback")
+        # let it finish in the background so the response cache is warm next time
+        self._background_tasks.add(diagram_task)
+        diagram_task.add_done_callback(self._background_tasks.discard)
+        return self._create_fallback_diagram(topic)
+    
+    @timed(agent_latency, agent="teacher", method="diagram")
+    async def _generate_diagram(self, topic: str, fresh: bool = False) -> str:
         """Generate a Mermaid diagram for the topic"""
         try:
             prompt = f"""Create a simple Mermaid flowchart for: {topic}
@@ -71,72 +180,27 @@ B --> C[End]
 
 Return ONLY the Mermaid code, nothing else."""
 
-            response = self.model.generate_content(prompt)
-            mermaid_code = response.text.strip()
-            
-            mermaid_code = mermaid_code.replace("```mermaid", "").replace("```", "").strip()
-            mermaid_code = mermaid_code.replace("flowchart TD", "graph TD")
-            mermaid_code = mermaid_code.replace("flowchart LR", "graph LR")
-            
-            lines = mermaid_code.split('\n')
-            cleaned_lines = []
-            for line in lines:
-                line = line.strip()
-                if line.startswith('graph ') or '-->' in line or line == '':
-                    cleaned_lines.append(line)
-            
-            mermaid_code = '\n'.join(cleaned_lines).strip()
-            
-            if not mermaid_code.startswith('graph '):
-                logger.warning(f"Invalid Mermaid start: {mermaid_code[:50]}")
-                return self._create_fallback_diagram(topic)
-            
-            # node check
-            if '-->' not in mermaid_code:
-                logger.warning("No arrows found in Mermaid code")
+            mermaid_code = clean_mermaid(await llm_service.generate_async(self.model, prompt, fresh=fresh))
+            if mermaid_code is None:
                 return self._create_fallback_diagram(topic)
             
-            return f"\n\n**Visual Diagram:**\n```mermaid\n{mermaid_code}\n```"
+            if Config.DIAGRAM_LIBRARY_ENABLED:
+                # next time this topic is served from the library
+                diagram_library.add(topic, mermaid_code)
+            return render_diagram(mermaid_code)
             
         except Exception as e:
             logger.error(f"Diagram generation error: {e}")
+            errors.inc(component="diagram")
             return self._create_fallback_diagram(topic)
     
     def _create_fallback_diagram(self, topic: str) -> str:
         """Create a simple fallback diagram when AI generation fails"""
-        # template based diags for common topics
-        if 'water cycle' in topic.lower():
-            return """
-
-**Visual Diagram:**
-```mermaid
-graph TD
-A[Evaporation] --> B[Condensation]
-B --> C[Precipitation]
-C --> D[Collection]
-D --> A
-```"""
-        elif 'photosynthesis' in topic.lower():
-            return """
-
-**Visual Diagram:**
-```mermaid
-graph LR
-A[Sunlight] --> B[Chlorophyll]
-C[Water] --> B
-D[CO2] --> B
-B --> E[Glucose]
-B --> F[Oxygen]
-```"""
-        else:
+        # template based diags for known topics
+        code = diagram_library.lookup(topic)
+        if code is None:
             # generic process diagram
-            return """
-
-**Visual Diagram:**
-```mermaid
-graph TD
-A[Input] --> B[Process]
-B --> C[Output]
-```"""
+            code = "graph TD\nA[Input] --> B[Process]\nB --> C[Output]"
+        return render_diagram(code)
 
 teacher_agent = TeacherAgent()
\ No newline at end of file
@@ -1,18 +1,37 @@
 """
 EternaLearn - web interface for hugging face spaces
 """
-import gradio as gr
 from agents.coordinator import coordinator
 from agents.teacher_agent import teacher_agent
 from agents.quizzer_agent import quizzer_agent
 from agents.memory_agent import memory_agent
 from services.memory_bank import memory_bank
 from services.session_service import session_service
+from services.async_runner import run_sync
+from services.metrics import metrics, route_latency, errors
+from services.intent_router import intent_router, INTENT_ANSWERS, INTENT_PROGRESS, INTENT_QUIZ
+from config import Config
+import asyncio
 import logging
+import os
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# callers that do not say who they are (scripts, the old single-user setup)
+DEFAULT_STUDENT_ID = "student_web_001"
+
+def student_id_for(request) -> str:
+    """Who sent a gradio request: the login name, else one id per browser session"""
+    if request is None:
+        return DEFAULT_STUDENT_ID
+    username = getattr(request, "username", None)
+    if username:
+        return username
+    session_hash = getattr(request, "session_hash", None)
+    return f"web_{session_hash}" if session_hash else DEFAULT_STUDENT_ID
+
 class EternaLearnWeb:
     def __init__(self):
         self.coordinator = coordinator
@@ -21,33 +40,36 @@ class EternaLearnWeb:
         self.memory = memory_agent
         logger.info("EternaLearn Web Interface Initialized")
     
-    def process_message(self, message: str, history: list) -> str:
+    def process_message(self, message: str, history: list,
+                        student_id: str = DEFAULT_STUDENT_ID) -> str:
+        return run_sync(self.process_message_async(message, history, student_id))
+    
+    async def process_message_async(self, message: str, history: list,
+                                    student_id: str = DEFAULT_STUDENT_ID) -> str:
+        target = "empty"
+        started = time.perf_counter()
         try:
             if not message or message.strip() == "":
                 return "Please enter a message :)"
             
-            student_id = "student_web_001"
-            message_lower = message.lower().strip()
+            # storage calls go to worker threads, the event loop serves every student
+            target, route, session = await asyncio.to_thread(self._route, student_id, message)
             
-            if any(keyword in message_lower for keyword in ["progress", "stats", "my progress"]):
-                return "### Learning Progress\n\n" + self.memory.get_progress(student_id)
+            if target == INTENT_PROGRESS:
+                progress = await asyncio.to_thread(self.memory.get_progress, student_id)
+                return "### Learning Progress\n\n" + progress
             
-            if "quiz" in message_lower and not any(c.isdigit() and '.' in message for c in message):
-                session = session_service.get_or_create_session(student_id)
-                context = {
-                    "agent": "quizzer",
-                    "session": session,
-                    "profile": memory_bank.get_student_profile(student_id),
-                    "original_message": message
-                }
-                return "### Quiz Time\n\n" + self.quizzer.generate_quiz(message, context)
+            if target == INTENT_ANSWERS:
+                results = await asyncio.to_thread(self.quizzer.evaluate_answers,
+                                                  student_id, message)
+                return "### Quiz Results\n\n" + results
             
-            if any(c.isdigit() and '.' in message for c in message):
-                session = session_service.get_or_create_session(student_id)
-                if "current_quiz" in session.context:
-                    return "### Quiz Results\n\n" + self.quizzer.evaluate_answers(student_id, message, session)
+            if target == INTENT_QUIZ:
+                context = await asyncio.to_thread(self._quiz_context, student_id, message,
+                                                  route, session)
+                return "### Quiz Time\n\n" + await self.quizzer.generate_quiz_async(message, context)
             
-            response = self.coordinator.coordinate_response(
+            response = await self.coordinator.coordinate_response_async(
                 student_id, message,
                 self.teacher, self.quizzer, self.memory
             )
@@ -55,13 +77,83 @@ class EternaLearnWeb:
             
         except Exception as e:
             logger.error(f"Error: {e}")
+            errors.inc(component="web")
             return f"Error: {str(e)}\n\nPlease try again!"
+        finally:
+            route_latency.observe(time.perf_counter() - started, route=target)
+
+    async def process_message_stream(self, message: str, history: list,
+                                     student_id: str = DEFAULT_STUDENT_ID):
+        """Yield the response in chunks as it is generated"""
+        target = "empty"
+        started = time.perf_counter()
+        try:
+            if not message or message.strip() == "":
+                yield "Please enter a message :)"
+                return
+            
+            target, route, session = await asyncio.to_thread(self._route, student_id, message)
+            
+            if target == INTENT_PROGRESS:
+                progress = await asyncio.to_thread(self.memory.get_progress, student_id)
+                yield "### Learning Progress\n\n" + progress
+                return
+            
+            if target == INTENT_ANSWERS:
+                results = await asyncio.to_thread(self.quizzer.evaluate_answers,
+                                                  student_id, message)
+                yield "### Quiz Results\n\n" + results
+                return
+            
+            if target == INTENT_QUIZ:
+                context = await asyncio.to_thread(self._quiz_context, student_id, message,
+                                                  route, session)
+                yield "### Quiz Time\n\n"
+                async for chunk in self.quizzer.generate_quiz_stream_async(message, context):
+                    yield chunk
+                return
+            
+            yield "### Explanation\n\n"
+            async for chunk in self.coordinator.coordinate_response_stream_async(
+                student_id, message,
+                self.teacher, self.quizzer, self.memory
+            ):
+                yield chunk
+            
+        except Exception as e:
+            logger.error(f"Error: {e}")
+            errors.inc(component="web")
+            yield f"\n\nError: {str(e)}\n\nPlease try again!"
+        finally:
+            route_latency.observe(time.perf_counter() - started, route=target)
+    
+    def _route(self, student_id: str, message: str):
+        """Classify a message, returns (target, route, session)"""
+        route = intent_router.classify(message)
+        session = None
+        if route.answers or route.intent == INTENT_QUIZ:
+            session = session_service.get_or_create_session(student_id)
+        quiz_active = session is not None and "current_quiz" in session.context
+        return route.target(quiz_active), route, session
+    
+    def _quiz_context(self, student_id: str, message: str, route, session) -> dict:
+        return {
+            "agent": "quizzer",
+            "session": session,
+            "profile": memory_bank.get_student_profile(student_id, include_history=False),
+            "original_message": message,
+            "route": route
+        }
 
 logger.info("Initializing EternaLearn Web App...")
 app = EternaLearnWeb()
 
-def chat(message, history):
-    return app.process_message(message, history)
+async def chat(message, history, request=None):
+    # gradio renders each yielded value as the full reply so far
+    response = ""
+    async for chunk in app.process_message_stream(message, history, student_id_for(request)):
+        response += chunk
+        yield response
 
 custom_css = """
 @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
@@ -159,25 +251,90 @@ button.primary:hover {
 }
 """
 
-demo = gr.ChatInterface(
-    fn=chat,
-    title="EternaLearn",
-    description="AI-Powered Adaptive Learning System · Multi-Agent Intelligence",
-    examples=[
-        "Explain quantum physics",
-        "Explain the water cycle",
-        "Quiz me on photosynthesis",
-        "Show my progress"
-    ],
-    css=custom_css,
-    theme=gr.themes.Soft(
-        primary_hue="indigo",
-        secondary_hue="purple",
-    ),
-)
-
-# theme switching enabled
-demo.queue()
+def build_demo():
+    """Create the Gradio interface, gradio is only imported here"""
+    import gradio as gr
+    
+    async def chat_as_student(message, history, request: gr.Request):
+        # gradio passes the request to parameters annotated with gr.Request
+        async for response in chat(message, history, request):
+            yield response
+    
+    demo = gr.ChatInterface(
+        fn=chat_as_student,
+        title="EternaLearn",
+        description="AI-Powered Adaptive Learning System · Multi-Agent Intelligence",
+        examples=[
+            "Explain quantum physics",
+            "Explain the water cycle",
+            "Quiz me on photosynthesis",
+            "Show my progress"
+        ],
+        css=custom_css,
+        theme=gr.themes.Soft(
+            primary_hue="indigo",
+            secondary_hue="purple",
+        ),
+    )
+    
+    # theme switching enabled
+    demo.queue()
+    return demo
+
+def build_server():
+    """Serve the Gradio app and the Prometheus metrics endpoint from one FastAPI app"""
+    import gradio as gr
+    from fastapi import FastAPI
+    from fastapi.responses import PlainTextResponse
+    
+    server = FastAPI()
+    
+    @server.get(Config.METRICS_PATH, response_class=PlainTextResponse)
+    def prometheus_metrics():
+        return PlainTextResponse(metrics.render(),
+                                 media_type="text/plain; version=0.0.4; charset=utf-8")
+    
+    return gr.mount_gradio_app(server, build_demo(), path="/")
+
+def __getattr__(name):
+    # `app.demo` (used by the gradio CLI and Spaces) is built on first access
+    if name == "demo":
+        globals()["demo"] = build_demo()
+        return globals()["demo"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def worker_count() -> int:
+    """Worker processes to run, one unless students, sessions and the quiz pool live in shared SQLite files"""
+    Config.load()
+    if Config.WEB_WORKERS > 1 and (Config.MEMORY_BACKEND != "sqlite" or
+                                   Config.SESSION_BACKEND != "sqlite" or
+                                   Config.STATE_BACKEND != "sqlite"):
+        logger.warning("WEB_WORKERS > 1 needs MEMORY_BACKEND=sqlite, SESSION_BACKEND=sqlite "
+                       "and STATE_BACKEND=sqlite, running one worker")
+        return 1
+    return max(Config.WEB_WORKERS, 1)
+
+def serve(port: int):
+    """Run the web app and metrics endpoint on one port"""
+    import uvicorn
+    
+    uvicorn.run(build_server(), host=os.getenv("GRADIO_SERVER_NAME", "127.0.0.1"), port=port)
 
 if __name__ == "__main__":
-    demo.launch()
\ No newline at end of file
+    workers = worker_count()
+    port = int(os.getenv("GRADIO_SERVER_PORT", "7860"))
+    if workers > 1:
+        import multiprocessing
+        
+        # gradio's event queue lives in one process, so every worker gets its own
+        # port and a proxy with sticky sessions spreads students over them
+        processes = [multiprocessing.Process(target=serve, args=(port + i,), name=f"web-{i}")
+                     for i in range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+    elif Config.METRICS_ENABLED:
+        serve(port)
+    else:
+        build_demo().launch()
@@ -0,0 +1 @@
+"""EternaLearn Benchmarks"""
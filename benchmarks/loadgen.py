@@ -0,0 +1,204 @@
+"""Load generator - Simulated students driving the web app offline
+
+Run from the project root:
+
+    python -m benchmarks.loadgen --students 50 --turns 6
+    python -m benchmarks.loadgen --students 200 --latency-median 1.2 --error-rate 0.02 --rpm 600
+
+Every student runs a short scripted conversation (explanations, a quiz and
+its answers, a progress check) against EternaLearnWeb.process_message on
+its own thread, under its own student id. Model calls go to the fake backend, and all data files are
+written to a temporary directory unless --data-dir is given. Prints
+throughput and p50/p95/p99 latency overall and per request kind.
+"""
+import argparse
+import atexit
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TOPICS = ["the water cycle", "photosynthesis", "gravity", "the nitrogen cycle",
+          "plate tectonics", "cellular respiration", "electric circuits", "fractions"]
+
+# students phrase the same question differently
+EXPLAIN_TEMPLATES = ["Explain {}", "What is {}?", "explain {} please", "Tell me about {}",
+                     "How does {} work?"]
+
+def student_script(rng: random.Random, turns: int) -> list:
+    """A list of (kind, message) pairs for one simulated student"""
+    script = []
+    while len(script) < turns:
+        roll = rng.random()
+        topic = rng.choice(TOPICS)
+        if roll < 0.5:
+            script.append(("explain", rng.choice(EXPLAIN_TEMPLATES).format(topic)))
+        elif roll < 0.85:
+            script.append(("quiz", f"Quiz me on {topic}"))
+            answers = " ".join(f"{n}.{rng.choice('ABCD')}" for n in range(1, 6))
+            script.append(("answer", answers))
+        else:
+            script.append(("progress", "Show my progress"))
+    return script[:turns]
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(latencies: list) -> dict:
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 1),
+        "p95_ms": round(percentile(values, 95) * 1000, 1),
+        "p99_ms": round(percentile(values, 99) * 1000, 1),
+        "max_ms": round(values[-1] * 1000, 1) if values else 0.0,
+    }
+
+def configure(args):
+    """Point Config at the fake backend and the scheduler limits before the app is imported"""
+    sys.path.insert(0, PROJECT_ROOT)
+    from config import Config
+
+    Config.MODEL_BACKEND = "fake"
+    Config.LLM_REQUESTS_PER_MINUTE = args.rpm
+    Config.LLM_TOKENS_PER_MINUTE = args.tpm
+    Config.LLM_MAX_CONCURRENCY = args.model_concurrency
+    Config.RESPONSE_CACHE_ENABLED = not args.no_cache
+    Config.QUIZ_POOL_ENABLED = not args.no_quiz_pool
+
+def run(args) -> dict:
+    configure(args)
+    from services.model_backends import FakeBackend
+    from services.model_registry import model_registry
+
+    backend = FakeBackend(latency=args.latency, latency_median=args.latency_median,
+                          latency_sigma=args.latency_sigma, error_rate=args.error_rate,
+                          seed=args.seed)
+    model_registry.use_backend(backend)
+
+    import app as web
+    from services.llm_service import llm_service
+    from services.topic_index import topic_index
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(args.students)
+
+    def simulate(index: int):
+        rng = random.Random(args.seed * 100003 + index)
+        script = student_script(rng, args.turns)
+        student = f"loadgen_{index:04d}"
+        history = []
+        start_barrier.wait()
+        for kind, message in script:
+            started = time.perf_counter()
+            try:
+                reply = web.app.process_message(message, history, student)
+                failed = reply.startswith("Error:") or "trouble" in reply or "busy" in reply
+            except Exception:
+                reply, failed = "", True
+            elapsed = time.perf_counter() - started
+            history.append([message, reply])
+            with lock:
+                latencies[kind].append(elapsed)
+                if failed:
+                    errors[kind] += 1
+            if args.think_time:
+                time.sleep(rng.uniform(0, args.think_time))
+
+    threads = [threading.Thread(target=simulate, args=(i,), daemon=True)
+               for i in range(args.students)]
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - wall_start
+
+    everything = [value for values in latencies.values() for value in values]
+    return {
+        "students": args.students,
+        "turns": args.turns,
+        "requests": len(everything),
+        "errors": sum(errors.values()),
+        "duration_s": round(wall, 3),
+        "throughput_rps": round(len(everything) / wall, 2) if wall else 0.0,
+        "latency": summarize(everything),
+        "by_kind": {kind: dict(summarize(values), errors=errors[kind])
+                    for kind, values in sorted(latencies.items())},
+        "model_calls": backend.calls,
+        "scheduler": llm_service.scheduler_stats(),
+        "flights": llm_service.flight_stats(),
+        "cache": llm_service.cache_stats() if not args.no_cache else {},
+        "topics": topic_index.stats(),
+    }
+
+def print_report(report: dict):
+    latency = report["latency"]
+    print(f"{report['students']} students x {report['turns']} turns: "
+          f"{report['requests']} requests in {report['duration_s']:.2f}s "
+          f"({report['throughput_rps']:.1f} req/s), {report['errors']} errors, "
+          f"{report['model_calls']} model calls")
+    print(f"{'kind':<10}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}")
+    rows = list(report["by_kind"].items()) + [("all", dict(latency, errors=report["errors"]))]
+    for kind, stats in rows:
+        print(f"{kind:<10}{stats['count']:>7}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+              f"{stats['p99_ms']:>10.1f}{stats['max_ms']:>10.1f}{stats['errors']:>8}")
+    print(f"scheduler: {report['scheduler']}")
+    print(f"coalescing: {report['flights']}")
+    print(f"topic index: {report['topics']}")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=6, help="messages per student")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="max random pause between a student's messages, seconds")
+    parser.add_argument("--latency", choices=["constant", "uniform", "lognormal"],
+                        default="lognormal")
+    parser.add_argument("--latency-median", type=float, default=0.5, help="seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.4)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, default=100000, help="scheduler requests per minute")
+    parser.add_argument("--tpm", type=int, default=100000000, help="scheduler tokens per minute")
+    parser.add_argument("--model-concurrency", type=int, default=64,
+                        help="scheduler cap on model calls in flight")
+    parser.add_argument("--no-cache", action="store_true", help="disable the response cache")
+    parser.add_argument("--no-quiz-pool", action="store_true", help="disable the quiz pool")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", help="where the app writes its data (default: temp dir)")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    if args.data_dir:
+        workdir = os.path.abspath(args.data_dir)
+        os.makedirs(workdir, exist_ok=True)
+    else:
+        workdir = tempfile.mkdtemp(prefix="eternalearn-loadgen-")
+        # registered before the app is imported, so it runs after the app's own exit hooks
+        atexit.register(shutil.rmtree, workdir, ignore_errors=True)
+    # the app's data paths are relative to the working directory
+    os.chdir(workdir)
+
+    report = run(args)
+    print_report(report)
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
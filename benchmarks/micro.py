@@ -0,0 +1,365 @@
+"""Microbenchmarks - Storage, session and parsing hot paths
+
+Run from the project root:
+
+    python -m benchmarks.micro                        # compare with the baseline
+    python -m benchmarks.micro --sizes 1k 10k 100k    # bigger datasets (100k is slow to build)
+    python -m benchmarks.micro --save                 # write a new baseline
+
+Datasets are generated in a temporary directory: N students, each with a
+quiz history of --history entries over a fixed topic list. Every benchmark
+reports the median and best time per operation over --repeat batches.
+
+Timings are also stored relative to a fixed pure-Python calibration loop
+run in the same process, and the check compares those ratios, so a faster
+or slower machine does not by itself pass or fail. When a benchmark's
+relative best time is more than --tolerance above the one in
+benchmarks/baselines/micro.json it counts as a regression and the exit
+status is 1. The committed baseline records the machine it was made on;
+ratios still shift somewhat between CPUs, so for a strict check save a
+baseline on the machine that runs it (--save --baseline local.json).
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(PROJECT_ROOT, "benchmarks", "baselines", "micro.json")
+
+SIZES = {"1k": 1000, "10k": 10000, "100k": 100000}
+
+TOPICS = ["water cycle", "photosynthesis", "gravity", "cells", "fractions", "algebra",
+          "plate tectonics", "electric circuits", "cellular respiration", "ecosystems",
+          "chemical reactions", "the solar system", "genetics", "magnetism", "erosion"]
+
+QUIZ_TEXT = "\n".join(
+    f"Q{n}: Question {n}?\nA) one\nB) two\nC) three\nD) four\nCorrect: {'ABCDA'[n - 1]}"
+    for n in range(1, 6)
+)
+
+MESSAGES = ["Explain how photosynthesis works in desert plants", "show my progress",
+            "1.A 2.B 3.C 4.D 5.A", "What happens to the water cycle when it gets warmer?"]
+
+REQUESTS = ["Quiz me on photosynthesis", "quiz me about the water cycle please",
+            "Can you test me on gravity", "algebra quiz", "give me a quiz", "Quiz on cells"]
+
+def student_id(index: int) -> str:
+    return f"student_{index:06d}"
+
+def generate_profiles(students: int, history: int, seed: int = 0):
+    """Yield complete profiles with quiz histories, built with the real update rules"""
+    from services.student_profile import new_profile, apply_quiz_result
+
+    rng = random.Random(seed)
+    started = datetime(2024, 1, 1).timestamp()
+    for index in range(students):
+        profile = new_profile(student_id(index))
+        topics = rng.sample(TOPICS, 5)
+        for n in range(history):
+            correct = rng.randint(0, 5)
+            apply_quiz_result(profile, {
+                "timestamp": datetime.fromtimestamp(started + index + n * 3600).isoformat(),
+                "topic": rng.choice(topics),
+                "score": correct / 5,
+                "total_questions": 5,
+                "correct_answers": correct
+            })
+        yield profile
+
+def build_dataset(directory: str, backend: str, students: int, history: int) -> dict:
+    """Write a dataset for the backend, returns MemoryBank keyword arguments"""
+    if backend == "json":
+        path = os.path.join(directory, "memory_bank.json")
+        memory = {"students": {p["id"]: p for p in generate_profiles(students, history)},
+                  "metadata": {"created_at": datetime.now().isoformat(), "journal_seq": 0}}
+        with open(path, 'w') as f:
+            json.dump(memory, f)
+        # no background compaction in the middle of other measurements
+        return {"storage_path": path, "backend": "json", "compact_every": 10 ** 9}
+
+    from services.memory_storage import create_storage
+    from services.student_profile import new_profile
+
+    path = os.path.join(directory, "memory_bank.db" if backend == "sqlite" else "students")
+    option = "db_path" if backend == "sqlite" else "storage_dir"
+    storage = create_storage(backend, **{option: path})
+    for profile in generate_profiles(students, history):
+        storage.create_profile(new_profile(profile["id"]))
+        for entry in profile["quiz_history"]:
+            storage.add_quiz_result(profile["id"], entry)
+    storage.close()
+    return {"storage_path": path, "backend": backend}
+
+def measure(func, number: int, repeat: int) -> dict:
+    """Median and best seconds per call of func over repeat batches of number calls"""
+    per_call = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        per_call.append((time.perf_counter() - started) / number)
+    return {"us_per_op": round(statistics.median(per_call) * 1e6, 3),
+            "best_us": round(min(per_call) * 1e6, 3), "ops": number * repeat}
+
+def calibrate(repeat: int) -> float:
+    """Best microseconds of a fixed mix of dict, string and arithmetic work"""
+    def work():
+        counts = {}
+        for i in range(20000):
+            key = f"topic{i % 97}"
+            counts[key] = counts.get(key, 0) + i * i % 7
+        return sorted(counts.items())
+
+    return measure(work, 5, max(repeat, 5))["best_us"]
+
+def bench_memory(results: dict, label: str, directory: str, backend: str,
+                 students: int, history: int, repeat: int):
+    from services.memory_bank import MemoryBank
+
+    print(f"  building {label} dataset ({students} students x {history} quizzes, {backend})...")
+    options = build_dataset(directory, backend, students, history)
+    rng = random.Random(1)
+    ids = [student_id(rng.randrange(students)) for _ in range(1000)]
+    picks = iter(ids * 1000)
+
+    def load():
+        MemoryBank(**options).storage.close()
+
+    results[f"memory.load[{label}]"] = measure(load, 1, max(3, repeat // 2))
+
+    bank = MemoryBank(**options)
+    bank.storage  # open outside the timed region
+
+    results[f"memory.get_student_profile[{label}]"] = measure(
+        lambda: bank.get_student_profile(next(picks)), 1000, repeat)
+
+    def add():
+        bank.add_quiz_result(next(picks), rng.choice(TOPICS), rng.randint(0, 5) / 5, 5, 3, [])
+    results[f"memory.add_quiz_result[{label}]"] = measure(add, 200, repeat)
+
+    def summary_cold():
+        sid = next(picks)
+        bank._render_cache.pop(sid, None)
+        bank.get_progress_summary(sid)
+    results[f"memory.get_progress_summary[{label}]"] = measure(summary_cold, 1000, repeat)
+    results[f"memory.get_progress_summary_cached[{label}]"] = measure(
+        lambda: bank.get_progress_summary(ids[0]), 1000, repeat)
+
+    bench_analytics(results, label, bank, repeat)
+
+    if backend == "json":
+        results[f"memory.save[{label}]"] = measure(bank.storage.compact, 1, max(3, repeat // 2))
+    elif hasattr(bank.storage, "flush"):
+        results[f"memory.save[{label}]"] = measure(bank.storage.flush, 1, max(3, repeat // 2))
+    bank.close()
+
+def bench_analytics(results: dict, label: str, bank, repeat: int):
+    if importlib.util.find_spec("numpy") is None:
+        print("  numpy is not installed, skipping the analytics benchmarks")
+        return
+    from services.analytics import cohort_report
+
+    results[f"analytics.export_quiz_history[{label}]"] = measure(
+        bank.export_quiz_history, 1, max(3, repeat // 2))
+    history = bank.export_quiz_history()
+    results[f"analytics.cohort_report[{label}]"] = measure(
+        lambda: cohort_report(history), 1, max(3, repeat // 2))
+
+def bench_sessions(results: dict, label: str, directory: str, students: int, repeat: int):
+    from services.session_service import SessionService
+
+    service = SessionService(sweep_interval_seconds=3600)
+    for index in range(students):
+        service.get_or_create_session(student_id(index))
+    rng = random.Random(2)
+    picks = iter([student_id(rng.randrange(students)) for _ in range(1000)] * 1000)
+    results[f"session.get_or_create_session[{label}]"] = measure(
+        lambda: service.get_or_create_session(next(picks)), 1000, repeat)
+
+    # shared between workers: one version check per lookup, nothing reloaded here
+    from services.session_service import SQLiteSessionStore
+    store = SQLiteSessionStore(os.path.join(directory, "sessions.db"))
+    shared = SessionService(sweep_interval_seconds=3600, store=store)
+    for index in range(students):
+        shared.get_or_create_session(student_id(index))
+    results[f"session.get_or_create_session_sqlite[{label}]"] = measure(
+        lambda: shared.get_or_create_session(next(picks)), 1000, repeat)
+    store.close()
+
+def bench_reviews(results: dict, label: str, directory: str, students: int, repeat: int):
+    from services.review_scheduler import ReviewScheduler
+
+    scheduler = ReviewScheduler(os.path.join(directory, "reviews.json"))
+    rng = random.Random(3)
+    now = time.time()
+    # ten scheduled topics per student
+    for index in range(students):
+        for topic in rng.sample(TOPICS, 10):
+            scheduler.record(student_id(index), topic, rng.random(), now - rng.uniform(0, 30) * 86400)
+    reviews = iter([(student_id(rng.randrange(students)), rng.choice(TOPICS), rng.random())
+                    for _ in range(1000)] * 1000)
+    results[f"reviews.record[{label}]"] = measure(
+        lambda: scheduler.record(*next(reviews), now), 1000, repeat)
+    picks = iter([student_id(rng.randrange(students)) for _ in range(1000)] * 1000)
+    results[f"reviews.next_reviews[{label}]"] = measure(
+        lambda: scheduler.next_reviews(next(picks)), 1000, repeat)
+    results[f"reviews.due_topics[{label}]"] = measure(
+        lambda: scheduler.due_topics(3600), 10, repeat)
+    scheduler.close()
+
+def bench_quizzer(results: dict, repeat: int):
+    from agents.quizzer_agent import QuizzerAgent
+    from services.quiz import Quiz
+    from services.session_service import session_service
+
+    agent = QuizzerAgent()
+    quiz = Quiz.parse("photosynthesis", QUIZ_TEXT)
+
+    def evaluate():
+        # grading takes the quiz out of the session, so hand it a new one each time
+        session_service.get_or_create_session("student_bench").context["current_quiz"] = quiz
+        return agent.evaluate_answers("student_bench", "1.A 2.B 3.C 4.D 5.A")
+
+    results["quizzer.evaluate_answers"] = measure(evaluate, 200, repeat)
+    requests = iter(REQUESTS * 100000)
+    results["quizzer.extract_topic"] = measure(
+        lambda: agent._extract_topic(next(requests)), 1000, repeat)
+
+def bench_router(results: dict, repeat: int):
+    from services.intent_router import intent_router
+
+    messages = iter((REQUESTS + MESSAGES) * 100000)
+    results["router.classify"] = measure(
+        lambda: intent_router.classify(next(messages)), 1000, repeat)
+
+def bench_diagrams(results: dict, repeat: int):
+    from tools.diagram_library import DiagramLibrary
+
+    library = DiagramLibrary(os.path.join(os.getcwd(), "diagram_library.json"))
+    topics = iter(["Explain the water cycle", "how does cellular respiration work",
+                   "Explain the solar system", "the rock cycle for kids"] * 100000)
+    results["diagram_library.lookup"] = measure(lambda: library.lookup(next(topics)), 1000, repeat)
+
+def bench_topics(results: dict, repeat: int):
+    from services.topic_index import TopicIndex
+
+    index = TopicIndex(os.path.join(os.getcwd(), "topic_index.json"))
+    for topic in TOPICS:
+        index.resolve(topic)
+    paraphrases = iter([f"What is {topic}?" for topic in TOPICS] * 100000)
+    results["topic_index.resolve_exact"] = measure(
+        lambda: index.resolve(next(paraphrases)), 1000, repeat)
+    # misspellings miss the exact key and go through MinHash/LSH
+    typos = iter([topic[:-2] + topic[-1] + topic[-2] for topic in TOPICS] * 100000)
+    results["topic_index.match_similar"] = measure(lambda: index.match(next(typos)), 200, repeat)
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Names whose time per op, relative to the calibration loop, is more than tolerance above the baseline"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        # best-of-batches is the least noisy figure on a shared machine
+        if "relative" in base:
+            ratio = result["relative"] / base["relative"] if base["relative"] else 1.0
+        else:
+            # baselines saved before calibration hold absolute timings only
+            ratio = result["best_us"] / base["best_us"] if base["best_us"] else 1.0
+        result["baseline_us"] = base["best_us"]
+        result["ratio"] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return regressions
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["1k", "10k"])
+    parser.add_argument("--history", type=int, default=50, help="quiz entries per student")
+    parser.add_argument("--backend", choices=["json", "sqlite", "sharded"], default="json")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="allowed slowdown against the baseline (0.3 = 30%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="write the results as the baseline")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, PROJECT_ROOT)
+    baseline_path = os.path.abspath(args.baseline)
+    json_path = os.path.abspath(args.json) if args.json else None
+    results = {}
+    calibration_us = calibrate(args.repeat)
+    with tempfile.TemporaryDirectory() as workdir:
+        # evaluate_answers writes to the default memory bank under ./data
+        os.chdir(workdir)
+        for label in args.sizes:
+            directory = os.path.join(workdir, label)
+            os.makedirs(directory)
+            bench_memory(results, label, directory, args.backend, SIZES[label],
+                         args.history, args.repeat)
+            bench_sessions(results, label, directory, SIZES[label], args.repeat)
+            bench_reviews(results, label, directory, SIZES[label], args.repeat)
+        bench_quizzer(results, args.repeat)
+        bench_router(results, args.repeat)
+        bench_diagrams(results, args.repeat)
+        bench_topics(results, args.repeat)
+        from services.memory_bank import memory_bank
+        memory_bank.close()
+        os.chdir(PROJECT_ROOT)
+    # timed again at the end so a busy moment at the start does not skew every ratio
+    calibration_us = min(calibration_us, calibrate(args.repeat))
+    for result in results.values():
+        result["relative"] = round(result["best_us"] / calibration_us, 6)
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "processor": platform.processor() or platform.machine()},
+        "settings": {"history": args.history, "backend": args.backend, "repeat": args.repeat},
+        "calibration_us": calibration_us,
+        "results": results,
+    }
+
+    regressions = []
+    if not args.save and os.path.exists(baseline_path):
+        with open(baseline_path, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get("machine") != report["machine"]:
+            print(f"Baseline was saved on {baseline.get('machine')}, comparing timings "
+                  f"relative to the calibration loop ({calibration_us:.0f} us here, "
+                  f"{baseline.get('calibration_us', 0):.0f} us there)")
+        regressions = compare(results, baseline, args.tolerance)
+
+    print(f"{'benchmark':<52}{'us/op':>12}{'best':>12}{'base best':>12}{'ratio':>8}")
+    for name, result in results.items():
+        base = f"{result['baseline_us']:.3f}" if "baseline_us" in result else "-"
+        ratio = f"{result['ratio']:.2f}" if "ratio" in result else "-"
+        flag = "  REGRESSION" if name in regressions else ""
+        print(f"{name:<52}{result['us_per_op']:>12.3f}{result['best_us']:>12.3f}"
+              f"{base:>12}{ratio:>8}{flag}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {baseline_path}")
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    if regressions:
+        print(f"FAIL {len(regressions)} benchmark(s) more than {args.tolerance:.0%} "
+              f"slower than the baseline")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
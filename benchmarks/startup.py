@@ -0,0 +1,84 @@
+"""Startup benchmark - Import time and import side effects
+
+Run from the project root:
+
+    python -m benchmarks.startup [--target-ms 1500] [--runs 5]
+
+Each run imports the modules in a fresh interpreter inside an empty working
+directory. The benchmark fails if the median import time is above the target
+or if importing created any files.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ["agents", "app"]
+
+IMPORT_SCRIPT = """
+import sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+{imports}
+print(time.perf_counter() - start)
+loaded = [name for name in ("google.generativeai", "gradio") if name in sys.modules]
+if loaded:
+    print("eagerly imported: " + ", ".join(loaded), file=sys.stderr)
+    sys.exit(2)
+"""
+
+def measure_once(modules: list) -> tuple:
+    """Import modules in a fresh interpreter, return (seconds, files created)"""
+    script = IMPORT_SCRIPT.format(
+        root=PROJECT_ROOT,
+        imports="\n".join(f"import {name}" for name in modules),
+    )
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ)
+        # make sure nothing is picked up from the caller's .env
+        env.pop("GOOGLE_API_KEY", None)
+        result = subprocess.run([sys.executable, "-c", script], cwd=workdir, env=env,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or "import failed")
+        created = []
+        for dirpath, _, filenames in os.walk(workdir):
+            created.extend(os.path.relpath(os.path.join(dirpath, f), workdir) for f in filenames)
+    return float(result.stdout.strip().splitlines()[-1]), created
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target-ms", type=float, default=1500.0,
+                        help="fail if the median import time is above this")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    args = parser.parse_args(argv)
+
+    timings = []
+    for _ in range(args.runs):
+        try:
+            seconds, created = measure_once(args.modules)
+        except RuntimeError as e:
+            print(f"FAIL import error: {e}")
+            return 1
+        if created:
+            print(f"FAIL importing {', '.join(args.modules)} created files: {created}")
+            return 1
+        timings.append(seconds * 1000)
+
+    median = statistics.median(timings)
+    print(f"import {', '.join(args.modules)}: median {median:.0f} ms, "
+          f"min {min(timings):.0f} ms, max {max(timings):.0f} ms "
+          f"(target {args.target_ms:.0f} ms, {args.runs} runs)")
+    if median > args.target_ms:
+        print("FAIL startup time above target")
+        return 1
+    print("OK")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,95 @@
 """Configuration for EternaLearn"""
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
 
 class Config:
     """Central configuration"""
     GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "")
     MODEL_NAME = "models/gemini-2.5-flash"
+    MODEL_BACKEND = os.getenv("MODEL_BACKEND", "gemini")  # "gemini" or "fake" (offline, no key needed)
+    FAKE_MODEL_LATENCY = "lognormal"  # "constant", "uniform" or "lognormal"
+    FAKE_MODEL_LATENCY_MEDIAN_SECONDS = 0.5
+    FAKE_MODEL_LATENCY_SIGMA = 0.4
+    FAKE_MODEL_ERROR_RATE = 0.0
+    FAKE_MODEL_SEED = 0
     TEMPERATURE = 0.7
     MAX_TOKENS = 2048
     ENABLE_SEARCH = True
     ENABLE_VISUAL_LEARNING = True #changes
+    DIAGRAM_DEADLINE_SECONDS = 8  # from the start of explain; later diagrams use the fallback
+    DIAGRAM_LIBRARY_ENABLED = True  # reuse curated and earlier diagrams before asking the model
+    DIAGRAM_LIBRARY_PATH = "./data/diagram_library.json"
+    TOPIC_INDEX_ENABLED = True  # answer paraphrased questions from one canonical topic
+    TOPIC_INDEX_PATH = "./data/topic_index.json"
+    TOPIC_MATCH_THRESHOLD = 0.75  # shingle Jaccard similarity needed to merge two misspelled topics
+    LLM_REQUESTS_PER_MINUTE = 15  # provider quota
+    LLM_TOKENS_PER_MINUTE = 250000
+    LLM_MAX_CONCURRENCY = 4  # model calls in flight, half of them at most for background work
+    LLM_MAX_RETRIES = 4  # transient errors only (quota, timeouts, 5xx)
+    LLM_BACKOFF_BASE_SECONDS = 1.0
+    LLM_BACKOFF_MAX_SECONDS = 30.0
+    LLM_BREAKER_THRESHOLD = 5  # consecutive transient failures before failing fast
+    LLM_BREAKER_RESET_SECONDS = 30
+    RESPONSE_CACHE_ENABLED = True
+    RESPONSE_CACHE_PATH = "./data/response_cache.db"
+    RESPONSE_CACHE_MEMORY_ITEMS = 512
+    RESPONSE_CACHE_TTL_SECONDS = 7 * 24 * 3600
+    RESPONSE_CACHE_MAX_MB = 100
+    QUIZ_POOL_ENABLED = True
+    QUIZ_POOL_PATH = "./data/quiz_pool.json"
+    QUIZ_POOL_DEPTH = 3  # ready quizzes kept per topic
+    QUIZ_POOL_POPULAR_TOPICS = 20
+    QUIZ_POOL_REFILL_INTERVAL_SECONDS = 300
+    QUIZ_POOL_RPM_SHARE = 0.25  # share of LLM_REQUESTS_PER_MINUTE refills may use
+    STATE_BACKEND = os.getenv("STATE_BACKEND", "json")  # "json", or "sqlite" to share the quiz pool and reviews across workers
+    STATE_DB_PATH = "./data/state.db"
+    REVIEW_SCHEDULER_ENABLED = True  # spaced-repetition (SM-2) reviews of quizzed topics
+    REVIEW_SCHEDULE_PATH = "./data/review_schedule.json"
+    REVIEW_COMPACT_EVERY = 1000  # journal records before a snapshot rewrite, at least one per item
+    REVIEW_PREFETCH_SECONDS = 3600  # the quiz pool stocks topics with reviews due this soon
+    MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "json")  # "json", "sharded" or "sqlite"
     MEMORY_BANK_PATH = "./data/memory_bank.json"
+    MEMORY_DB_PATH = "./data/memory_bank.db"
+    MEMORY_SHARD_DIR = "./data/students"
+    MEMORY_CACHE_SIZE = 1000  # profiles kept in RAM by the sharded backend
+    MEMORY_FLUSH_INTERVAL_SECONDS = 5
+    MEMORY_JOURNAL_ENABLED = True
+    MEMORY_COMPACT_EVERY = 1000  # journal records before a snapshot rewrite
+    MEMORY_JOURNAL_FSYNC = False
+    MEMORY_UPDATE_RETRIES = 5  # optimistic session updates retried after a version conflict
+    SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")  # "memory", or "sqlite" to share sessions across workers
+    SESSION_DB_PATH = "./data/sessions.db"
     SESSION_TIMEOUT_MINUTES = 30
+    STUDENT_LOCK_STRIPES = 64  # locks that serialize each student's updates
+    SESSION_SWEEP_INTERVAL_SECONDS = 60
+    MAX_CONTEXT_MESSAGES = 50  # messages kept in memory per session
+    HISTORY_COLD_STORE_DIR = None  # e.g. "./data/history" to keep older turns on disk
+    METRICS_ENABLED = True  # serve Prometheus metrics next to the web app
+    METRICS_PATH = "/metrics"
+    WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))  # more than one needs the sqlite memory, session and state backends
     LOG_LEVEL = "INFO"
     LOG_FILE = "eternallearn.log"
     
+    _loaded = False
+    
+    @classmethod
+    def load(cls):
+        """Read .env once, on first use rather than at import"""
+        if cls._loaded:
+            return
+        from dotenv import load_dotenv
+        
+        load_dotenv()
+        cls.GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", cls.GOOGLE_API_KEY)
+        cls.MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", cls.MEMORY_BACKEND)
+        cls.SESSION_BACKEND = os.getenv("SESSION_BACKEND", cls.SESSION_BACKEND)
+        cls.STATE_BACKEND = os.getenv("STATE_BACKEND", cls.STATE_BACKEND)
+        cls.WEB_WORKERS = int(os.getenv("WEB_WORKERS", cls.WEB_WORKERS))
+        cls.MODEL_BACKEND = os.getenv("MODEL_BACKEND", cls.MODEL_BACKEND)
+        cls._loaded = True
+    
     @classmethod
     def validate(cls):
+        cls.load()
         if not cls.GOOGLE_API_KEY:
             raise ValueError("GOOGLE_API_KEY not found in .env file")
         return True
-
-Config.validate()
\ No newline at end of file
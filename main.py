@@ -6,11 +6,14 @@ import asyncio
 from rich.console import Console
 from rich.panel import Panel
 from rich.markdown import Markdown
+from rich.live import Live
 from agents.coordinator import coordinator
 from services.memory_bank import memory_bank #new
 from agents.teacher_agent import teacher_agent
 from agents.quizzer_agent import quizzer_agent
 from agents.memory_agent import memory_agent
+from services.metrics import metrics, route_latency
+from services.intent_router import intent_router, INTENT_ANSWERS, INTENT_PROGRESS, INTENT_QUIZ
 from config import Config
 import logging
 
@@ -49,6 +52,7 @@ Your AI-powered adaptive learning companion.
 - Type any topic to learn
 - Say "quiz me on [topic]" to practice
 - Say "show my progress" for stats
+- Type "metrics" for latency, token and cache metrics
 - Type "exit" to quit
 
 Let's make learning eternal :)
@@ -57,39 +61,57 @@ Let's make learning eternal :)
     
     def process_message(self, message: str) -> str:
         """Process student message"""
-        message_lower = message.lower()
-        
-        if message_lower in ["progress", "show my progress", "my stats"]:
-            return self.memory.get_progress(self.current_student)
-        
-        if "quiz" in message_lower:
-            from services.session_service import session_service
-            session = session_service.get_or_create_session(self.current_student)
+        target, route, session = self._route(message)
+        with route_latency.time(route=target):
+            if target == INTENT_PROGRESS:
+                return self.memory.get_progress(self.current_student)
+            if target == INTENT_ANSWERS:
+                return self.quizzer.evaluate_answers(self.current_student, message)
+            if target == INTENT_QUIZ:
+                return self.quizzer.generate_quiz(message, self._quiz_context(message, route, session))
             
-            context = {
-                "agent": "quizzer",
-                "session": session,
-                "profile": memory_bank.get_student_profile(self.current_student),
-                "original_message": message
-            }
-            
-            return self.quizzer.generate_quiz(message, context)
-        
-        # check if quiz answers
-        if any(c.isdigit() and '.' in message for c in message):
+            # route through coordinator
+            return self.coordinator.coordinate_response(
+                self.current_student, message, 
+                self.teacher, self.quizzer, self.memory
+            )
+    
+    def process_message_stream(self, message: str):
+        """Yield the response in chunks as it is generated"""
+        target, route, session = self._route(message)
+        with route_latency.time(route=target):
+            if target == INTENT_PROGRESS:
+                yield self.memory.get_progress(self.current_student)
+            elif target == INTENT_ANSWERS:
+                yield self.quizzer.evaluate_answers(self.current_student, message)
+            elif target == INTENT_QUIZ:
+                yield from self.quizzer.generate_quiz_stream(
+                    message, self._quiz_context(message, route, session))
+            else:
+                # route through coordinator
+                yield from self.coordinator.coordinate_response_stream(
+                    self.current_student, message, 
+                    self.teacher, self.quizzer, self.memory
+                )
+    
+    def _route(self, message: str):
+        """Classify a message, returns (target, route, session)"""
+        route = intent_router.classify(message)
+        session = None
+        if route.answers or route.intent == INTENT_QUIZ:
             from services.session_service import session_service
             session = session_service.get_or_create_session(self.current_student)
-            
-            if "current_quiz" in session.context:
-                return self.quizzer.evaluate_answers(
-                    self.current_student, message, session
-                )
-        
-        # route through coordinator
-        return self.coordinator.coordinate_response(
-            self.current_student, message, 
-            self.teacher, self.quizzer, self.memory
-        )
+        quiz_active = session is not None and "current_quiz" in session.context
+        return route.target(quiz_active), route, session
+    
+    def _quiz_context(self, message: str, route, session) -> dict:
+        return {
+            "agent": "quizzer",
+            "session": session,
+            "profile": memory_bank.get_student_profile(self.current_student, include_history=False),
+            "original_message": message,
+            "route": route
+        }
     
     def run_interactive(self):
         """Run interactive mode"""
@@ -107,9 +129,17 @@ Let's make learning eternal :)
                     console.print("\n[bold green]Happy learning![/bold green]")
                     break
                 
+                if user_input.lower() in ["metrics", "/metrics"]:
+                    console.print(metrics.render(skip_empty=True), markup=False, highlight=False)
+                    continue
+                
                 console.print("\n[bold yellow]EternaLearn:[/bold yellow]")
-                response = self.process_message(user_input)
-                console.print(Panel(Markdown(response), style="green"))
+                response = ""
+                with Live(Panel(Markdown(response), style="green"), console=console,
+                          refresh_per_second=8) as live:
+                    for chunk in self.process_message_stream(user_input):
+                        response += chunk
+                        live.update(Panel(Markdown(response), style="green"))
                 
             except KeyboardInterrupt:
                 console.print("\n\n[bold red]Goodbye![/bold red]")
@@ -1,5 +1,28 @@
 """EternaLearn Services"""
-from .session_service import session_service, Session
+from .session_service import session_service, Session, Message, JsonlColdStore, SQLiteSessionStore
 from .memory_bank import memory_bank, MemoryBank
+from .memory_storage import (MemoryStorage, JsonStorage, ShardedJsonStorage, SQLiteStorage,
+                             VersionConflictError)
+from .response_cache import response_cache, ResponseCache
+from .llm_service import llm_service, LLMService
+from .llm_scheduler import LLMScheduler, CircuitOpenError
+from .single_flight import SingleFlight
+from .quiz_pool import quiz_pool, QuizPool
+from .quiz import Quiz, Question
+from .model_registry import model_registry, ModelRegistry
+from .model_backends import ModelBackend, GeminiBackend, FakeBackend
+from .metrics import metrics, MetricsRegistry
+from .intent_router import intent_router, IntentRouter, Route
+from .topic_index import topic_index, TopicIndex
+from .analytics import QuizHistory, cohort_report
+from .review_scheduler import review_scheduler, ReviewScheduler
 
-__all__ = ['session_service', 'Session', 'memory_bank', 'MemoryBank']
\ No newline at end of file
+__all__ = ['session_service', 'Session', 'Message', 'JsonlColdStore', 'SQLiteSessionStore',
+           'memory_bank', 'MemoryBank',
+           'MemoryStorage', 'JsonStorage', 'ShardedJsonStorage', 'SQLiteStorage', 'VersionConflictError',
+           'response_cache', 'ResponseCache', 'llm_service', 'LLMService',
+           'LLMScheduler', 'CircuitOpenError', 'SingleFlight',
+           'quiz_pool', 'QuizPool', 'Quiz', 'Question', 'model_registry', 'ModelRegistry',
+           'ModelBackend', 'GeminiBackend', 'FakeBackend', 'metrics', 'MetricsRegistry',
+           'intent_router', 'IntentRouter', 'Route', 'topic_index', 'TopicIndex',
+           'QuizHistory', 'cohort_report', 'review_scheduler', 'ReviewScheduler']
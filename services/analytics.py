@@ -0,0 +1,316 @@
+"""Analytics - Columnar quiz history and cohort-wide statistics
+
+Quiz history is exported once into flat NumPy columns, one row per quiz,
+with students and topics interned to integer codes. Everything else works
+on those columns with vectorized operations (bincount, sort, matrix
+products) instead of walking nested profile dicts, so a 100k-student cohort
+is analyzed in a fraction of a second.
+
+NumPy is imported on first use; pyarrow is only needed for to_parquet.
+"""
+from .student_profile import ROLLING_WINDOW, WEAK_THRESHOLD
+
+# a student is at risk after this many quizzes if their recent mean is below
+# WEAK_THRESHOLD or their scores fall by AT_RISK_DECLINE or more per quiz
+AT_RISK_MIN_ATTEMPTS = 3
+AT_RISK_DECLINE = -0.05
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("Cohort analytics need NumPy: pip install numpy")
+    return numpy
+
+class QuizHistory:
+    """Quiz history as columns, the layout of a Parquet table
+
+    ``student`` and ``topic`` are int32 codes into the ``students`` and
+    ``topics`` lists (dictionary encoding), ``taken_at`` is datetime64[s],
+    ``score`` float32 and the question counts int16. Rows are grouped by
+    student, oldest quiz first.
+    """
+
+    COLUMNS = ("student", "topic", "taken_at", "score", "total_questions", "correct_answers")
+
+    def __init__(self, students, topics, student, topic, taken_at, score,
+                 total_questions, correct_answers):
+        self.students = list(students)
+        self.topics = list(topics)
+        self.student = student
+        self.topic = topic
+        self.taken_at = taken_at
+        self.score = score
+        self.total_questions = total_questions
+        self.correct_answers = correct_answers
+
+    @classmethod
+    def from_rows(cls, rows) -> "QuizHistory":
+        """Build the columns from MemoryStorage.quiz_rows() tuples"""
+        np = _numpy()
+        students = {}
+        topics = {}
+        student_codes = []
+        topic_codes = []
+        timestamps = []
+        scores = []
+        totals = []
+        corrects = []
+        for student_id, timestamp, topic, score, total, correct in rows:
+            student_codes.append(students.setdefault(student_id, len(students)))
+            topic_codes.append(topics.setdefault(topic, len(topics)))
+            timestamps.append(timestamp)
+            scores.append(score)
+            totals.append(total)
+            corrects.append(correct)
+        return cls(
+            students, topics,
+            np.array(student_codes, dtype=np.int32),
+            np.array(topic_codes, dtype=np.int32),
+            # ISO strings are parsed in C by datetime64
+            np.array(timestamps, dtype="datetime64[us]").astype("datetime64[s]"),
+            np.array(scores, dtype=np.float32),
+            np.array(totals, dtype=np.int16),
+            np.array(corrects, dtype=np.int16),
+        )
+
+    def __len__(self):
+        return len(self.student)
+
+    def save(self, path: str):
+        """Write the columns to one compressed .npz file"""
+        np = _numpy()
+        np.savez_compressed(path, students=np.array(self.students, dtype=str),
+                            topics=np.array(self.topics, dtype=str),
+                            **{name: getattr(self, name) for name in self.COLUMNS})
+
+    @classmethod
+    def load(cls, path: str) -> "QuizHistory":
+        np = _numpy()
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["students"].tolist(), data["topics"].tolist(),
+                       *(data[name] for name in cls.COLUMNS))
+
+    def to_parquet(self, path: str):
+        """Write a Parquet file with dictionary-encoded student and topic columns"""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet export needs pyarrow: pip install pyarrow")
+        table = pa.table({
+            "student": pa.DictionaryArray.from_arrays(self.student, pa.array(self.students)),
+            "topic": pa.DictionaryArray.from_arrays(self.topic, pa.array(self.topics)),
+            "taken_at": self.taken_at,
+            "score": self.score,
+            "total_questions": self.total_questions,
+            "correct_answers": self.correct_answers,
+        })
+        pq.write_table(table, path)
+
+def _grouped(history: QuizHistory):
+    """(order, starts, counts) of the rows by student; order is None when already grouped"""
+    np = _numpy()
+    codes = history.student
+    order = None
+    if len(codes) > 1 and (codes[1:] < codes[:-1]).any():
+        order = np.argsort(codes, kind="stable")
+        codes = codes[order]
+    counts = np.bincount(codes, minlength=len(history.students))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return order, starts, counts
+
+def _students_per_topic(history: QuizHistory, max_cells: int = 50_000_000):
+    """How many different students took each topic"""
+    np = _numpy()
+    topics = len(history.topics)
+    cells = history.student.astype(np.int64) * topics + history.topic
+    if len(history.students) * topics <= max_cells:
+        taken = np.bincount(cells, minlength=len(history.students) * topics) > 0
+        return taken.reshape(-1, topics).sum(axis=0)
+    return np.bincount(np.unique(cells) % topics, minlength=topics)
+
+def topic_difficulty(history: QuizHistory, percentiles=(10, 25, 50, 75, 90)) -> list:
+    """Attempts, students, mean and score percentiles per topic, hardest first"""
+    np = _numpy()
+    topics = len(history.topics)
+    if not len(history):
+        return []
+    attempts = np.bincount(history.topic, minlength=topics)
+    means = np.bincount(history.topic, weights=history.score, minlength=topics) / np.maximum(attempts, 1)
+    students = _students_per_topic(history)
+
+    # scores lie in [0, 1], so 2 * topic + score sorts by topic, then score, in
+    # one float sort; every topic's percentiles are then index arithmetic
+    codes = history.topic.astype(np.float64)
+    keys = np.sort(2 * codes + np.clip(history.score, 0.0, 1.0))
+    starts = np.concatenate(([0], np.cumsum(attempts)[:-1]))
+    scores = keys - 2 * np.repeat(np.arange(topics, dtype=np.float64), attempts)
+    quantiles = {}
+    for pct in percentiles:
+        position = starts + (pct / 100.0) * np.maximum(attempts - 1, 0)
+        low = np.floor(position).astype(np.int64)
+        high = np.minimum(low + 1, starts + np.maximum(attempts - 1, 0))
+        quantiles[pct] = scores[low] + (scores[high] - scores[low]) * (position - low)
+
+    report = []
+    for code in np.argsort(means, kind="stable"):
+        if not attempts[code]:
+            continue
+        row = {"topic": history.topics[code], "attempts": int(attempts[code]),
+               "students": int(students[code]), "mean": round(float(means[code]), 4)}
+        for pct in percentiles:
+            row[f"p{pct}"] = round(float(quantiles[pct][code]), 4)
+        report.append(row)
+    return report
+
+def score_distribution(history: QuizHistory, bins: int = 10, topic: str = None) -> dict:
+    """Histogram of scores in [0, 1], for one topic or all of them"""
+    np = _numpy()
+    scores = history.score
+    if topic is not None:
+        scores = scores[history.topic == history.topics.index(topic)] if topic in history.topics \
+            else scores[:0]
+    counts, edges = np.histogram(scores, bins=bins, range=(0.0, 1.0))
+    return {"edges": [round(float(edge), 4) for edge in edges], "counts": counts.tolist()}
+
+def student_trends(history: QuizHistory, window: int = ROLLING_WINDOW) -> dict:
+    """Per-student arrays: attempts, mean, recent (last window) mean and slope
+
+    slope is the least-squares change in score per quiz taken, 0 for
+    students with a single quiz. Arrays are indexed by student code.
+    """
+    np = _numpy()
+    order, starts, counts = _grouped(history)
+    codes = history.student if order is None else history.student[order]
+    scores = (history.score if order is None else history.score[order]).astype(np.float64)
+    students = len(history.students)
+
+    # x is the quiz number within the student's own history
+    x = np.arange(len(codes), dtype=np.float64) - starts[codes]
+    n = counts.astype(np.float64)
+    sum_x = np.bincount(codes, weights=x, minlength=students)
+    sum_y = np.bincount(codes, weights=scores, minlength=students)
+    sum_xy = np.bincount(codes, weights=x * scores, minlength=students)
+    sum_xx = np.bincount(codes, weights=x * x, minlength=students)
+    denominator = n * sum_xx - sum_x * sum_x
+    slope = np.divide(n * sum_xy - sum_x * sum_y, denominator,
+                      out=np.zeros(students), where=denominator > 0)
+
+    recent = x >= (counts[codes] - window)
+    recent_count = np.bincount(codes[recent], minlength=students)
+    recent_sum = np.bincount(codes[recent], weights=scores[recent], minlength=students)
+    return {
+        "students": history.students,
+        "attempts": counts,
+        "mean": sum_y / np.maximum(n, 1),
+        "recent_mean": recent_sum / np.maximum(recent_count, 1),
+        "slope": slope,
+    }
+
+def _at_risk(trends: dict, threshold: float, min_attempts: int, decline: float):
+    """Codes of the flagged students, lowest recent mean first"""
+    np = _numpy()
+    judged = trends["attempts"] >= min_attempts
+    flagged = np.flatnonzero(judged & ((trends["recent_mean"] < threshold) |
+                                      (trends["slope"] <= decline)))
+    return flagged[np.argsort(trends["recent_mean"][flagged], kind="stable")]
+
+def _describe_students(history: QuizHistory, trends: dict, codes) -> list:
+    return [{"student_id": history.students[code],
+             "attempts": int(trends["attempts"][code]),
+             "mean": round(float(trends["mean"][code]), 4),
+             "recent_mean": round(float(trends["recent_mean"][code]), 4),
+             "slope": round(float(trends["slope"][code]), 4)}
+            for code in codes]
+
+def at_risk_students(history: QuizHistory, threshold: float = WEAK_THRESHOLD,
+                     min_attempts: int = AT_RISK_MIN_ATTEMPTS, decline: float = AT_RISK_DECLINE,
+                     limit: int = None) -> list:
+    """Students whose recent scores are below threshold or falling, lowest first"""
+    trends = student_trends(history)
+    codes = _at_risk(trends, threshold, min_attempts, decline)
+    return _describe_students(history, trends, codes[:limit])
+
+def weak_area_matrix(history: QuizHistory, threshold: float = WEAK_THRESHOLD,
+                     max_topics: int = 50):
+    """(students with a weak topic, topic codes, 0/1 matrix of weak topics)
+
+    A topic is weak for a student when their mean score on it is below
+    threshold. Only the max_topics most attempted topics are columns.
+    """
+    np = _numpy()
+    attempts = np.bincount(history.topic, minlength=len(history.topics))
+    columns = np.argsort(-attempts, kind="stable")[:max_topics]
+    columns = columns[attempts[columns] > 0]
+    column_of = np.full(len(history.topics), -1, dtype=np.int64)
+    column_of[columns] = np.arange(len(columns))
+
+    keep = column_of[history.topic] >= 0
+    cells = history.student[keep].astype(np.int64) * len(columns) + column_of[history.topic[keep]]
+    size = len(history.students) * len(columns)
+    count = np.bincount(cells, minlength=size)
+    total = np.bincount(cells, weights=history.score[keep], minlength=size)
+    weak = (count > 0) & (total < threshold * count)
+    matrix = weak.reshape(len(history.students), len(columns)).astype(np.float32)
+    rows = np.flatnonzero(matrix.any(axis=1))
+    return rows, columns, matrix[rows]
+
+def weak_area_clusters(history: QuizHistory, clusters: int = 6, max_topics: int = 50,
+                       iterations: int = 20, seed: int = 0) -> list:
+    """Group students by which topics they are weak in (k-means), largest group first
+
+    Each group lists its defining topics (weak for at least half its
+    members) and its student ids.
+    """
+    np = _numpy()
+    rows, columns, matrix = weak_area_matrix(history, max_topics=max_topics)
+    if not len(rows):
+        return []
+    k = min(clusters, len(rows))
+    rng = np.random.default_rng(seed)
+    centroids = matrix[rng.choice(len(rows), size=k, replace=False)]
+    squared = (matrix * matrix).sum(axis=1)[:, None]
+    labels = None
+    for _ in range(iterations):
+        # squared distances through one matrix product
+        distances = squared - 2 * matrix @ centroids.T + (centroids * centroids).sum(axis=1)
+        new_labels = distances.argmin(axis=1)
+        if labels is not None and (new_labels == labels).all():
+            break
+        labels = new_labels
+        sizes = np.bincount(labels, minlength=k)
+        members = np.zeros((k, len(rows)), dtype=np.float32)
+        members[labels, np.arange(len(rows))] = 1.0
+        sums = members @ matrix
+        filled = sizes > 0
+        centroids[filled] = sums[filled] / sizes[filled, None]
+
+    groups = []
+    for cluster in np.argsort(-np.bincount(labels, minlength=k), kind="stable"):
+        members = rows[labels == cluster]
+        if not len(members):
+            continue
+        share = centroids[cluster]
+        defining = np.argsort(-share, kind="stable")
+        groups.append({
+            "size": int(len(members)),
+            "topics": [history.topics[columns[c]] for c in defining if share[c] >= 0.5],
+            "students": [history.students[code] for code in members],
+        })
+    return groups
+
+def cohort_report(history: QuizHistory, at_risk_limit: int = 20, clusters: int = 6) -> dict:
+    """Topic difficulty, score distribution, at-risk students and weak-area groups"""
+    trends = student_trends(history)
+    at_risk = _at_risk(trends, WEAK_THRESHOLD, AT_RISK_MIN_ATTEMPTS, AT_RISK_DECLINE)
+    return {
+        "students": len(history.students),
+        "quizzes": len(history),
+        "topics": topic_difficulty(history),
+        "score_distribution": score_distribution(history),
+        "at_risk_count": int(len(at_risk)),
+        "at_risk": _describe_students(history, trends, at_risk[:at_risk_limit]),
+        "weak_area_groups": [dict(group, students=group["students"][:at_risk_limit])
+                             for group in weak_area_clusters(history, clusters=clusters)],
+    }
@@ -0,0 +1,53 @@
+"""Async Runner - Lets synchronous callers use the async agent API"""
+import asyncio
+import threading
+
+class AsyncRunner:
+    """Runs coroutines on one long-lived background event loop
+
+    Async model clients bind to the loop they were first used on, so the
+    sync wrappers share a single loop instead of calling ``asyncio.run`` per
+    request.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever,
+                                                name="async-runner", daemon=True)
+                self._thread.start()
+        return self._loop
+
+    def run(self, coro):
+        """Block until coro finishes on the background loop and return its result"""
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("run_sync() called from the async runner's own loop")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+async_runner = AsyncRunner()
+
+def run_sync(coro):
+    """Run a coroutine from synchronous code"""
+    return async_runner.run(coro)
+
+def iterate_sync(agen):
+    """Iterate an async generator from synchronous code"""
+    async def next_item():
+        return await agen.__anext__()
+
+    try:
+        while True:
+            try:
+                yield run_sync(next_item())
+            except StopAsyncIteration:
+                return
+    finally:
+        run_sync(agen.aclose())
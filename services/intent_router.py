@@ -0,0 +1,123 @@
+"""Intent Router - One compiled pass over a message picks its route"""
+import re
+
+INTENT_ANSWERS = "answers"
+INTENT_PROGRESS = "progress"
+INTENT_QUIZ = "quiz"
+INTENT_EXPLAIN = "explain"
+
+# (intent, keywords) in priority order; keywords match whole words, any case
+ROUTING_RULES = [
+    (INTENT_PROGRESS, ["progress", "stats", "my stats", "how am i doing"]),
+    (INTENT_QUIZ, ["quiz", "quizzes", "test me", "practice questions"]),
+]
+
+# quiz phrasings that name the topic; the match starting earliest wins
+TOPIC_PATTERNS = [
+    r"\b(?:quiz|test) me (?:on|about) (?P<topic>.+)",
+    r"\bquiz (?:on|about) (?P<topic>.+)",
+    r"^(?P<topic>.+?) quiz\b(?! (?:on|about) )",
+]
+
+# "1.A", "2. b" and "3)C" all count as an answer
+ANSWER_PATTERN = r"\b(?P<number>\d+)\s*[.)]\s*(?P<letter>[a-dA-D])\b"
+
+# "give me a" in front of the topic and a trailing "please" are not part of it
+_TOPIC_LEAD = re.compile(r"(?:(?:give|make|create) me\b\s*)?(?:an?\b\s*)?(?:(?:short|quick)\b\s*)?")
+_TOPIC_TRAIL = " ?!.,"
+
+class Route:
+    """What a message asks for: intent, quiz topic and any quiz answers"""
+
+    __slots__ = ("intent", "topic", "answers")
+
+    def __init__(self, intent: str, topic: str = None, answers: dict = None):
+        self.intent = intent
+        self.topic = topic
+        self.answers = answers or {}
+
+    def target(self, quiz_active: bool = False) -> str:
+        """Handler for the message, answers only count while a quiz waits for them"""
+        if self.answers and quiz_active:
+            return INTENT_ANSWERS
+        return self.intent
+
+    def __repr__(self):
+        return f"Route({self.intent!r}, topic={self.topic!r}, answers={self.answers!r})"
+
+class IntentRouter:
+    """Classifies messages with a single precompiled regex
+
+    All rule keywords and the answer pattern are alternatives of one
+    pattern, so a message is scanned once whatever the number of rules.
+    Earlier rules win when a message matches several.
+    """
+
+    def __init__(self, rules=None, topic_patterns=None, default: str = INTENT_EXPLAIN):
+        self.rules = [(intent, list(keywords)) for intent, keywords in (rules or ROUTING_RULES)]
+        self.topic_patterns = list(topic_patterns or TOPIC_PATTERNS)
+        self.default = default
+        self._compile()
+
+    def _compile(self):
+        alternatives = [f"(?P<{INTENT_ANSWERS}>{ANSWER_PATTERN})"]
+        self._groups = {}
+        for index, (intent, keywords) in enumerate(self.rules):
+            # longest first so "my stats" is preferred over "stats"
+            words = "|".join(re.escape(k.lower()) for k in sorted(keywords, key=len, reverse=True))
+            self._groups[f"rule{index}"] = index
+            alternatives.append(f"(?P<rule{index}>\\b(?:{words})\\b)")
+        self._pattern = re.compile("|".join(alternatives))
+        self._answers = re.compile(ANSWER_PATTERN)
+        self._topic = re.compile("|".join(
+            f"(?:{pattern.replace('(?P<topic>', f'(?P<topic{index}>')})"
+            for index, pattern in enumerate(self.topic_patterns)
+        ))
+
+    def add_rule(self, intent: str, keywords, priority: int = None):
+        """Add keywords for an intent, at the end of the rule table unless priority is given"""
+        rule = (intent, list(keywords))
+        if priority is None:
+            self.rules.append(rule)
+        else:
+            self.rules.insert(priority, rule)
+        self._compile()
+
+    def classify(self, message: str) -> Route:
+        """Intent, topic and answers of a message"""
+        text = (message or "").lower()
+        best = None
+        answers = {}
+        for match in self._pattern.finditer(text):
+            group = match.lastgroup
+            if group == INTENT_ANSWERS:
+                answers[int(match.group("number"))] = match.group("letter").upper()
+            else:
+                index = self._groups[group]
+                if best is None or index < best:
+                    best = index
+        intent = self.rules[best][0] if best is not None else self.default
+        topic = self._extract_topic(text) if intent == INTENT_QUIZ else None
+        return Route(intent, topic, answers)
+
+    def extract_topic(self, message: str) -> str:
+        """Topic named in a quiz request, None when there is none"""
+        return self._extract_topic((message or "").lower())
+
+    def _extract_topic(self, text: str) -> str:
+        match = self._topic.search(text.strip())
+        if match is None:
+            return None
+        topic = next(value for value in match.groups() if value is not None)
+        topic = topic.rstrip(_TOPIC_TRAIL)
+        if topic.endswith(" please"):
+            topic = topic[:-7].rstrip(_TOPIC_TRAIL)
+        topic = topic[_TOPIC_LEAD.match(topic).end():].strip()
+        return topic or None
+
+    def parse_answers(self, message: str) -> dict:
+        """Question number to answer letter, e.g. {1: "A", 2: "C"}"""
+        return {int(number): letter.upper()
+                for number, letter in self._answers.findall(message or "")}
+
+intent_router = IntentRouter()
@@ -0,0 +1,174 @@
+"""Journal - Append-only JSON-lines log folded into a snapshot file by compaction"""
+import json
+import logging
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows, where only a single worker is supported
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+def write_atomic(path: Path, data: str, fsync: bool = True):
+    """Write data to a temp file and swap it into place"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # one temp file per writer, so concurrent writers never swap in each other's half
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+@contextmanager
+def file_lock(path: Path):
+    """Hold an exclusive lock on ``<path>.lock`` across worker processes"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+class Journal:
+    """Mutation records appended to ``<snapshot>.journal`` between snapshot rewrites
+
+    Every record gets the next ``seq``. The owner's snapshot stores the seq
+    it covers, so replay skips older records. Compaction moves the journal
+    aside to ``.journal.compacting``, writes the snapshot and only then
+    drops the records it folded in; appends meanwhile go to a fresh journal.
+    Only one compaction runs at a time: ``compact`` claims ``compacting``
+    under the lock. All methods except ``compact`` expect the caller to hold
+    ``lock``, the lock that guards the owner's state.
+    """
+
+    def __init__(self, snapshot_path: Path, lock, fsync: bool = False, name: str = "journal"):
+        self.snapshot_path = Path(snapshot_path)
+        self.path = self.snapshot_path.with_name(self.snapshot_path.name + ".journal")
+        self.rotated_path = self.path.with_name(self.path.name + ".compacting")
+        self.lock = lock
+        self.fsync = fsync
+        self.name = name
+        self.seq = 0
+        self.records = 0  # appended since the last successful compaction
+        self.compacting = False
+        self._file = None
+
+    def replay(self, start_seq: int, apply) -> int:
+        """Call apply(record) for each record newer than start_seq, returns how many"""
+        self.seq = start_seq
+        applied = 0
+        for path in (self.rotated_path, self.path):
+            applied += self._replay_file(path, apply)
+        self.records = applied
+        return applied
+
+    def _replay_file(self, path: Path, apply) -> int:
+        if not path.exists():
+            return 0
+        applied = 0
+        offset = 0
+        with open(path, 'rb+') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # torn write from a crash mid-append, drop it so new appends start clean
+                    logger.warning(f"Discarding truncated {self.name} record in {path}")
+                    f.truncate(offset)
+                    break
+                offset += len(line)
+                if record["seq"] <= self.seq:
+                    continue
+                apply(record)
+                self.seq = record["seq"]
+                applied += 1
+        return applied
+
+    def interrupted(self) -> bool:
+        """True when a compaction did not finish, the owner should write a snapshot"""
+        return self.rotated_path.exists()
+
+    def reset(self):
+        """Forget every record, after the owner wrote a snapshot holding them all"""
+        self.close()
+        self.path.unlink(missing_ok=True)
+        self.rotated_path.unlink(missing_ok=True)
+        self.records = 0
+
+    def append(self, record: dict):
+        """Write one record, stamped with the next seq"""
+        self.seq += 1
+        record["seq"] = self.seq
+        if self._file is None:
+            self._file = open(self.path, 'a')
+        self._file.write(json.dumps(record, separators=(',', ':')) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.records += 1
+
+    def compaction_due(self, threshold: int) -> bool:
+        """True once threshold records piled up and no compaction runs"""
+        return self.records >= threshold and not self.compacting
+
+    def compact(self, snapshot, on_done=None) -> bool:
+        """Fold the journal into a new snapshot, snapshot() returns its text
+
+        snapshot() runs under the lock and must record ``seq``. Returns False
+        without doing anything while another compaction runs, since an
+        overlapping one could swap in an older snapshot after a newer one.
+        """
+        with self.lock:
+            if self.compacting:
+                return False
+            self.compacting = True
+        try:
+            with self.lock:
+                data = snapshot()
+                self.close()
+                self._rotate()
+                compacted = self.records
+            write_atomic(self.snapshot_path, data)
+            self.rotated_path.unlink(missing_ok=True)
+            with self.lock:
+                # only now are those records safe in the snapshot
+                self.records -= compacted
+            if on_done is not None:
+                on_done()
+            return True
+        except Exception as e:
+            logger.error(f"{self.name.capitalize()} compaction failed: {e}")
+            return False
+        finally:
+            self.compacting = False
+
+    def _rotate(self):
+        """Move the journal aside, after the records a failed compaction left there"""
+        if not self.path.exists():
+            return
+        if self.rotated_path.exists():
+            with open(self.path, 'rb') as src, open(self.rotated_path, 'ab') as dst:
+                shutil.copyfileobj(src, dst)
+            self.path.unlink()
+        else:
+            os.replace(self.path, self.rotated_path)
+
+    def close(self):
+        """Flush and close the journal file"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
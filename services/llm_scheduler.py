@@ -0,0 +1,331 @@
+"""LLM Scheduler - Rate limits, prioritizes and retries model calls"""
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+TRANSIENT_ERRORS = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "BadGateway", "Aborted",
+}
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the model while the circuit breaker is open"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Model calls paused after repeated failures, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+def is_transient(error: Exception) -> bool:
+    """True for quota, timeout and server errors that are worth retrying"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in TRANSIENT_ERRORS:
+        return True
+    code = getattr(error, "code", None)
+    return isinstance(code, int) and code in TRANSIENT_STATUS_CODES
+
+def estimate_tokens(prompt: str, max_output_tokens: int) -> int:
+    """Rough prompt size (4 chars per token) plus the output allowance"""
+    return len(prompt) // 4 + max_output_tokens
+
+class TokenBucket:
+    """Refills at rate_per_minute up to one minute's worth of capacity"""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount is available, 0 if it is available now"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        """Give back (or with a negative amount, charge) tokens after the fact"""
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "tokens", "loop", "future", "admitted", "cancelled")
+
+    def __init__(self, priority, seq, tokens, loop, future):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.loop = loop
+        self.future = future
+        self.admitted = False
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+class LLMScheduler:
+    """Admits model calls by priority under a concurrency cap and rate limits
+
+    Interactive calls always go ahead of queued background calls, and
+    background calls never take more than background_limit slots. Transient
+    failures are retried with jittered exponential backoff; after
+    breaker_threshold failures in a row the circuit opens and calls fail fast
+    until breaker_reset_seconds have passed and a probe call succeeds.
+
+    State is guarded by a thread lock and waiters are woken on their own
+    loop, so callers on the async runner and on gradio's loop share limits.
+    """
+
+    def __init__(self, requests_per_minute: float = 15, tokens_per_minute: float = 250000,
+                 max_concurrency: int = 4, background_limit: int = None,
+                 max_retries: int = 4, backoff_base: float = 1.0, backoff_max: float = 30.0,
+                 breaker_threshold: int = 5, breaker_reset_seconds: float = 30.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.background_limit = background_limit or max(1, max_concurrency // 2)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset_seconds = breaker_reset_seconds
+        self._queue = []
+        self._seq = itertools.count()
+        self._active = {PRIORITY_INTERACTIVE: 0, PRIORITY_BACKGROUND: 0}
+        self._lock = threading.Lock()
+        self._timer = None
+        self._failures = 0
+        self._opened_at = None
+        self._probe_started = None
+        self.counters = {"calls": 0, "retries": 0, "failures": 0, "rejected": 0}
+
+    # circuit breaker
+
+    def _check_breaker(self):
+        """Raise while open; after the reset period let a single probe through"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            now = time.monotonic()
+            waited = now - self._opened_at
+            # a probe that never reported back (e.g. cancelled) stops blocking after a period
+            probe_pending = (self._probe_started is not None
+                             and now - self._probe_started < self.breaker_reset_seconds)
+            if waited >= self.breaker_reset_seconds and not probe_pending:
+                self._probe_started = now
+                return
+            self.counters["rejected"] += 1
+            raise CircuitOpenError(max(self.breaker_reset_seconds - waited, 1.0))
+
+    def _record(self, ok: bool, transient: bool):
+        with self._lock:
+            was_probe = self._probe_started is not None
+            self._probe_started = None
+            if ok:
+                if self._opened_at is not None:
+                    logger.info("Model circuit closed")
+                self._failures = 0
+                self._opened_at = None
+                return
+            self.counters["failures"] += 1
+            if not transient:
+                return
+            self._failures += 1
+            if was_probe or self._failures >= self.breaker_threshold:
+                if self._opened_at is None or was_probe:
+                    logger.warning(f"Model circuit opened after {self._failures} failures")
+                self._opened_at = time.monotonic()
+
+    @property
+    def circuit_state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            waited = time.monotonic() - self._opened_at
+            if self._probe_started is not None or waited >= self.breaker_reset_seconds:
+                return "half-open"
+            return "open"
+
+    # admission
+
+    def _dispatch(self):
+        """Admit queued waiters in priority order while limits allow"""
+        with self._lock:
+            while self._queue:
+                head = self._queue[0]
+                if head.cancelled:
+                    heapq.heappop(self._queue)
+                    continue
+                if sum(self._active.values()) >= self.max_concurrency:
+                    return
+                if (head.priority == PRIORITY_BACKGROUND
+                        and self._active[PRIORITY_BACKGROUND] >= self.background_limit):
+                    return
+                now = time.monotonic()
+                delay = max(self.requests.wait_time(1, now),
+                            self.tokens.wait_time(head.tokens, now))
+                if delay > 0:
+                    self._schedule_dispatch(delay)
+                    return
+                heapq.heappop(self._queue)
+                self.requests.take(1)
+                self.tokens.take(head.tokens)
+                self._active[head.priority] += 1
+                head.admitted = True
+                head.loop.call_soon_threadsafe(_wake, head.future)
+
+    def _schedule_dispatch(self, delay: float):
+        if self._timer is not None and self._timer.is_alive():
+            return
+        self._timer = threading.Timer(delay, self._dispatch)
+        self._timer.daemon = True
+        self._timer.start()
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE, tokens: int = 0):
+        """Wait for a call slot, raises CircuitOpenError while the circuit is open"""
+        self._check_breaker()
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, next(self._seq), tokens, loop, loop.create_future())
+        with self._lock:
+            heapq.heappush(self._queue, waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except BaseException:
+            with self._lock:
+                waiter.cancelled = True
+                admitted = waiter.admitted
+            if admitted:
+                self.release(priority)
+            raise
+        return waiter
+
+    def release(self, priority: int, reserved_tokens: int = 0, used_tokens: int = None):
+        """Free a call slot and settle the token estimate against actual usage"""
+        with self._lock:
+            self._active[priority] -= 1
+            if used_tokens is not None:
+                self.tokens.refund(reserved_tokens - used_tokens)
+        self._dispatch()
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry attempt"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def run(self, call, priority: int = PRIORITY_INTERACTIVE, tokens: int = 0):
+        """Run call() (a coroutine function) under the limits, retrying transient errors
+
+        tokens is the estimated cost reserved up front; it is settled against
+        the response's usage metadata when the provider reports it.
+        """
+        attempt = 0
+        while True:
+            await self.acquire(priority, tokens)
+            used = None
+            try:
+                result = await call()
+                used = usage_tokens(result)
+            except Exception as e:
+                self.release(priority)
+                transient = is_transient(e)
+                self._record(False, transient)
+                if not transient or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                attempt += 1
+                self.counters["retries"] += 1
+                logger.warning(f"Transient model error ({type(e).__name__}), "
+                               f"retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            self.release(priority, tokens, used)
+            self._record(True, False)
+            self.counters["calls"] += 1
+            return result
+
+    async def stream(self, open_stream, priority: int = PRIORITY_INTERACTIVE, tokens: int = 0):
+        """Yield from open_stream() under the limits, holding the slot until it ends
+
+        Transient errors are retried only until the first chunk arrives;
+        after that they propagate so no text is repeated.
+        """
+        attempt = 0
+        while True:
+            await self.acquire(priority, tokens)
+            started = False
+            used = None
+            try:
+                response = await open_stream()
+                async for chunk in response:
+                    started = True
+                    used = usage_tokens(chunk) or used
+                    yield chunk
+            except Exception as e:
+                self.release(priority)
+                transient = is_transient(e)
+                self._record(False, transient)
+                if started or not transient or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                attempt += 1
+                self.counters["retries"] += 1
+                logger.warning(f"Transient model error ({type(e).__name__}), "
+                               f"retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # consumer stopped early or was cancelled
+                self.release(priority)
+                raise
+            self.release(priority, tokens, used)
+            self._record(True, False)
+            self.counters["calls"] += 1
+            return
+
+    def queue_depth(self) -> dict:
+        """Waiting calls per priority class"""
+        with self._lock:
+            waiting = [w for w in self._queue if not w.cancelled]
+        return {
+            "interactive": sum(1 for w in waiting if w.priority == PRIORITY_INTERACTIVE),
+            "background": sum(1 for w in waiting if w.priority == PRIORITY_BACKGROUND),
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            active = dict(self._active)
+        return {
+            "queued": self.queue_depth(),
+            "active": {"interactive": active[PRIORITY_INTERACTIVE],
+                       "background": active[PRIORITY_BACKGROUND]},
+            "circuit": self.circuit_state,
+            **self.counters,
+        }
+
+def usage_tokens(response):
+    """Total tokens reported by a Gemini response, None if not reported"""
+    usage = getattr(response, "usage_metadata", None)
+    total = getattr(usage, "total_token_count", None)
+    return total if isinstance(total, int) and total > 0 else None
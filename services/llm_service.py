@@ -0,0 +1,190 @@
+"""LLM Service - Single entry point for model calls"""
+import asyncio
+import logging
+import time
+from config import Config
+from .async_runner import run_sync
+from .response_cache import response_cache, ResponseCache
+from .llm_scheduler import LLMScheduler, PRIORITY_INTERACTIVE, estimate_tokens
+from .single_flight import SingleFlight, FlightAbandoned
+from .metrics import metrics, model_calls, model_latency, model_tokens
+
+logger = logging.getLogger(__name__)
+
+def record_usage(response, prompt: str, text: str):
+    """Count prompt and response tokens, estimated when the model does not report them"""
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    response_tokens = getattr(usage, "candidates_token_count", None)
+    model_tokens.inc(prompt_tokens if isinstance(prompt_tokens, int) else len(prompt) // 4,
+                     kind="prompt")
+    model_tokens.inc(response_tokens if isinstance(response_tokens, int) else len(text) // 4,
+                     kind="response")
+
+def model_settings(model):
+    """Return the (model name, temperature) pair that identifies a model's output"""
+    generation_config = getattr(model, "_generation_config", None) or {}
+    return getattr(model, "model_name", Config.MODEL_NAME), generation_config.get("temperature")
+
+class LLMService:
+    """Routes agent prompts to the model through the response cache and scheduler
+
+    Concurrent calls with the same normalized prompt share one model call.
+    fresh=True calls ask for a new generation and are never coalesced.
+    """
+
+    def __init__(self, cache=None, cache_enabled: bool = True, scheduler=None):
+        self.cache = cache
+        self.cache_enabled = cache_enabled and cache is not None
+        self.scheduler = scheduler or LLMScheduler()
+        self.flights = SingleFlight()
+
+    async def _cached(self, key: str):
+        # the cache reads and touches a SQLite row, so it runs off the event loop
+        cached = await asyncio.to_thread(self.cache.get, key) if self.cache_enabled else None
+        if cached is not None:
+            model_calls.inc(outcome="cache_hit")
+        return cached
+
+    async def _store(self, key: str, text: str):
+        if self.cache_enabled and text:
+            await asyncio.to_thread(self.cache.set, key, text)
+
+    async def generate_async(self, model, prompt: str, fresh: bool = False,
+                             priority: int = PRIORITY_INTERACTIVE, cache_key: str = None) -> str:
+        """Generate text for a prompt, fresh=True skips the cache lookup
+
+        Prompts with the same cache_key (the prompt itself by default) share
+        one cached response.
+        """
+        key = ResponseCache.make_key(*model_settings(model), cache_key or prompt)
+        if fresh:
+            return await self._call(model, prompt, key, priority)
+
+        cached = await self._cached(key)
+        if cached is not None:
+            return cached
+
+        async def call():
+            # a flight that finished just before ours began has filled the cache
+            cached = await self._cached(key)
+            if cached is not None:
+                return cached
+            return await self._call(model, prompt, key, priority)
+
+        return await self.flights.do(key, call)
+
+    async def _call(self, model, prompt: str, key: str, priority: int) -> str:
+        try:
+            with model_latency.time(mode="generate"):
+                response = await self.scheduler.run(
+                    lambda: model.generate_content_async(prompt),
+                    priority=priority, tokens=estimate_tokens(prompt, Config.MAX_TOKENS)
+                )
+                text = response.text
+        except Exception:
+            model_calls.inc(outcome="error")
+            raise
+        model_calls.inc(outcome="ok")
+        record_usage(response, prompt, text)
+        await self._store(key, text)
+        return text
+
+    def generate(self, model, prompt: str, fresh: bool = False,
+                 priority: int = PRIORITY_INTERACTIVE) -> str:
+        """Blocking wrapper around generate_async"""
+        return run_sync(self.generate_async(model, prompt, fresh=fresh, priority=priority))
+
+    async def stream_async(self, model, prompt: str, fresh: bool = False,
+                           priority: int = PRIORITY_INTERACTIVE, cache_key: str = None):
+        """Yield text chunks as the model produces them, cached responses in one piece
+
+        A caller that finds the same prompt already streaming for someone else
+        waits for that stream to finish and gets the whole text in one piece.
+        """
+        key = ResponseCache.make_key(*model_settings(model), cache_key or prompt)
+        flight = None
+        if not fresh:
+            cached = await self._cached(key)
+            if cached is not None:
+                yield cached
+                return
+            while True:
+                flight, leader = self.flights.begin(key)
+                if leader:
+                    break
+                try:
+                    text = await self.flights.wait(flight)
+                except FlightAbandoned:
+                    continue
+                yield text
+                return
+            cached = await self._cached(key)
+            if cached is not None:
+                self.flights.finish(key, flight, result=cached)
+                yield cached
+                return
+
+        chunks = []
+        last_chunk = None
+        started = time.perf_counter()
+        try:
+            async for chunk in self.scheduler.stream(
+                lambda: model.generate_content_async(prompt, stream=True),
+                priority=priority, tokens=estimate_tokens(prompt, Config.MAX_TOKENS)
+            ):
+                last_chunk = chunk
+                if chunk.text:
+                    chunks.append(chunk.text)
+                    yield chunk.text
+        except BaseException as e:
+            if isinstance(e, Exception):
+                model_calls.inc(outcome="error")
+            if flight is not None:
+                self.flights.finish(key, flight, error=e)
+            raise
+        finally:
+            model_latency.observe(time.perf_counter() - started, mode="stream")
+        text = "".join(chunks)
+        model_calls.inc(outcome="ok")
+        # usage is reported on the final chunk
+        record_usage(last_chunk, prompt, text)
+        await self._store(key, text)
+        if flight is not None:
+            self.flights.finish(key, flight, result=text)
+
+    def cache_stats(self) -> dict:
+        return self.cache.stats() if self.cache is not None else {}
+
+    def scheduler_stats(self) -> dict:
+        """Queue depth, active calls, circuit state and retry counters"""
+        return self.scheduler.stats()
+
+    def flight_stats(self) -> dict:
+        """Calls currently in flight and calls that joined one instead of calling the model"""
+        return {"in_flight": self.flights.in_flight(), "coalesced": self.flights.coalesced}
+
+llm_service = LLMService(
+    response_cache,
+    cache_enabled=Config.RESPONSE_CACHE_ENABLED,
+    scheduler=LLMScheduler(
+        requests_per_minute=Config.LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute=Config.LLM_TOKENS_PER_MINUTE,
+        max_concurrency=Config.LLM_MAX_CONCURRENCY,
+        max_retries=Config.LLM_MAX_RETRIES,
+        backoff_base=Config.LLM_BACKOFF_BASE_SECONDS,
+        backoff_max=Config.LLM_BACKOFF_MAX_SECONDS,
+        breaker_threshold=Config.LLM_BREAKER_THRESHOLD,
+        breaker_reset_seconds=Config.LLM_BREAKER_RESET_SECONDS
+    )
+)
+
+metrics.counter("model_calls_coalesced_total", "Calls that waited for an identical in-flight call",
+                callback=lambda: llm_service.flights.coalesced)
+metrics.gauge("model_queue_depth", "Model calls waiting in the scheduler", ("priority",),
+              callback=lambda: {(name,): depth for name, depth
+                                in llm_service.scheduler.queue_depth().items()})
+metrics.gauge("model_circuit_open", "1 while the model circuit breaker is open or half-open",
+              callback=lambda: int(llm_service.scheduler.circuit_state != "closed"))
+metrics.counter("model_retries_total", "Model calls retried after a transient error",
+                callback=lambda: llm_service.scheduler.counters["retries"])
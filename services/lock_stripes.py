@@ -0,0 +1,24 @@
+"""Lock Stripes - Per-key locking from a fixed pool of locks"""
+import threading
+from config import Config
+
+class LockStripes:
+    """A fixed pool of re-entrant locks, one picked per key by hash
+
+    Work on one key is serialized, while different keys almost always get
+    different locks and run in parallel, without keeping a lock per key.
+    These are thread locks: hold them around synchronous work only, never
+    across an await.
+    """
+
+    def __init__(self, stripes: int = 64):
+        self._locks = tuple(threading.RLock() for _ in range(stripes))
+
+    def lock_for(self, key: str):
+        return self._locks[hash(key) % len(self._locks)]
+
+    def __len__(self):
+        return len(self._locks)
+
+# one stripe per student, shared by sessions, the memory bank and quiz grading
+student_locks = LockStripes(Config.STUDENT_LOCK_STRIPES)
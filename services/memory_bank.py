@@ -1,90 +1,152 @@
 """Memory Bank - Persistent student data storage"""
-import json
-import os
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from pathlib import Path
+from config import Config
+from .lock_stripes import student_locks
+from .memory_storage import MemoryStorage, create_storage
+from .metrics import metrics, memory_write_latency
+from .review_scheduler import review_scheduler
+from .student_profile import new_profile
 
 class MemoryBank:
-    """Manages persistent storage of student learning data"""
-    
-    def __init__(self, storage_path: str = "./data/memory_bank.json"):
-        self.storage_path = Path(storage_path)
-        self.storage_path.parent.mkdir(parents=True, exist_ok=True)
-        self.memory = self._load_memory()
-    
-    def _load_memory(self):
-        """Load memory from disk"""
-        if self.storage_path.exists():
-            with open(self.storage_path, 'r') as f:
-                return json.load(f)
-        return {"students": {}, "metadata": {"created_at": datetime.now().isoformat()}}
-    
-    def _save_memory(self):
-        """Save memory to disk"""
-        with open(self.storage_path, 'w') as f:
-            json.dump(self.memory, f, indent=2)
-    
-    def get_student_profile(self, student_id: str):
-        """Get or create student profile"""
-        if student_id not in self.memory["students"]:
-            self.memory["students"][student_id] = {
-                "id": student_id,
-                "created_at": datetime.now().isoformat(),
-                "topics_covered": [],
-                "quiz_history": [],
-                "weak_areas": [],
-                "strong_areas": [],
-                "preferences": {
-                    "learning_style": "visual",
-                    "difficulty_level": "medium"
-                },
-                "stats": {
-                    "total_topics": 0,
-                    "total_quizzes": 0,
-                    "average_score": 0.0
-                }
-            }
-            self._save_memory()
-        return self.memory["students"][student_id]
-    
-    def add_quiz_result(self, student_id: str, topic: str, score: float, 
+    """Manages persistent storage of student learning data
+
+    Persistence is delegated to a pluggable ``MemoryStorage`` backend
+    (``"json"`` snapshot + journal, ``"sharded"`` per-student files behind an
+    LRU cache, or ``"sqlite"``). The backend is opened on first use, or built
+    by ``storage_factory`` when one is given.
+
+    Profile updates are optimistic: read, change, and write back only if
+    the profile's version is unchanged, retrying on a conflict. With a
+    shared backend rendered text is checked against the profile version,
+    as another worker process may have changed the profile.
+
+    Each student's reads-then-writes run under their stripe of
+    ``student_locks``, so different students never wait on each other.
+
+    When ``reviews`` is given, every quiz result also reschedules the
+    topic's next spaced-repetition review there.
+    """
+
+    def __init__(self, storage_path: str = "./data/memory_bank.json",
+                 backend: str = "json", storage: MemoryStorage = None,
+                 render_cache_size: int = 10000, storage_factory=None,
+                 reviews=None, **storage_options):
+        if storage_factory is None:
+            path_option = {"sqlite": "db_path", "sharded": "storage_dir"}.get(backend, "storage_path")
+            storage_options[path_option] = storage_path
+            storage_factory = lambda: create_storage(backend, **storage_options)
+        self._storage = storage
+        self._storage_factory = storage_factory
+        self._storage_lock = threading.Lock()
+        # rendered text per student, dropped whenever that student's data changes
+        self._render_cache = OrderedDict()
+        self._render_cache_size = render_cache_size
+        self._render_lock = threading.RLock()
+        self.reviews = reviews
+        if reviews is not None:
+            # a schedule without a saved file starts from the quiz history
+            reviews.set_history(lambda: self.storage.quiz_rows())
+
+    @property
+    def storage(self) -> MemoryStorage:
+        if self._storage is None:
+            with self._storage_lock:
+                if self._storage is None:
+                    self._storage = self._storage_factory()
+        return self._storage
+
+    def _load_profile(self, student_id: str, include_history: bool = True):
+        """Load a profile, creating it on first use"""
+        profile = self.storage.get_profile(student_id, include_history)
+        if profile is None:
+            with student_locks.lock_for(student_id):
+                # a concurrent first request may have created it meanwhile
+                profile = self.storage.get_profile(student_id, include_history)
+                if profile is None:
+                    profile = new_profile(student_id)
+                    with memory_write_latency.time(operation="create_profile"):
+                        self.storage.create_profile(profile)
+        return profile
+
+    def get_student_profile(self, student_id: str, include_history: bool = True):
+        """Get or create student profile, without the quiz history rows unless include_history"""
+        return self._load_profile(student_id, include_history)
+
+    def add_quiz_result(self, student_id: str, topic: str, score: float,
                        total_questions: int, correct_answers: int, questions: list):
         """Record quiz result"""
-        profile = self.get_student_profile(student_id)
-        
+        taken = datetime.now()
         quiz_entry = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": taken.isoformat(),
             "topic": topic,
             "score": score,
             "total_questions": total_questions,
             "correct_answers": correct_answers
         }
-        
-        profile["quiz_history"].append(quiz_entry)
-        profile["stats"]["total_quizzes"] += 1
-        
-        # Update average
-        all_scores = [q["score"] for q in profile["quiz_history"]]
-        profile["stats"]["average_score"] = sum(all_scores) / len(all_scores)
-        
-        # Update topic progress
-        if topic not in profile["topics_covered"]:
-            profile["topics_covered"].append(topic)
-            profile["stats"]["total_topics"] += 1
-        
-        # Categorize strength
-        if score >= 0.8 and topic not in profile["strong_areas"]:
-            profile["strong_areas"].append(topic)
-        elif score < 0.6 and topic not in profile["weak_areas"]:
-            profile["weak_areas"].append(topic)
-        
-        self._save_memory()
-    
+        with student_locks.lock_for(student_id):
+            self._load_profile(student_id, include_history=False)
+            if self.reviews is not None:
+                # before the write, so a schedule built from the history doesn't count it twice
+                self.reviews.record(student_id, topic, score, taken.timestamp())
+            with memory_write_latency.time(operation="add_quiz_result"):
+                self.storage.add_quiz_result(student_id, quiz_entry)
+            self._forget_render(student_id)
+
+    def _forget_render(self, student_id: str):
+        with self._render_lock:
+            self._render_cache.pop(student_id, None)
+
+    def cached_render(self, student_id: str, name: str, render) -> str:
+        """Return render() output, reused until the student's data changes"""
+        with self._render_lock:
+            rendered = self._render_cache.get(student_id)
+            if rendered is not None:
+                self._render_cache.move_to_end(student_id)
+        # "version" is only checked when another process can change the profile
+        version = self.storage.profile_version(student_id) if self.storage.shared else None
+        if rendered is not None and rendered.get("version") == version and name in rendered:
+            return rendered[name]
+        # rendering under the student's lock keeps a concurrent write from caching stale text
+        with student_locks.lock_for(student_id):
+            text = render()
+            with self._render_lock:
+                rendered = self._render_cache.get(student_id)
+                if rendered is None or rendered.get("version") != version:
+                    rendered = self._render_cache[student_id] = {"version": version}
+                    if len(self._render_cache) > self._render_cache_size:
+                        self._render_cache.popitem(last=False)
+                rendered[name] = text
+        return text
+
+    def get_recent_quizzes(self, student_id: str, limit: int = 3) -> list:
+        """Get the latest quiz entries for a student, oldest first"""
+        return self.storage.get_recent_quizzes(student_id, limit)
+
+    def find_students_weak_in(self, topic: str) -> list:
+        """Get ids of students who need to review a topic"""
+        return self.storage.find_students_weak_in(topic)
+
+    def get_popular_topics(self, limit: int = 20) -> list:
+        """Get the topics covered by the most students"""
+        return self.storage.get_popular_topics(limit)
+
+    def export_quiz_history(self):
+        """Every student's quizzes as columns for cohort analytics (needs NumPy)"""
+        from .analytics import QuizHistory
+        return QuizHistory.from_rows(self.storage.quiz_rows())
+
     def get_progress_summary(self, student_id: str) -> str:
         """Generate progress summary"""
-        profile = self.get_student_profile(student_id)
+        return self.cached_render(
+            student_id, "progress_summary", lambda: self._render_progress_summary(student_id)
+        )
+
+    def _render_progress_summary(self, student_id: str) -> str:
+        profile = self._load_profile(student_id, include_history=False)
         stats = profile["stats"]
-        
+
         summary = f"""
 Learning Progress for {student_id}
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -96,5 +158,38 @@ Areas to Review: {', '.join(profile['weak_areas'][:3]) or 'None'}
 """
         return summary.strip()
 
-# Global instance
-memory_bank = MemoryBank()
\ No newline at end of file
+    def disk_usage(self) -> dict:
+        """Bytes per storage file, empty until the storage has been opened"""
+        return self._storage.disk_usage() if self._storage is not None else {}
+
+    def close(self):
+        """Close the storage backend"""
+        if self._storage is not None:
+            self._storage.close()
+
+def storage_from_config() -> MemoryStorage:
+    """Build the backend selected by Config.MEMORY_BACKEND"""
+    Config.load()
+    if Config.MEMORY_BACKEND == "sqlite":
+        return create_storage("sqlite", db_path=Config.MEMORY_DB_PATH)
+    if Config.MEMORY_BACKEND == "sharded":
+        return create_storage(
+            "sharded",
+            storage_dir=Config.MEMORY_SHARD_DIR,
+            cache_size=Config.MEMORY_CACHE_SIZE,
+            flush_interval=Config.MEMORY_FLUSH_INTERVAL_SECONDS
+        )
+    return create_storage(
+        "json",
+        storage_path=Config.MEMORY_BANK_PATH,
+        journal=Config.MEMORY_JOURNAL_ENABLED,
+        compact_every=Config.MEMORY_COMPACT_EVERY,
+        fsync=Config.MEMORY_JOURNAL_FSYNC
+    )
+
+# Global instance, storage opens on first use
+memory_bank = MemoryBank(storage_factory=storage_from_config,
+                         reviews=review_scheduler if Config.REVIEW_SCHEDULER_ENABLED else None)
+
+metrics.gauge("memory_file_bytes", "Size of the memory bank's files", ("file",),
+              callback=lambda: {(name,): size for name, size in memory_bank.disk_usage().items()})
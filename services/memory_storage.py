@@ -0,0 +1,642 @@
+"""Memory Storage - Pluggable persistence backends for the MemoryBank"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import quote
+from .journal import Journal, write_atomic
+from .metrics import memory_write_latency
+from .student_profile import (apply_quiz_result, classify_score, ensure_aggregates,
+                              new_topic_stats, push_recent_score)
+
+logger = logging.getLogger(__name__)
+
+def file_sizes(paths: dict) -> dict:
+    """Map each name to the size of its file, skipping files that do not exist"""
+    sizes = {}
+    for name, path in paths.items():
+        try:
+            sizes[name] = os.path.getsize(path)
+        except OSError:
+            pass
+    return sizes
+
+class VersionConflictError(Exception):
+    """A record kept changing between reading it and writing it back"""
+
+class MemoryStorage:
+    """Interface every MemoryBank backend implements
+
+    Every profile carries a ``version`` that each write increments, so text
+    rendered from a profile can tell that another process wrote it since.
+    Writes are not read-modify-write: each backend applies a quiz result
+    atomically (under its lock, and for SQLite in one ``BEGIN IMMEDIATE``
+    transaction that other processes wait for), so no update is lost.
+    """
+
+    # True when other processes write the same store, so nothing read from it can be cached
+    shared = False
+
+    def get_profile(self, student_id: str, include_history: bool = True):
+        """Return the profile dict, or None if the student is unknown"""
+        raise NotImplementedError
+
+    def create_profile(self, profile: dict):
+        """Persist a brand new profile"""
+        raise NotImplementedError
+
+    def add_quiz_result(self, student_id: str, quiz_entry: dict):
+        """Apply and persist a quiz entry for an existing student"""
+        raise NotImplementedError
+
+    def profile_version(self, student_id: str):
+        """Current version of a profile, None if the student is unknown"""
+        profile = self.get_profile(student_id, include_history=False)
+        return profile.get("version", 0) if profile is not None else None
+
+    def get_recent_quizzes(self, student_id: str, limit: int) -> list:
+        """Return the latest quiz entries, oldest first"""
+        raise NotImplementedError
+
+    def find_students_weak_in(self, topic: str) -> list:
+        """Return ids of students with the topic in their weak areas"""
+        raise NotImplementedError
+
+    def quiz_rows(self) -> list:
+        """Every quiz as (student_id, timestamp, topic, score, total_questions,
+        correct_answers), grouped by student in the order taken"""
+        raise NotImplementedError
+
+    def get_popular_topics(self, limit: int) -> list:
+        """Return the topics covered by the most students"""
+        raise NotImplementedError
+
+    def disk_usage(self) -> dict:
+        """Bytes on disk per storage file, for metrics"""
+        return {}
+
+    def close(self):
+        """Release files and connections"""
+
+class JsonStorage(MemoryStorage):
+    """Whole-dataset JSON snapshot plus an append-only journal
+
+    In journal mode every mutation is appended as one small JSON line to
+    ``<storage_path>.journal``. The full snapshot in ``storage_path`` is only
+    rewritten by a background compaction once ``compact_every`` records have
+    accumulated, and on startup the journal is replayed on top of it.
+    """
+
+    def __init__(self, storage_path: str = "./data/memory_bank.json",
+                 journal: bool = True, compact_every: int = 1000, fsync: bool = False):
+        self.storage_path = Path(storage_path)
+        self.storage_path.parent.mkdir(parents=True, exist_ok=True)
+        self.journal_enabled = journal
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self.journal = Journal(self.storage_path, self._lock, fsync=fsync, name="memory bank")
+        self.journal_path = self.journal.path
+        self.memory = self._load_memory()
+        self._weak_index = defaultdict(set)
+        self._topic_counts = Counter()
+        for student_id, profile in self.memory["students"].items():
+            ensure_aggregates(profile)
+            self._topic_counts.update(profile["topics_covered"])
+            for topic in profile["weak_areas"]:
+                self._weak_index[topic].add(student_id)
+
+    def _load_memory(self):
+        """Load memory from disk"""
+        if self.storage_path.exists():
+            with open(self.storage_path, 'r') as f:
+                memory = json.load(f)
+        else:
+            memory = {"students": {}, "metadata": {"created_at": datetime.now().isoformat()}}
+
+        if self.journal_enabled:
+            replayed = self.journal.replay(memory["metadata"].get("journal_seq", 0),
+                                           lambda record: self._apply_record(memory, record))
+            if replayed:
+                logger.info(f"Replayed {replayed} journal records")
+            if self.journal.interrupted():
+                # a compaction was interrupted; fold everything into a fresh snapshot
+                self._write_snapshot(memory)
+                self.journal.reset()
+        return memory
+
+    def _save_memory(self):
+        """Save memory to disk"""
+        with self._lock:
+            self._write_snapshot(self.memory)
+
+    def _write_snapshot(self, memory):
+        """Atomically replace the snapshot file"""
+        memory["metadata"]["journal_seq"] = self.journal.seq
+        write_atomic(self.storage_path, json.dumps(memory, indent=None if self.journal_enabled else 2))
+
+    def _snapshot(self) -> str:
+        return json.dumps(dict(self.memory, metadata=dict(
+            self.memory["metadata"], journal_seq=self.journal.seq)))
+
+    def _apply_record(self, memory, record):
+        """Apply a single journal record to memory"""
+        if record["op"] == "create_student":
+            memory["students"][record["profile"]["id"]] = record["profile"]
+        elif record["op"] == "quiz_result":
+            profile = memory["students"][record["student_id"]]
+            apply_quiz_result(profile, record["entry"])
+        else:
+            logger.warning(f"Unknown journal op: {record['op']}")
+
+    def _persist(self, record):
+        """Append a mutation record, or rewrite everything when the journal is off"""
+        if not self.journal_enabled:
+            self._save_memory()
+            return
+        self.journal.append(record)
+        if self.journal.compaction_due(self.compact_every):
+            threading.Thread(target=self.compact, name="memory-bank-compaction",
+                             daemon=True).start()
+
+    def compact(self):
+        """Fold the journal into a new snapshot"""
+        if not self.journal_enabled:
+            return
+        with memory_write_latency.time(operation="snapshot"):
+            self.journal.compact(self._snapshot, self._compacted)
+
+    def _compacted(self):
+        logger.info("Memory bank compacted")
+
+    def disk_usage(self) -> dict:
+        return file_sizes({"snapshot": self.storage_path, "journal": self.journal_path})
+
+    def close(self):
+        """Flush and close the journal"""
+        with self._lock:
+            self.journal.close()
+
+    def get_profile(self, student_id: str, include_history: bool = True):
+        return self.memory["students"].get(student_id)
+
+    def create_profile(self, profile: dict):
+        with self._lock:
+            self.memory["students"][profile["id"]] = profile
+            self._persist({"op": "create_student", "profile": profile})
+
+    def add_quiz_result(self, student_id: str, quiz_entry: dict):
+        with self._lock:
+            profile = self.memory["students"][student_id]
+            if quiz_entry["topic"] not in profile["topic_stats"]:
+                self._topic_counts[quiz_entry["topic"]] += 1
+            apply_quiz_result(profile, quiz_entry)
+            if quiz_entry["topic"] in profile["weak_areas"]:
+                self._weak_index[quiz_entry["topic"]].add(student_id)
+            self._persist({"op": "quiz_result", "student_id": student_id, "entry": quiz_entry})
+
+    def get_recent_quizzes(self, student_id: str, limit: int) -> list:
+        profile = self.memory["students"].get(student_id)
+        return profile["quiz_history"][-limit:] if profile and limit > 0 else []
+
+    def find_students_weak_in(self, topic: str) -> list:
+        return sorted(self._weak_index.get(topic, ()))
+
+    def quiz_rows(self) -> list:
+        with self._lock:
+            return [(student_id, e["timestamp"], e["topic"], e["score"],
+                     e["total_questions"], e["correct_answers"])
+                    for student_id, profile in self.memory["students"].items()
+                    for e in profile["quiz_history"]]
+
+    def get_popular_topics(self, limit: int) -> list:
+        with self._lock:
+            return [topic for topic, _ in self._topic_counts.most_common(limit)]
+
+class ShardedJsonStorage(MemoryStorage):
+    """One JSON file per student behind a bounded write-back LRU cache
+
+    Nothing is read at startup. Profiles load on first access, changes mark
+    them dirty, and dirty profiles are written back when they are evicted, on
+    the periodic flush and on close.
+    """
+
+    def __init__(self, storage_dir: str = "./data/students", cache_size: int = 1000,
+                 flush_interval: float = 5.0):
+        self.storage_dir = Path(storage_dir)
+        self.storage_dir.mkdir(parents=True, exist_ok=True)
+        self.weak_index_path = self.storage_dir / "weak_areas.jsonl"
+        self.topic_counts_path = self.storage_dir / "topic_counts.json"
+        self.cache_size = cache_size
+        self._lock = threading.RLock()
+        self._cache = OrderedDict()
+        self._dirty = set()
+        self._weak_index = None
+        self._topic_counts = None
+        self._topic_counts_dirty = False
+        self._closed = threading.Event()
+        if flush_interval:
+            threading.Thread(target=self._flush_loop, args=(flush_interval,),
+                             name="memory-bank-flush", daemon=True).start()
+        atexit.register(self.close)
+
+    def _profile_path(self, student_id: str) -> Path:
+        """Spread files over 256 subdirectories by id hash"""
+        shard = hashlib.sha1(student_id.encode()).hexdigest()[:2]
+        return self.storage_dir / shard / f"{quote(student_id, safe='')}.json"
+
+    def _cached(self, student_id: str):
+        """Return the cached profile, loading it from its shard on a miss"""
+        profile = self._cache.get(student_id)
+        if profile is not None:
+            self._cache.move_to_end(student_id)
+            return profile
+        path = self._profile_path(student_id)
+        if not path.exists():
+            return None
+        with open(path, 'r') as f:
+            profile = json.load(f)
+        ensure_aggregates(profile)
+        self._insert(student_id, profile)
+        return profile
+
+    def _insert(self, student_id: str, profile: dict):
+        """Add a profile to the cache, writing back whatever falls out"""
+        self._cache[student_id] = profile
+        while len(self._cache) > self.cache_size:
+            evicted_id, evicted = self._cache.popitem(last=False)
+            if evicted_id in self._dirty:
+                self._write_profile(evicted_id, evicted)
+
+    def _write_profile(self, student_id: str, profile: dict):
+        path = self._profile_path(student_id)
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(profile, f)
+        os.replace(tmp_path, path)
+        self._dirty.discard(student_id)
+
+    def _flush_loop(self, interval: float):
+        while not self._closed.wait(interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Profile flush failed: {e}")
+
+    def flush(self):
+        """Write every dirty profile back to its shard"""
+        with self._lock, memory_write_latency.time(operation="flush"):
+            for student_id in list(self._dirty):
+                self._write_profile(student_id, self._cache[student_id])
+            if self._topic_counts_dirty:
+                tmp_path = self.topic_counts_path.with_name(self.topic_counts_path.name + ".tmp")
+                with open(tmp_path, 'w') as f:
+                    json.dump(self._topic_counts, f)
+                os.replace(tmp_path, self.topic_counts_path)
+                self._topic_counts_dirty = False
+
+    def close(self):
+        """Flush dirty profiles and stop the flush thread"""
+        self._closed.set()
+        self.flush()
+
+    def get_profile(self, student_id: str, include_history: bool = True):
+        with self._lock:
+            return self._cached(student_id)
+
+    def create_profile(self, profile: dict):
+        with self._lock:
+            self._dirty.add(profile["id"])
+            self._insert(profile["id"], profile)
+
+    def add_quiz_result(self, student_id: str, quiz_entry: dict):
+        with self._lock:
+            profile = self._cached(student_id)
+            if quiz_entry["topic"] not in profile["topic_stats"]:
+                self._load_topic_counts()[quiz_entry["topic"]] += 1
+                self._topic_counts_dirty = True
+            was_weak = quiz_entry["topic"] in profile["topic_stats"] and \
+                profile["topic_stats"][quiz_entry["topic"]]["weak"]
+            apply_quiz_result(profile, quiz_entry)
+            self._dirty.add(student_id)
+            if not was_weak and profile["topic_stats"][quiz_entry["topic"]]["weak"]:
+                self._add_weak(student_id, quiz_entry["topic"])
+
+    def get_recent_quizzes(self, student_id: str, limit: int) -> list:
+        with self._lock:
+            profile = self._cached(student_id)
+            return profile["quiz_history"][-limit:] if profile and limit > 0 else []
+
+    def _load_weak_index(self):
+        """Read the append-only weak area log the first time it is queried"""
+        if self._weak_index is None:
+            self._weak_index = defaultdict(set)
+            if self.weak_index_path.exists():
+                with open(self.weak_index_path, 'r') as f:
+                    for line in f:
+                        try:
+                            student_id, topic = json.loads(line)
+                        except ValueError:
+                            continue
+                        self._weak_index[topic].add(student_id)
+        return self._weak_index
+
+    def _add_weak(self, student_id: str, topic: str):
+        with open(self.weak_index_path, 'a') as f:
+            f.write(json.dumps([student_id, topic]) + "\n")
+        if self._weak_index is not None:
+            self._weak_index[topic].add(student_id)
+
+    def find_students_weak_in(self, topic: str) -> list:
+        with self._lock:
+            return sorted(self._load_weak_index().get(topic, ()))
+
+    def quiz_rows(self) -> list:
+        """Reads every shard, after writing back the dirty profiles"""
+        self.flush()
+        rows = []
+        for path in sorted(self.storage_dir.glob("*/*.json")):
+            try:
+                with open(path, 'r') as f:
+                    profile = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Skipping unreadable profile {path}: {e}")
+                continue
+            rows.extend((profile["id"], e["timestamp"], e["topic"], e["score"],
+                         e["total_questions"], e["correct_answers"])
+                        for e in profile["quiz_history"])
+        return rows
+
+    def _load_topic_counts(self) -> Counter:
+        if self._topic_counts is None:
+            self._topic_counts = Counter()
+            if self.topic_counts_path.exists():
+                with open(self.topic_counts_path, 'r') as f:
+                    self._topic_counts.update(json.load(f))
+        return self._topic_counts
+
+    def get_popular_topics(self, limit: int) -> list:
+        with self._lock:
+            return [topic for topic, _ in self._load_topic_counts().most_common(limit)]
+
+class SQLiteStorage(MemoryStorage):
+    """Normalized SQLite store, reads and writes only one student's rows
+
+    Topic membership (covered / strong / weak) lives in ``student_topics`` with
+    the quiz row id that first set each flag, which keeps list order stable.
+    Every write runs in one transaction, so several worker processes can
+    share the database file.
+    """
+
+    shared = True
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS students (
+        student_id TEXT PRIMARY KEY,
+        created_at TEXT NOT NULL,
+        preferences TEXT NOT NULL,
+        total_topics INTEGER NOT NULL DEFAULT 0,
+        total_quizzes INTEGER NOT NULL DEFAULT 0,
+        average_score REAL NOT NULL DEFAULT 0,
+        latest_score REAL,
+        recent_scores TEXT NOT NULL DEFAULT '[]',
+        rolling_average REAL NOT NULL DEFAULT 0,
+        version INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS quiz_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id TEXT NOT NULL REFERENCES students(student_id),
+        timestamp TEXT NOT NULL,
+        topic TEXT NOT NULL,
+        score REAL NOT NULL,
+        total_questions INTEGER NOT NULL,
+        correct_answers INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS student_topics (
+        student_id TEXT NOT NULL REFERENCES students(student_id),
+        topic TEXT NOT NULL,
+        covered_seq INTEGER NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        best_score REAL NOT NULL DEFAULT 0,
+        latest_score REAL,
+        strong_seq INTEGER,
+        weak_seq INTEGER,
+        PRIMARY KEY (student_id, topic)
+    );
+    CREATE INDEX IF NOT EXISTS idx_quiz_student_id ON quiz_history(student_id, id);
+    CREATE INDEX IF NOT EXISTS idx_quiz_topic ON quiz_history(topic);
+    CREATE INDEX IF NOT EXISTS idx_quiz_timestamp ON quiz_history(timestamp);
+    CREATE INDEX IF NOT EXISTS idx_topics_weak ON student_topics(topic, student_id)
+        WHERE weak_seq IS NOT NULL;
+    """
+
+    def __init__(self, db_path: str = "./data/memory_bank.db"):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(students)")}
+        if "version" not in columns:
+            # databases created before profiles were versioned
+            self._conn.execute("ALTER TABLE students ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+    def get_profile(self, student_id: str, include_history: bool = True):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM students WHERE student_id = ?", (student_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            topics = self._conn.execute(
+                "SELECT * FROM student_topics WHERE student_id = ?", (student_id,)
+            ).fetchall()
+            history = []
+            if include_history:
+                history = [self._quiz_entry(r) for r in self._conn.execute(
+                    "SELECT * FROM quiz_history WHERE student_id = ? ORDER BY id",
+                    (student_id,)
+                )]
+
+        def ordered(column):
+            flagged = [t for t in topics if t[column] is not None]
+            return [t["topic"] for t in sorted(flagged, key=lambda t: t[column])]
+
+        return {
+            "id": row["student_id"],
+            "created_at": row["created_at"],
+            "topics_covered": ordered("covered_seq"),
+            "quiz_history": history,
+            "weak_areas": ordered("weak_seq"),
+            "strong_areas": ordered("strong_seq"),
+            "preferences": json.loads(row["preferences"]),
+            "version": row["version"],
+            "stats": {
+                "total_topics": row["total_topics"],
+                "total_quizzes": row["total_quizzes"],
+                "average_score": row["average_score"],
+                "latest_score": row["latest_score"],
+                "recent_scores": json.loads(row["recent_scores"]),
+                "rolling_average": row["rolling_average"]
+            },
+            "topic_stats": {t["topic"]: self._topic_stats(t) for t in topics}
+        }
+
+    def create_profile(self, profile: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO students (student_id, created_at, preferences) "
+                "VALUES (?, ?, ?)",
+                (profile["id"], profile["created_at"], json.dumps(profile["preferences"]))
+            )
+
+    def add_quiz_result(self, student_id: str, quiz_entry: dict):
+        topic = quiz_entry["topic"]
+        score = quiz_entry["score"]
+        area = classify_score(score)
+        with self._lock, self._transaction():
+            recent_scores = json.loads(self._conn.execute(
+                "SELECT recent_scores FROM students WHERE student_id = ?", (student_id,)
+            ).fetchone()["recent_scores"])
+            rolling_average = push_recent_score(recent_scores, score)
+            seq = self._conn.execute(
+                "INSERT INTO quiz_history (student_id, timestamp, topic, score, "
+                "total_questions, correct_answers) VALUES (?, ?, ?, ?, ?, ?)",
+                (student_id, quiz_entry["timestamp"], topic, score,
+                 quiz_entry["total_questions"], quiz_entry["correct_answers"])
+            ).lastrowid
+            new_topic = self._conn.execute(
+                "INSERT OR IGNORE INTO student_topics (student_id, topic, covered_seq) "
+                "VALUES (?, ?, ?)", (student_id, topic, seq)
+            ).rowcount
+            self._conn.execute(
+                "UPDATE student_topics SET attempts = attempts + 1, "
+                "best_score = MAX(best_score, ?), latest_score = ? "
+                "WHERE student_id = ? AND topic = ?",
+                (score, score, student_id, topic)
+            )
+            if area is not None:
+                column = f"{area}_seq"
+                self._conn.execute(
+                    f"UPDATE student_topics SET {column} = ? "
+                    f"WHERE student_id = ? AND topic = ? AND {column} IS NULL",
+                    (seq, student_id, topic)
+                )
+            # right-hand sides see the old row, so this is the running mean
+            self._conn.execute(
+                "UPDATE students SET total_quizzes = total_quizzes + 1, "
+                "total_topics = total_topics + ?, "
+                "average_score = average_score + (? - average_score) / (total_quizzes + 1), "
+                "latest_score = ?, recent_scores = ?, rolling_average = ?, "
+                "version = version + 1 WHERE student_id = ?",
+                (new_topic, score, score, json.dumps(recent_scores), rolling_average,
+                 student_id)
+            )
+
+    def profile_version(self, student_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version FROM students WHERE student_id = ?", (student_id,)
+            ).fetchone()
+        return row["version"] if row is not None else None
+
+    def get_recent_quizzes(self, student_id: str, limit: int) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM quiz_history WHERE student_id = ? ORDER BY id DESC LIMIT ?",
+                (student_id, limit)
+            ).fetchall()
+        return [self._quiz_entry(r) for r in reversed(rows)]
+
+    def find_students_weak_in(self, topic: str) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT student_id FROM student_topics "
+                "WHERE topic = ? AND weak_seq IS NOT NULL ORDER BY student_id",
+                (topic,)
+            ).fetchall()
+        return [r["student_id"] for r in rows]
+
+    def quiz_rows(self) -> list:
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT student_id, timestamp, topic, score, total_questions, correct_answers "
+                "FROM quiz_history ORDER BY student_id, id"
+            )
+            cursor.row_factory = None
+            return cursor.fetchall()
+
+    def get_popular_topics(self, limit: int) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT topic, COUNT(*) AS students FROM student_topics "
+                "GROUP BY topic ORDER BY students DESC, topic LIMIT ?", (limit,)
+            ).fetchall()
+        return [r["topic"] for r in rows]
+
+    def disk_usage(self) -> dict:
+        return file_sizes({"database": self.db_path,
+                           "wal": self.db_path.with_name(self.db_path.name + "-wal")})
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _transaction(self):
+        return _Transaction(self._conn)
+
+    @staticmethod
+    def _topic_stats(row) -> dict:
+        topic_stats = new_topic_stats()
+        topic_stats.update(
+            attempts=row["attempts"],
+            best_score=row["best_score"],
+            latest_score=row["latest_score"],
+            strong=row["strong_seq"] is not None,
+            weak=row["weak_seq"] is not None
+        )
+        return topic_stats
+
+    @staticmethod
+    def _quiz_entry(row) -> dict:
+        return {
+            "timestamp": row["timestamp"],
+            "topic": row["topic"],
+            "score": row["score"],
+            "total_questions": row["total_questions"],
+            "correct_answers": row["correct_answers"]
+        }
+
+class _Transaction:
+    """BEGIN IMMEDIATE / COMMIT around a block on an autocommit connection"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+def create_storage(backend: str, **options) -> MemoryStorage:
+    """Build a storage backend by name"""
+    if backend == "json":
+        return JsonStorage(**options)
+    if backend == "sharded":
+        return ShardedJsonStorage(**options)
+    if backend == "sqlite":
+        return SQLiteStorage(**options)
+    raise ValueError(f"Unknown memory backend: {backend}")
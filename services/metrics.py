@@ -0,0 +1,237 @@
+"""Metrics - Counters, gauges and latency histograms in Prometheus text format"""
+import bisect
+import functools
+import inspect
+import math
+import threading
+import time
+
+# seconds; covers cached replies (sub-millisecond) up to slow model calls
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class _Metric:
+    """Base for counters and gauges, which may read their value from a callback
+
+    The callback runs at scrape time and returns a number, or a dict of
+    label-value tuples to numbers.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames=(), callback=None):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def samples(self) -> list:
+        if self.callback is None:
+            with self._lock:
+                return [(self.name, key, value) for key, value in self._values.items()]
+        try:
+            current = self.callback()
+        except Exception:
+            return []
+        if isinstance(current, dict):
+            return [(self.name, tuple(str(v) for v in key), value)
+                    for key, value in current.items()]
+        return [(self.name, (), current)]
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    """Monotonic count per label set"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+class Gauge(_Metric):
+    """Current value per label set"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        self._observe(self._key(labels), value)
+
+    def _observe(self, key: tuple, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels) -> "_Timer":
+        """Observe the duration of the with-block, also when it raises"""
+        return _Timer(self, self._key(labels))
+
+    def count(self, **labels) -> int:
+        series = self._values.get(self._key(labels))
+        return series[2] if series else 0
+
+    def samples(self) -> list:
+        rows = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    rows.append((f"{self.name}_bucket", key, cumulative, bound))
+                rows.append((f"{self.name}_sum", key, total))
+                rows.append((f"{self.name}_count", key, count))
+        return rows
+
+class _Timer:
+    """Context manager behind Histogram.time, cheaper than a generator-based one"""
+
+    __slots__ = ("histogram", "key", "started")
+
+    def __init__(self, histogram: Histogram, key: tuple):
+        self.histogram = histogram
+        self.key = key
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram._observe(self.key, time.perf_counter() - self.started)
+        return False
+
+class MetricsRegistry:
+    """Holds every metric and renders them for a Prometheus scrape"""
+
+    def __init__(self, prefix: str = "eternalearn_"):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, *args, **kwargs):
+        full_name = self.prefix + name
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = self._metrics[full_name] = cls(full_name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{full_name} is already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames=(), callback=None) -> Counter:
+        return self._register(Counter, name, help_text, labelnames, callback)
+
+    def gauge(self, name: str, help_text: str, labelnames=(), callback=None) -> Gauge:
+        return self._register(Gauge, name, help_text, labelnames, callback)
+
+    def histogram(self, name: str, help_text: str, labelnames=(),
+                  buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render(self, skip_empty: bool = False) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            samples = metric.samples()
+            if skip_empty and not samples:
+                continue
+            lines.extend(metric.header())
+            for sample in samples:
+                name, key, value = sample[:3]
+                extra = f'le="{_format_value(sample[3])}"' if len(sample) > 3 else ""
+                lines.append(f"{name}{_labels(metric.labelnames, key, extra)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+def timed(histogram: Histogram, **labels):
+    """Decorator observing call duration; async generators are timed until exhausted"""
+    # labels are fixed, so they are checked once here and not on every call
+    key = histogram._key(labels)
+
+    def decorate(func):
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                items = func(*args, **kwargs)
+                with _Timer(histogram, key):
+                    try:
+                        async for item in items:
+                            yield item
+                    finally:
+                        await items.aclose()
+        elif inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with _Timer(histogram, key):
+                    return await func(*args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with _Timer(histogram, key):
+                    return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+metrics = MetricsRegistry()
+
+# shared by the agents, the entry points and the services
+agent_latency = metrics.histogram(
+    "agent_latency_seconds", "Time spent in an agent method", ("agent", "method"))
+route_latency = metrics.histogram(
+    "route_latency_seconds", "End-to-end time per request route", ("route",))
+errors = metrics.counter(
+    "errors_total", "Errors caught and turned into a fallback reply", ("component",))
+model_calls = metrics.counter(
+    "model_calls_total", "Model requests by outcome (ok, error, cache_hit)", ("outcome",))
+model_latency = metrics.histogram(
+    "model_latency_seconds", "Model call time including scheduler wait and retries", ("mode",))
+model_tokens = metrics.counter(
+    "model_tokens_total", "Tokens sent to and received from the model", ("kind",))
+memory_write_latency = metrics.histogram(
+    "memory_write_seconds", "MemoryBank write time per operation", ("operation",))
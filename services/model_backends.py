@@ -0,0 +1,215 @@
+"""Model Backends - Where model clients come from
+
+The agents only use ``model.generate_content_async(prompt, stream=...)`` and
+the ``model_name`` / ``_generation_config`` attributes, so any backend whose
+models offer those can stand in for Gemini.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class ModelBackend:
+    """Creates model clients for the model registry"""
+
+    name = "base"
+
+    def create(self, model_name: str, generation_config: dict = None):
+        raise NotImplementedError
+
+class GeminiBackend(ModelBackend):
+    """Google Gemini through google.generativeai, imported on first use"""
+
+    name = "gemini"
+
+    def __init__(self):
+        self._configured = False
+
+    def create(self, model_name: str, generation_config: dict = None):
+        import google.generativeai as genai
+
+        if not self._configured:
+            Config.validate()
+            genai.configure(api_key=Config.GOOGLE_API_KEY)
+            self._configured = True
+        return genai.GenerativeModel(model_name, generation_config=generation_config)
+
+class FakeModelError(Exception):
+    """Injected failure; the status code makes the scheduler treat it as transient"""
+
+    def __init__(self, code: int = 503):
+        super().__init__(f"Fake model error {code}")
+        self.code = code
+
+class FakeUsage:
+    __slots__ = ("prompt_token_count", "candidates_token_count", "total_token_count")
+
+    def __init__(self, prompt_token_count: int, candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+class FakeResponse:
+    """Looks like a Gemini response (or one streamed chunk of it)"""
+
+    __slots__ = ("text", "usage_metadata")
+
+    def __init__(self, text: str, usage: FakeUsage = None):
+        self.text = text
+        self.usage_metadata = usage
+
+# the agents' prompts put the topic after one of these
+TOPIC_PATTERN = re.compile(r'(?:Topic|quiz on|flowchart for):\s*(.+)')
+
+def fake_explanation(topic: str) -> str:
+    return (
+        f"**{topic.title()}** in one line: it is a process with a start, a middle and an end.\n\n"
+        f"1. Definition: {topic} describes how one state turns into another.\n"
+        f"2. Steps: something goes in, changes, and comes out again.\n"
+        f"3. Example: you can see {topic} around you every day.\n"
+        f"4. Key takeaway: follow the inputs and the outputs."
+    )
+
+def fake_quiz(topic: str, seed: int, as_json: bool = False) -> str:
+    rng = random.Random(seed)
+    options = ["The first option", "The second option", "The third option", "The fourth option"]
+    questions = [{"question": f"Which statement about {topic} is true ({seed % 1000}-{number})?",
+                  "options": options, "answer": rng.choice("ABCD")}
+                 for number in range(1, 6)]
+    if as_json:
+        return json.dumps({"questions": questions})
+    lines = []
+    for number, question in enumerate(questions, 1):
+        lines.append(f"Q{number}: {question['question']}")
+        lines += [f"{letter}) {option}" for letter, option in zip("ABCD", options)]
+        lines.append(f"Correct: {question['answer']}")
+    return "\n".join(lines)
+
+def fake_mermaid(topic: str) -> str:
+    words = [w.capitalize() for w in topic.split() if w.isalpha()][:2] or ["Topic"]
+    label = " ".join(words)
+    return f"graph TD\nA[{label}] --> B[Input]\nB --> C[Process]\nC --> D[Output]"
+
+class FakeModel:
+    """Offline stand-in for a Gemini model with canned outputs
+
+    Latency is drawn per call from the backend's distribution; streamed
+    responses spread it over the chunks. Quiz prompts are answered
+    differently on every call so fresh quizzes are not duplicates.
+    """
+
+    def __init__(self, backend, model_name: str, generation_config: dict = None):
+        self.backend = backend
+        self.model_name = model_name
+        self._generation_config = generation_config or {}
+
+    def _reply(self, prompt: str) -> str:
+        match = TOPIC_PATTERN.search(prompt)
+        topic = match.group(1).strip() if match else "this topic"
+        first_line = prompt.split("\n", 1)[0]
+        if "Mermaid" in first_line:
+            return fake_mermaid(topic)
+        if "quiz" in first_line.lower():
+            as_json = self._generation_config.get("response_mime_type") == "application/json"
+            return fake_quiz(topic, self.backend.next_seed(), as_json)
+        return fake_explanation(topic)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, **kwargs):
+        latency = self.backend.sample_latency()
+        await self.backend.maybe_fail(latency)
+        text = self._reply(prompt)
+        usage = FakeUsage(len(prompt) // 4, len(text) // 4)
+        if not stream:
+            await asyncio.sleep(latency)
+            return FakeResponse(text, usage)
+        return self._stream(text, usage, latency)
+
+    async def _stream(self, text: str, usage: FakeUsage, latency: float):
+        size = self.backend.chunk_chars
+        pieces = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+        delay = latency / len(pieces)
+        for index, piece in enumerate(pieces):
+            await asyncio.sleep(delay)
+            last = index == len(pieces) - 1
+            yield FakeResponse(piece, usage if last else None)
+
+class FakeBackend(ModelBackend):
+    """Deterministic offline backend for demos, load tests and benchmarks
+
+    latency is "constant", "uniform" (median +/- half) or "lognormal"
+    (median with the given sigma). error_rate is the chance a call raises
+    FakeModelError with code 503.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency: str = "lognormal", latency_median: float = 0.5,
+                 latency_sigma: float = 0.4, error_rate: float = 0.0,
+                 chunk_chars: int = 40, seed: int = 0):
+        self.latency = latency
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.chunk_chars = chunk_chars
+        self._rng = random.Random(seed)
+        self._seed = seed
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def create(self, model_name: str, generation_config: dict = None):
+        return FakeModel(self, model_name, generation_config)
+
+    def next_seed(self) -> int:
+        with self._lock:
+            self._seed += 1
+            return int(hashlib.sha1(str(self._seed).encode()).hexdigest()[:8], 16)
+
+    def sample_latency(self) -> float:
+        with self._lock:
+            self.calls += 1
+            if self.latency == "constant":
+                return self.latency_median
+            if self.latency == "uniform":
+                return self._rng.uniform(self.latency_median / 2, self.latency_median * 1.5)
+            return self._rng.lognormvariate(0, self.latency_sigma) * self.latency_median
+
+    async def maybe_fail(self, latency: float):
+        """Raise FakeModelError for error_rate of the calls, after the call's latency like a real outage"""
+        with self._lock:
+            failed = self.error_rate and self._rng.random() < self.error_rate
+        if failed:
+            await asyncio.sleep(latency)
+            raise FakeModelError(503)
+
+BACKENDS = {
+    "gemini": GeminiBackend,
+    "fake": FakeBackend,
+}
+
+def create_backend(name: str, **options) -> ModelBackend:
+    """Build a model backend by name"""
+    try:
+        factory = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown model backend: {name}")
+    return factory(**options)
+
+def backend_from_config() -> ModelBackend:
+    """The backend selected by Config.MODEL_BACKEND"""
+    Config.load()
+    if Config.MODEL_BACKEND == "fake":
+        return create_backend(
+            "fake",
+            latency=Config.FAKE_MODEL_LATENCY,
+            latency_median=Config.FAKE_MODEL_LATENCY_MEDIAN_SECONDS,
+            latency_sigma=Config.FAKE_MODEL_LATENCY_SIGMA,
+            error_rate=Config.FAKE_MODEL_ERROR_RATE,
+            seed=Config.FAKE_MODEL_SEED
+        )
+    return create_backend(Config.MODEL_BACKEND)
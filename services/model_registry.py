@@ -0,0 +1,60 @@
+"""Model Registry - Lazily created model clients shared by all agents"""
+import json
+import logging
+import threading
+from config import Config
+from .model_backends import backend_from_config
+
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    """One client per (model name, generation config), created on first use
+
+    Clients come from a ModelBackend (Gemini unless Config.MODEL_BACKEND
+    says otherwise). The backend is chosen, and the Gemini SDK imported and
+    configured, only when the first model is requested, so importing the
+    agents has no network or file side effects.
+    """
+
+    def __init__(self, backend=None, backend_factory=None):
+        self._backend = backend
+        self._backend_factory = backend_factory or backend_from_config
+        self._models = {}
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = self._backend_factory()
+                    logger.info(f"Model backend: {self._backend.name}")
+        return self._backend
+
+    def use_backend(self, backend):
+        """Switch every agent to another backend (e.g. the fake one in load tests)"""
+        with self._lock:
+            self._backend = backend
+            self._models.clear()
+
+    def get(self, model_name: str = None, generation_config: dict = None):
+        """Return the shared model client for these settings"""
+        model_name = model_name or Config.MODEL_NAME
+        key = (model_name, json.dumps(generation_config or {}, sort_keys=True))
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        backend = self.backend
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                logger.info(f"Creating model client: {model_name}")
+                model = self._models[key] = backend.create(model_name, generation_config)
+        return model
+
+    def clear(self):
+        """Forget every cached client"""
+        with self._lock:
+            self._models.clear()
+
+model_registry = ModelRegistry()
@@ -0,0 +1,196 @@
+"""Quiz - Structured quizzes parsed once from the model's JSON reply"""
+import functools
+import hashlib
+import json
+import re
+
+LETTERS = "ABCD"
+
+# response schema for the quiz model (OpenAPI subset accepted by Gemini)
+QUIZ_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "questions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "question": {"type": "string"},
+                    "options": {"type": "array", "items": {"type": "string"}},
+                    "answer": {"type": "string", "format": "enum", "enum": list(LETTERS)},
+                },
+                "required": ["question", "options", "answer"],
+            },
+        },
+    },
+    "required": ["questions"],
+}
+
+QUIZ_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": QUIZ_SCHEMA,
+}
+
+# the plain text layout quizzes used before the JSON schema
+_LEGACY_QUESTION = re.compile(r"^Q\d+[:.)]\s*(.*)$")
+_LEGACY_OPTION = re.compile(r"^([A-D])[).:]\s*(.*)$")
+_LEGACY_ANSWER = re.compile(r"^Correct:\s*([A-Da-d])")
+
+def quiz_id(quiz_text: str) -> str:
+    """Fingerprint a quiz so duplicates and repeats can be detected"""
+    return hashlib.sha1(" ".join(quiz_text.split()).encode()).hexdigest()[:16]
+
+class Question:
+    """One multiple-choice question and its answer letter"""
+
+    __slots__ = ("text", "options", "answer")
+
+    def __init__(self, text: str, options, answer: str):
+        self.text = text.strip()
+        self.options = tuple(str(option).strip() for option in options)
+        self.answer = answer.strip().upper()[:1]
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Question":
+        return cls(data["question"], data["options"], data["answer"])
+
+    def to_dict(self) -> dict:
+        return {"question": self.text, "options": list(self.options), "answer": self.answer}
+
+    def render(self, number: int) -> str:
+        """Student-facing markdown, without the answer"""
+        options = "\n".join(f"- {letter}) {option}" for letter, option in zip(LETTERS, self.options))
+        return f"**Q{number}.** {self.text}\n\n{options}"
+
+class Quiz:
+    """A topic, its questions and the answer key as one letter per question
+
+    Quizzes are immutable once built, so one instance can be shared by the
+    response cache, the quiz pool and every session it is served to. The
+    student-facing markdown is rendered on first use and kept.
+    """
+
+    __slots__ = ("id", "topic", "questions", "answer_key", "_markdown")
+
+    def __init__(self, topic: str, questions, fingerprint: str = None):
+        self.topic = topic
+        self.questions = tuple(questions)
+        self.answer_key = tuple(question.answer for question in self.questions)
+        self.id = fingerprint or quiz_id(json.dumps([q.to_dict() for q in self.questions]))
+        self._markdown = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Quiz":
+        """Rebuild a quiz saved with to_dict (older entries kept the raw text)"""
+        if "questions" not in data or isinstance(data["questions"], str):
+            return cls.parse(data["topic"], data["quiz_text"])
+        return cls(data["topic"], [Question.from_dict(q) for q in data["questions"]],
+                   data.get("id"))
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "topic": self.topic,
+                "questions": [question.to_dict() for question in self.questions]}
+
+    @classmethod
+    def parse(cls, topic: str, text: str) -> "Quiz":
+        """Build a quiz from a model reply, JSON or the older plain text layout"""
+        return _parse(topic, text)
+
+    @classmethod
+    def from_json(cls, topic: str, text: str) -> "Quiz":
+        data = json.loads(text)
+        items = data["questions"] if isinstance(data, dict) else data
+        return cls(topic, [Question.from_dict(item) for item in items])
+
+    @classmethod
+    def from_text(cls, topic: str, text: str) -> "Quiz":
+        """Parse "Q1: ... / A) ... / Correct: B" blocks"""
+        questions = []
+        current = None
+        for line in text.split("\n"):
+            line = line.strip()
+            match = _LEGACY_QUESTION.match(line)
+            if match:
+                current = [match.group(1), []]
+                continue
+            if current is None:
+                continue
+            match = _LEGACY_OPTION.match(line)
+            if match:
+                current[1].append(match.group(2))
+                continue
+            match = _LEGACY_ANSWER.match(line)
+            if match:
+                questions.append(Question(current[0], current[1], match.group(1)))
+                current = None
+        return cls(topic, questions)
+
+    def render(self) -> str:
+        """Student-facing markdown of all questions, rendered once"""
+        if self._markdown is None:
+            self._markdown = "\n\n".join(question.render(number)
+                                         for number, question in enumerate(self.questions, 1))
+        return self._markdown
+
+    def grade(self, answers: dict) -> list:
+        """The student's letter (or "?") next to the right one, per question"""
+        return [(answers.get(number, "?"), correct)
+                for number, correct in enumerate(self.answer_key, 1)]
+
+    def __len__(self):
+        return len(self.questions)
+
+@functools.lru_cache(maxsize=256)
+def _parse(topic: str, text: str) -> Quiz:
+    # cached replies come back as the same text, so they are parsed only once
+    stripped = text.strip()
+    if stripped.startswith("```"):
+        stripped = stripped.strip("`").removeprefix("json").strip()
+    if stripped[:1] in ("{", "["):
+        try:
+            quiz = Quiz.from_json(topic, stripped)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            quiz = None
+        if quiz is not None and quiz.questions:
+            return quiz
+    return Quiz.from_text(topic, text)
+
+class QuizStreamParser:
+    """Picks complete questions out of a quiz reply while it streams in
+
+    Each question object is decoded as soon as its closing brace arrives,
+    so the first questions can be shown before the model has finished.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._position = None
+        self._decoder = json.JSONDecoder()
+        self.questions = []
+
+    def feed(self, chunk: str) -> list:
+        """Add a chunk, returns the questions it completed"""
+        self._buffer += chunk
+        if self._position is None:
+            key = self._buffer.find('"questions"')
+            start = self._buffer.find("[", key) if key >= 0 else -1
+            if start < 0:
+                return []
+            self._position = start + 1
+        found = []
+        buffer = self._buffer
+        while True:
+            position = self._position
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position >= len(buffer) or buffer[position] != "{":
+                break
+            try:
+                item, end = self._decoder.raw_decode(buffer, position)
+                question = Question.from_dict(item)
+            except (ValueError, KeyError, TypeError, AttributeError):
+                break
+            found.append(question)
+            self._position = end
+        self.questions.extend(found)
+        return found
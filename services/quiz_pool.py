@@ -0,0 +1,412 @@
+"""Quiz Pool - Pre-generated quizzes served without waiting on the model"""
+import atexit
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from config import Config
+from .memory_bank import memory_bank
+from .quiz import Quiz
+
+logger = logging.getLogger(__name__)
+
+def topic_key(topic: str) -> str:
+    """Normalize a topic for pool lookups"""
+    return " ".join(topic.lower().split())
+
+class SQLitePoolStore:
+    """Pooled quizzes, served quiz ids and requested topics that worker processes share
+
+    Taking a quiz deletes it and records it as seen in one transaction, so
+    two workers never hand out the same pooled quiz. A lease row lets one
+    worker at a time run the refill. The database is opened on first use.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS pooled (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        topic TEXT NOT NULL,
+        quiz_id TEXT NOT NULL,
+        data TEXT NOT NULL,
+        UNIQUE (topic, quiz_id)
+    );
+    CREATE TABLE IF NOT EXISTS seen (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id TEXT NOT NULL,
+        quiz_id TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_seen_student ON seen(student_id, quiz_id);
+    CREATE TABLE IF NOT EXISTS requested_topics (topic TEXT PRIMARY KEY);
+    CREATE TABLE IF NOT EXISTS leases (
+        name TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        expires REAL NOT NULL
+    );
+    """
+
+    def __init__(self, db_path: str = "./data/state.db"):
+        self.db_path = Path(db_path)
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _transaction(self, work):
+        """Run work(conn) in a write transaction, returns its result"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+
+    def has_seen(self, student_id: str, quiz_id: str) -> bool:
+        with self._lock:
+            return self._connection().execute(
+                "SELECT 1 FROM seen WHERE student_id = ? AND quiz_id = ?", (student_id, quiz_id)
+            ).fetchone() is not None
+
+    @staticmethod
+    def _mark_seen(conn, student_id: str, quiz_id: str, keep: int):
+        conn.execute("INSERT INTO seen (student_id, quiz_id) VALUES (?, ?)", (student_id, quiz_id))
+        conn.execute(
+            "DELETE FROM seen WHERE student_id = ? AND id <= (SELECT id FROM seen "
+            "WHERE student_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+            (student_id, student_id, keep)
+        )
+
+    def mark_seen(self, student_id: str, quiz_id: str, keep: int):
+        """Remember a served quiz, keeping the student's latest keep ids"""
+        self._transaction(lambda conn: self._mark_seen(conn, student_id, quiz_id, keep))
+
+    def take(self, key: str, student_id: str, keep: int):
+        """Remove and return the oldest pooled quiz the student has not seen, or None"""
+        def work(conn):
+            conn.execute("INSERT OR IGNORE INTO requested_topics (topic) VALUES (?)", (key,))
+            row = conn.execute(
+                "SELECT id, quiz_id, data FROM pooled WHERE topic = ? AND quiz_id NOT IN "
+                "(SELECT quiz_id FROM seen WHERE student_id = ?) ORDER BY id LIMIT 1",
+                (key, student_id)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM pooled WHERE id = ?", (row[0],))
+            self._mark_seen(conn, student_id, row[1], keep)
+            return row[2]
+        data = self._transaction(work)
+        return Quiz.from_dict(json.loads(data)) if data is not None else None
+
+    def add(self, key: str, quiz: Quiz, depth: int) -> bool:
+        """Pool a quiz unless the topic is full or already has it"""
+        def work(conn):
+            count = conn.execute("SELECT COUNT(*) FROM pooled WHERE topic = ?", (key,)).fetchone()[0]
+            if count >= depth:
+                return False
+            return conn.execute(
+                "INSERT OR IGNORE INTO pooled (topic, quiz_id, data) VALUES (?, ?, ?)",
+                (key, quiz.id, json.dumps(quiz.to_dict()))
+            ).rowcount == 1
+        return self._transaction(work)
+
+    def size(self, key: str) -> int:
+        with self._lock:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM pooled WHERE topic = ?", (key,)
+            ).fetchone()[0]
+
+    def pop_requested(self) -> list:
+        """Topics asked for since the last call, by any worker"""
+        def work(conn):
+            topics = [row[0] for row in conn.execute("SELECT topic FROM requested_topics")]
+            conn.execute("DELETE FROM requested_topics")
+            return topics
+        return self._transaction(work)
+
+    def claim(self, name: str, owner: str, seconds: float) -> bool:
+        """Hold the named lease for seconds, True while owner holds it"""
+        now = time.time()
+
+        def work(conn):
+            row = conn.execute("SELECT owner, expires FROM leases WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[0] != owner and row[1] > now:
+                return False
+            conn.execute("INSERT OR REPLACE INTO leases (name, owner, expires) VALUES (?, ?, ?)",
+                         (name, owner, now + seconds))
+            return True
+        return self._transaction(work)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+class QuizPool:
+    """Per-topic queues of ready quizzes kept topped up by a background worker
+
+    Topics to refill are the most popular ones in the memory bank, any
+    topic a student asked for recently, and topics with reviews coming due.
+    Each student's served quiz ids are remembered so nobody gets the same
+    quiz twice.
+
+    Without a ``store`` the pool lives in this process and is saved to
+    path. With one (built by ``store_factory`` on first use) it is shared
+    by every worker process, and only the worker holding the refill lease
+    refills it, so background model calls do not grow with the workers.
+
+    Refills spend at most ``rpm_share`` of Config.LLM_REQUESTS_PER_MINUTE,
+    so pre-generation never crowds students out of the provider quota.
+    """
+
+    def __init__(self, path: str = "./data/quiz_pool.json", depth: int = 3,
+                 popular_topics: int = 20, refill_interval: float = 300,
+                 seen_per_student: int = 200, rpm_share: float = 0.25,
+                 store=None, store_factory=None):
+        self.path = Path(path)
+        self.depth = depth
+        self.popular_topics = popular_topics
+        self.refill_interval = refill_interval
+        self.seen_per_student = seen_per_student
+        self.rpm_share = rpm_share
+        self._budget = None
+        self._budget_at = 0.0
+        self._pools = {}
+        self._seen = {}
+        self._requested = set()
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._dirty = False
+        self._loaded = False
+        self._worker = None
+        self._generator = None
+        self._store = store
+        self._store_factory = store_factory
+        self._owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    @property
+    def store(self):
+        if self._store_factory is not None:
+            with self._lock:
+                if self._store_factory is not None:
+                    self._store = self._store_factory()
+                    self._store_factory = None
+        return self._store
+
+    def _load(self):
+        """Read the pool file on first use"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load quiz pool: {e}")
+            return
+        for topic, quizzes in data.get("pools", {}).items():
+            pool = self._pools[topic] = deque()
+            for quiz in quizzes:
+                try:
+                    pool.append(Quiz.from_dict(quiz))
+                except (KeyError, TypeError, ValueError) as e:
+                    logger.error(f"Skipping unreadable pooled quiz: {e}")
+        for student_id, ids in data.get("seen", {}).items():
+            self._seen[student_id] = deque(ids, maxlen=self.seen_per_student)
+
+    def save(self):
+        """Write the pool to disk if it changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps({
+                "pools": {topic: [quiz.to_dict() for quiz in quizzes]
+                          for topic, quizzes in self._pools.items()},
+                "seen": {student_id: list(ids) for student_id, ids in self._seen.items()}
+            })
+            self._dirty = False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def has_seen(self, student_id: str, quiz: Quiz) -> bool:
+        if self.store is not None:
+            return self.store.has_seen(student_id, quiz.id)
+        with self._lock:
+            self._load()
+            return quiz.id in self._seen.get(student_id, ())
+
+    def mark_seen(self, student_id: str, quiz: Quiz):
+        if self.store is not None:
+            self.store.mark_seen(student_id, quiz.id, self.seen_per_student)
+            return
+        with self._lock:
+            self._load()
+            seen = self._seen.setdefault(student_id, deque(maxlen=self.seen_per_student))
+            seen.append(quiz.id)
+            self._dirty = True
+
+    def take(self, topic: str, student_id: str):
+        """Pop a quiz the student has not seen yet, or None"""
+        key = topic_key(topic)
+        if self.store is not None:
+            quiz = self.store.take(key, student_id, self.seen_per_student)
+            self._wake.set()
+            return quiz
+        with self._lock:
+            self._load()
+            self._requested.add(key)
+            pool = self._pools.get(key)
+            quiz = None
+            if pool:
+                seen = self._seen.get(student_id, ())
+                for candidate in pool:
+                    if candidate.id not in seen:
+                        quiz = candidate
+                        break
+                if quiz is not None:
+                    pool.remove(quiz)
+                    self.mark_seen(student_id, quiz)
+        # refill what was just used (or found missing)
+        self._wake.set()
+        return quiz
+
+    def add(self, topic: str, quiz: Quiz) -> bool:
+        """Add a generated quiz, returns False for duplicates or a full pool"""
+        key = topic_key(topic)
+        if self.store is not None:
+            return self.store.add(key, quiz, self.depth)
+        with self._lock:
+            self._load()
+            pool = self._pools.setdefault(key, deque())
+            if len(pool) >= self.depth or any(q.id == quiz.id for q in pool):
+                return False
+            pool.append(quiz)
+            self._dirty = True
+            return True
+
+    def size(self, topic: str) -> int:
+        if self.store is not None:
+            return self.store.size(topic_key(topic))
+        with self._lock:
+            self._load()
+            return len(self._pools.get(topic_key(topic), ()))
+
+    def start(self, generator):
+        """Start the refill worker; generator(topic) returns a fresh Quiz"""
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is not None:
+                return
+            self._generator = generator
+            self._worker = threading.Thread(target=self._run, name="quiz-pool-refill",
+                                            daemon=True)
+            self._worker.start()
+            atexit.register(self.save)
+
+    def _targets(self) -> list:
+        """Topics the worker should keep stocked"""
+        topics = []
+        try:
+            topics = [topic_key(t) for t in memory_bank.get_popular_topics(self.popular_topics)]
+        except Exception as e:
+            logger.error(f"Could not read popular topics: {e}")
+        due = []
+        if memory_bank.reviews is not None:
+            try:
+                due = [topic_key(t) for t in
+                       memory_bank.reviews.due_topics(Config.REVIEW_PREFETCH_SECONDS,
+                                                      self.popular_topics)]
+            except Exception as e:
+                logger.error(f"Could not read due reviews: {e}")
+        if self.store is not None:
+            requested = self.store.pop_requested()
+        else:
+            with self._lock:
+                requested = list(self._requested)
+                self._requested.clear()
+        return list(dict.fromkeys(requested + due + topics))
+
+    def _allowance(self) -> float:
+        """Generations the refill may start now, earned at its share of the request quota"""
+        rate = self.rpm_share * Config.LLM_REQUESTS_PER_MINUTE / 60
+        cap = max(rate * self.refill_interval, 1.0)
+        now = time.monotonic()
+        if self._budget is None:
+            self._budget = cap
+        else:
+            self._budget = min(cap, self._budget + (now - self._budget_at) * rate)
+        self._budget_at = now
+        return self._budget
+
+    def refill(self):
+        """Top up every target topic to the configured depth, within the refill's share of the quota"""
+        for topic in self._targets():
+            attempts = 0
+            while self.size(topic) < self.depth and attempts < self.depth * 2:
+                if self._allowance() < 1:
+                    logger.info("Quiz pool refill used its share of the request quota, "
+                                "continuing next pass")
+                    self.save()
+                    return
+                self._budget -= 1
+                attempts += 1
+                try:
+                    quiz = self._generator(topic)
+                except Exception as e:
+                    logger.error(f"Quiz pre-generation failed for {topic}: {e}")
+                    break
+                if quiz is not None:
+                    self.add(topic, quiz)
+        self.save()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.refill_interval)
+            self._wake.clear()
+            try:
+                # a shared pool is refilled by one worker, the others only serve it
+                if self.store is None or self.store.claim("quiz-pool-refill", self._owner,
+                                                          2 * self.refill_interval):
+                    self.refill()
+            except Exception as e:
+                logger.error(f"Quiz pool refill failed: {e}")
+
+def store_from_config():
+    """The shared pool store when Config.STATE_BACKEND is "sqlite", else None"""
+    Config.load()
+    if Config.STATE_BACKEND == "sqlite":
+        return SQLitePoolStore(Config.STATE_DB_PATH)
+    if Config.STATE_BACKEND != "json":
+        raise ValueError(f"Unknown state backend: {Config.STATE_BACKEND}")
+    return None
+
+quiz_pool = QuizPool(
+    Config.QUIZ_POOL_PATH,
+    depth=Config.QUIZ_POOL_DEPTH,
+    popular_topics=Config.QUIZ_POOL_POPULAR_TOPICS,
+    refill_interval=Config.QUIZ_POOL_REFILL_INTERVAL_SECONDS,
+    rpm_share=Config.QUIZ_POOL_RPM_SHARE,
+    store_factory=store_from_config
+)
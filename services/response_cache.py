@@ -0,0 +1,177 @@
+"""Response Cache - Two-tier cache for model responses"""
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from config import Config
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """In-memory LRU in front of a SQLite table with TTL and size eviction
+
+    Keys hash the model name, temperature and the prompt with whitespace
+    collapsed and case folded, so trivially different prompts share an entry.
+    """
+
+    def __init__(self, path: str = "./data/response_cache.db", memory_items: int = 512,
+                 ttl_seconds: float = 7 * 24 * 3600, max_disk_bytes: int = 100 * 1024 * 1024):
+        self.path = Path(path)
+        self.memory_items = memory_items
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        self._conn = None
+        self._disk_bytes = 0
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model_name: str, temperature, prompt: str) -> str:
+        """Build the cache key for a model call"""
+        normalized = re.sub(r'\s+', ' ', prompt).strip().casefold()
+        raw = f"{model_name}\x00{temperature}\x00{normalized}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _db(self):
+        """Open the disk tier on first use"""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False,
+                                         isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)"
+            )
+            self._disk_bytes = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+        return self._conn
+
+    def get(self, key: str):
+        """Return a cached response or None"""
+        with self._lock:
+            entry = self._memory.get(key)
+            now = time.time()
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.hits["memory"] += 1
+                    return value
+                del self._memory[key]
+
+            try:
+                row = self._db().execute(
+                    "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] > self.ttl_seconds:
+                    self._delete(key)
+                    row = None
+                if row is not None:
+                    self._db().execute(
+                        "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+                    )
+                    self._remember(key, row[0], row[1])
+                    self.hits["disk"] += 1
+                    return row[0]
+            except sqlite3.Error as e:
+                logger.error(f"Response cache read failed: {e}")
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str):
+        """Store a response in both tiers"""
+        now = time.time()
+        size = len(value.encode())
+        with self._lock:
+            self._remember(key, value, now)
+            try:
+                db = self._db()
+                previous = db.execute(
+                    "SELECT size FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, size, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)", (key, value, size, now, now)
+                )
+                self._disk_bytes += size - (previous[0] if previous else 0)
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._evict()
+            except sqlite3.Error as e:
+                logger.error(f"Response cache write failed: {e}")
+
+    def _remember(self, key: str, value: str, created_at: float):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _delete(self, key: str):
+        row = self._db().execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self._db().execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._disk_bytes -= row[0]
+
+    def _evict(self):
+        """Drop expired rows, then least recently used ones until under the size cap"""
+        db = self._db()
+        db.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        self._disk_bytes = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        target = self.max_disk_bytes * 0.9
+        rows = db.execute("SELECT key, size FROM responses ORDER BY last_access")
+        doomed = []
+        for key, size in rows:
+            if self._disk_bytes <= target:
+                break
+            doomed.append((key,))
+            self._disk_bytes -= size
+        db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        logger.info(f"Response cache evicted {len(doomed)} entries")
+
+    def stats(self) -> dict:
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            lookups = self.hits["memory"] + self.hits["disk"] + self.misses
+            return {
+                "memory_hits": self.hits["memory"],
+                "disk_hits": self.hits["disk"],
+                "misses": self.misses,
+                "hit_rate": (lookups - self.misses) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_bytes
+            }
+
+    def clear(self):
+        """Empty both tiers"""
+        with self._lock:
+            self._memory.clear()
+            self._db().execute("DELETE FROM responses")
+            self._disk_bytes = 0
+
+response_cache = ResponseCache(
+    Config.RESPONSE_CACHE_PATH,
+    memory_items=Config.RESPONSE_CACHE_MEMORY_ITEMS,
+    ttl_seconds=Config.RESPONSE_CACHE_TTL_SECONDS,
+    max_disk_bytes=Config.RESPONSE_CACHE_MAX_MB * 1024 * 1024
+)
+
+metrics.counter("response_cache_hits_total", "Response cache hits per tier", ("tier",),
+                callback=lambda: {("memory",): response_cache.hits["memory"],
+                                  ("disk",): response_cache.hits["disk"]})
+metrics.counter("response_cache_misses_total", "Response cache misses",
+                callback=lambda: response_cache.misses)
+metrics.gauge("response_cache_bytes", "Size of the response cache's disk tier",
+              callback=lambda: response_cache.stats()["disk_bytes"])
@@ -0,0 +1,402 @@
+"""Review Scheduler - Spaced repetition (SM-2) over the topics students were quizzed on"""
+import atexit
+import heapq
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from config import Config
+from .journal import Journal, write_atomic
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400.0
+START_EASINESS = 2.5
+MIN_EASINESS = 1.3
+
+def quality(score: float) -> int:
+    """SM-2 answer quality 0-5 from a quiz score in [0, 1]"""
+    return max(0, min(5, round(score * 5)))
+
+class ReviewItem:
+    """One (student, topic) pair and its SM-2 state"""
+
+    __slots__ = ("student_id", "topic", "repetitions", "interval", "easiness", "due", "seq")
+
+    def __init__(self, student_id: str, topic: str, repetitions: int = 0, interval: float = 0.0,
+                 easiness: float = START_EASINESS, due: float = 0.0):
+        self.student_id = student_id
+        self.topic = topic
+        self.repetitions = repetitions
+        self.interval = interval
+        self.easiness = easiness
+        self.due = due
+        self.seq = None
+
+    def review(self, score: float, reviewed_at: float):
+        """Apply a quiz result: failed topics come back the next day, passed ones ever later"""
+        q = quality(score)
+        if q < 3:
+            self.repetitions = 0
+            self.interval = 1.0
+        else:
+            self.repetitions += 1
+            if self.repetitions == 1:
+                self.interval = 1.0
+            elif self.repetitions == 2:
+                self.interval = 6.0
+            else:
+                self.interval *= self.easiness
+        self.easiness = max(MIN_EASINESS, self.easiness + 0.1 - (5 - q) * (0.08 + (5 - q) * 0.02))
+        self.due = reviewed_at + self.interval * DAY
+
+    def to_list(self) -> list:
+        return [self.student_id, self.topic, self.repetitions, round(self.interval, 4),
+                round(self.easiness, 4), self.due]
+
+def _walk(heap: list, until: float):
+    """Yield the live items of a heap due by until, soonest first, without popping anything
+
+    Best-first search over the heap array: a node's children are never due
+    before it, so the first k items cost O(k log k) whatever the heap's size.
+    """
+    frontier = [(heap[0], 0)] if heap else []
+    while frontier:
+        entry, index = heapq.heappop(frontier)
+        if entry[0] > until:
+            return
+        if entry[1] == entry[2].seq:
+            yield entry[2]
+        for child in (2 * index + 1, 2 * index + 2):
+            if child < len(heap):
+                heapq.heappush(frontier, (heap[child], child))
+
+class SQLiteReviewStore:
+    """Review items in a SQLite table that every worker process reads and updates
+
+    Each quiz result is applied to the stored item in one transaction, and
+    due reviews come from an index on the due time. The database is opened
+    on first use.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS reviews (
+        student_id TEXT NOT NULL,
+        topic TEXT NOT NULL,
+        repetitions INTEGER NOT NULL,
+        interval REAL NOT NULL,
+        easiness REAL NOT NULL,
+        due REAL NOT NULL,
+        PRIMARY KEY (student_id, topic)
+    );
+    CREATE INDEX IF NOT EXISTS idx_reviews_due ON reviews(due);
+    CREATE INDEX IF NOT EXISTS idx_reviews_student_due ON reviews(student_id, due);
+    CREATE TABLE IF NOT EXISTS review_meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    def __init__(self, db_path: str = "./data/state.db"):
+        self.db_path = Path(db_path)
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _transaction(self, work):
+        """Run work(conn) in a write transaction, returns its result"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+
+    def _query(self, sql: str, params=()) -> list:
+        with self._lock:
+            return self._connection().execute(sql, params).fetchall()
+
+    @staticmethod
+    def _review(conn, student_id: str, topic: str, score: float, reviewed_at: float):
+        row = conn.execute(
+            "SELECT repetitions, interval, easiness, due FROM reviews "
+            "WHERE student_id = ? AND topic = ?", (student_id, topic)
+        ).fetchone()
+        item = ReviewItem(student_id, topic, *row) if row else ReviewItem(student_id, topic)
+        item.review(score, reviewed_at)
+        conn.execute("INSERT OR REPLACE INTO reviews VALUES (?, ?, ?, ?, ?, ?)", item.to_list())
+
+    def bootstrap(self, history) -> int:
+        """Schedule every past quiz once, whichever worker gets here first, returns how many"""
+        def work(conn):
+            if conn.execute("SELECT 1 FROM review_meta WHERE key = 'bootstrapped'").fetchone():
+                return 0
+            replayed = 0
+            for student_id, timestamp, topic, score, *_ in history():
+                self._review(conn, student_id, topic, score,
+                             datetime.fromisoformat(timestamp).timestamp())
+                replayed += 1
+            conn.execute("INSERT INTO review_meta VALUES ('bootstrapped', '1')")
+            return replayed
+        return self._transaction(work)
+
+    def record(self, student_id: str, topic: str, score: float, reviewed_at: float):
+        self._transaction(lambda conn: self._review(conn, student_id, topic, score, reviewed_at))
+
+    def next_reviews(self, student_id: str, limit: int) -> list:
+        return [tuple(row) for row in self._query(
+            "SELECT topic, due FROM reviews WHERE student_id = ? ORDER BY due LIMIT ?",
+            (student_id, limit))]
+
+    def due_within(self, until: float, limit: int = None) -> list:
+        return [tuple(row) for row in self._query(
+            "SELECT student_id, topic, due FROM reviews WHERE due <= ? ORDER BY due LIMIT ?",
+            (until, -1 if limit is None else limit))]
+
+    def due_topics(self, until: float, limit: int, scan: int) -> list:
+        return [row[0] for row in self._query(
+            "SELECT topic FROM (SELECT topic, due FROM reviews WHERE due <= ? "
+            "ORDER BY due LIMIT ?) GROUP BY topic ORDER BY MIN(due) LIMIT ?",
+            (until, scan, limit))]
+
+    def size(self) -> int:
+        return self._query("SELECT COUNT(*) FROM reviews")[0][0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+class ReviewScheduler:
+    """Due-time index over every (student, topic) a student was quizzed on
+
+    Each quiz result moves its item with SM-2: ``record`` pushes a
+    ``(due, seq, item)`` entry onto a global min-heap and onto the
+    student's own heap, O(log n). Entries whose seq is no longer the
+    item's are stale and skipped; a heap is rebuilt once stale entries
+    outnumber live ones, so that stays amortized O(1).
+
+    Like the JSON memory bank, every record is appended to a journal and
+    folded into the snapshot at path in the background. Without a snapshot
+    the schedule is rebuilt from the memory bank's quiz history on first use.
+
+    With a ``store`` (built by ``store_factory`` on first use) the schedule
+    lives there instead and is shared by every worker process.
+    """
+
+    def __init__(self, path: str = "./data/review_schedule.json", compact_every: int = 1000,
+                 store=None, store_factory=None):
+        self.path = Path(path)
+        self.compact_every = compact_every
+        self._items = {}
+        self._due = []
+        self._student_due = {}
+        self._seq = 0
+        self._size = 0
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._exit_hook = False
+        self.journal = Journal(self.path, self._lock, name="review schedule")
+        self._history = None
+        self._store = store
+        self._store_factory = store_factory
+
+    @property
+    def store(self):
+        if self._store_factory is not None:
+            with self._lock:
+                if self._store_factory is not None:
+                    self._store = self._store_factory()
+                    self._store_factory = None
+        return self._store
+
+    def set_history(self, history):
+        """history() returns quiz rows (see MemoryStorage.quiz_rows) to start from"""
+        self._history = history
+
+    def _load(self):
+        """Read the snapshot and journal, or replay the quiz history, on first use"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.store is not None:
+            if self._history is not None:
+                replayed = self.store.bootstrap(self._history)
+                if replayed:
+                    logger.info(f"Scheduled reviews from {replayed} past quizzes")
+            return
+        if not self.path.exists():
+            # the quiz history already holds everything a journal without a snapshot could
+            if self._history is not None:
+                replayed = 0
+                for student_id, timestamp, topic, score, *_ in self._history():
+                    self._review(student_id, topic, score,
+                                 datetime.fromisoformat(timestamp).timestamp())
+                    replayed += 1
+                if replayed:
+                    logger.info(f"Scheduled reviews from {replayed} past quizzes")
+            write_atomic(self.path, self._snapshot())
+            self.journal.reset()
+            return
+        try:
+            with open(self.path, 'r') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load review schedule: {e}")
+            snapshot = {}
+        for values in snapshot.get("items", []):
+            item = ReviewItem(*values)
+            self._items.setdefault(item.student_id, {})[item.topic] = item
+        self._rebuild()
+        self.journal.replay(snapshot.get("journal_seq", 0), lambda record: self._review(
+            record["student_id"], record["topic"], record["score"], record["reviewed_at"]))
+        if self.journal.interrupted():
+            write_atomic(self.path, self._snapshot())
+            self.journal.reset()
+
+    def _review(self, student_id: str, topic: str, score: float, reviewed_at: float):
+        topics = self._items.setdefault(student_id, {})
+        item = topics.get(topic)
+        if item is None:
+            item = topics[topic] = ReviewItem(student_id, topic)
+            self._size += 1
+        item.review(score, reviewed_at)
+        self._seq += 1
+        item.seq = self._seq
+        entry = (item.due, item.seq, item)
+        heapq.heappush(self._due, entry)
+        student_heap = self._student_due.setdefault(student_id, [])
+        heapq.heappush(student_heap, entry)
+        # drop stale entries once they outnumber the live ones
+        if len(student_heap) > 2 * len(topics) + 8:
+            self._student_due[student_id] = self._live_heap(topics.values())
+        if len(self._due) > 2 * self._size + 1024:
+            self._due = self._live_heap(self._all_items())
+
+    def _all_items(self):
+        return (item for topics in self._items.values() for item in topics.values())
+
+    @staticmethod
+    def _live_heap(items) -> list:
+        heap = [(item.due, item.seq, item) for item in items]
+        heapq.heapify(heap)
+        return heap
+
+    def _rebuild(self):
+        """Fresh heaps with one entry per item"""
+        for item in self._all_items():
+            self._seq += 1
+            item.seq = self._seq
+        self._size = sum(len(topics) for topics in self._items.values())
+        self._due = self._live_heap(self._all_items())
+        self._student_due = {student_id: self._live_heap(topics.values())
+                             for student_id, topics in self._items.items()}
+
+    def record(self, student_id: str, topic: str, score: float, reviewed_at: float = None):
+        """Reschedule a topic after a quiz on it"""
+        reviewed_at = time.time() if reviewed_at is None else reviewed_at
+        with self._lock:
+            self._load()
+            if self.store is not None:
+                self.store.record(student_id, topic, score, reviewed_at)
+                return
+            self._review(student_id, topic, score, reviewed_at)
+            self.journal.append({"student_id": student_id, "topic": topic, "score": score,
+                                 "reviewed_at": reviewed_at})
+            if not self._exit_hook:
+                self._exit_hook = True
+                atexit.register(self.close)
+            # rewriting n items every n records keeps compaction amortized O(1)
+            compact = self.journal.compaction_due(max(self.compact_every, self._size))
+        if compact:
+            threading.Thread(target=self.compact, name="review-schedule-compaction",
+                             daemon=True).start()
+
+    def next_reviews(self, student_id: str, limit: int = 3) -> list:
+        """(topic, due epoch seconds) of a student's next reviews, soonest first"""
+        with self._lock:
+            self._load()
+            if self.store is not None:
+                return self.store.next_reviews(student_id, limit)
+            items = list(islice(_walk(self._student_due.get(student_id, []), float("inf")), limit))
+        return [(item.topic, item.due) for item in items]
+
+    def due_within(self, seconds: float = 3600, now: float = None, limit: int = None) -> list:
+        """(student id, topic, due) of every review due in the next seconds, soonest first"""
+        until = (time.time() if now is None else now) + seconds
+        with self._lock:
+            self._load()
+            if self.store is not None:
+                return self.store.due_within(until, limit)
+            items = list(islice(_walk(self._due, until), limit))
+        return [(item.student_id, item.topic, item.due) for item in items]
+
+    def due_topics(self, seconds: float = 3600, limit: int = 20, scan: int = 2000) -> list:
+        """Distinct topics of the reviews due soonest, looking at no more than scan of them"""
+        until = time.time() + seconds
+        topics = {}
+        with self._lock:
+            self._load()
+            if self.store is not None:
+                return self.store.due_topics(until, limit, scan)
+            for item in islice(_walk(self._due, until), scan):
+                topics[item.topic] = None
+                if len(topics) >= limit:
+                    break
+        return list(topics)
+
+    def size(self) -> int:
+        """Scheduled (student, topic) items, without loading the schedule"""
+        if self._store is not None:
+            return self._store.size()
+        return self._size
+
+    def _snapshot(self) -> str:
+        return json.dumps({"journal_seq": self.journal.seq,
+                           "items": [item.to_list() for item in self._all_items()]},
+                          separators=(',', ':'))
+
+    def compact(self):
+        """Fold the journal into a new snapshot"""
+        with self._lock:
+            self._load()
+            if self.store is not None:
+                return
+        self.journal.compact(self._snapshot)
+
+    def close(self):
+        """Flush and close the journal"""
+        with self._lock:
+            self.journal.close()
+
+def store_from_config():
+    """The shared review store when Config.STATE_BACKEND is "sqlite", else None"""
+    Config.load()
+    if Config.STATE_BACKEND == "sqlite":
+        return SQLiteReviewStore(Config.STATE_DB_PATH)
+    if Config.STATE_BACKEND != "json":
+        raise ValueError(f"Unknown state backend: {Config.STATE_BACKEND}")
+    return None
+
+review_scheduler = ReviewScheduler(Config.REVIEW_SCHEDULE_PATH,
+                                   compact_every=Config.REVIEW_COMPACT_EVERY,
+                                   store_factory=store_from_config)
+
+metrics.gauge("review_items", "(student, topic) pairs scheduled for review",
+              callback=review_scheduler.size)
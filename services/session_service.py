@@ -1,27 +1,118 @@
 """Session Service - Manages conversation context"""
+import heapq
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
 from datetime import datetime, timedelta
+from itertools import islice
+from pathlib import Path
+from urllib.parse import quote
+from config import Config
+from .lock_stripes import student_locks
+from .memory_storage import VersionConflictError
+from .metrics import metrics
+from .quiz import Quiz
+
+logger = logging.getLogger(__name__)
+
+reloads = metrics.counter("session_reloads_total",
+                          "Sessions reloaded because another worker process saved a newer one")
+conflicts = metrics.counter("session_update_conflicts_total",
+                            "Session updates retried because another worker saved the session first")
+
+# session context values that are stored as dicts and rebuilt with from_dict
+CONTEXT_TYPES = {"current_quiz": Quiz}
+
+class Message:
+    """One conversation turn, timestamp kept as epoch seconds"""
+    __slots__ = ("role", "content", "timestamp")
+    
+    def __init__(self, role: str, content: str, timestamp: float = None):
+        self.role = role
+        self.content = content
+        self.timestamp = time.time() if timestamp is None else timestamp
+    
+    @property
+    def iso_timestamp(self) -> str:
+        return datetime.fromtimestamp(self.timestamp).isoformat()
+    
+    def to_dict(self) -> dict:
+        return {"role": self.role, "content": self.content, "timestamp": self.iso_timestamp}
+
+class JsonlColdStore:
+    """Appends messages that fall out of a session's window to per-session files"""
+    
+    def __init__(self, directory: str = "./data/history"):
+        self.directory = Path(directory)
+    
+    def append(self, session_id: str, message: Message):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{quote(session_id, safe='')}.jsonl"
+        with open(path, 'a') as f:
+            f.write(json.dumps(message.to_dict()) + "\n")
 
 class Session:
-    """Single learning session"""
+    """Single learning session
+
+    ``conversation_history`` is a ring buffer of the last ``max_history``
+    messages; older turns go to ``cold_store`` when one is configured.
+    """
     
-    def __init__(self, session_id: str, student_id: str):
+    def __init__(self, session_id: str, student_id: str, max_history: int = 50,
+                 cold_store=None):
         self.session_id = session_id
         self.student_id = student_id
         self.created_at = datetime.now()
         self.last_activity = datetime.now()
-        self.conversation_history = []
+        self.conversation_history = deque(maxlen=max_history)
+        self.message_count = 0
+        self.cold_store = cold_store
         self.current_topic = None
         self.context = {}
+        self.version = 0
     
     def add_message(self, role: str, content: str):
         """Add message to history"""
-        self.conversation_history.append({
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now().isoformat()
-        })
+        history = self.conversation_history
+        if self.cold_store is not None and len(history) == history.maxlen:
+            try:
+                self.cold_store.append(self.session_id, history[0])
+            except Exception as e:
+                logger.error(f"Cold store append failed: {e}")
+        history.append(Message(role, content))
+        self.message_count += 1
         self.last_activity = datetime.now()
     
+    def to_dict(self) -> dict:
+        """Everything needed to rebuild the session in another process"""
+        return {
+            "session_id": self.session_id,
+            "student_id": self.student_id,
+            "created_at": self.created_at.timestamp(),
+            "last_activity": self.last_activity.timestamp(),
+            "message_count": self.message_count,
+            "current_topic": self.current_topic,
+            # copied first: list() of a deque or dict is atomic, a comprehension is not
+            "history": [[m.role, m.content, m.timestamp] for m in list(self.conversation_history)],
+            "context": {key: value.to_dict() if key in CONTEXT_TYPES else value
+                        for key, value in list(self.context.items())},
+        }
+    
+    @classmethod
+    def from_dict(cls, data: dict, max_history: int = 50, cold_store=None) -> "Session":
+        session = cls(data["session_id"], data["student_id"], max_history, cold_store)
+        session.created_at = datetime.fromtimestamp(data["created_at"])
+        session.last_activity = datetime.fromtimestamp(data["last_activity"])
+        session.message_count = data["message_count"]
+        session.current_topic = data["current_topic"]
+        session.conversation_history.extend(Message(*message) for message in data["history"])
+        session.context = {key: CONTEXT_TYPES[key].from_dict(value) if key in CONTEXT_TYPES else value
+                           for key, value in data["context"].items()}
+        return session
+    
     def is_expired(self, timeout_minutes: int = 30) -> bool:
         """Check if session expired"""
         return datetime.now() - self.last_activity > timedelta(minutes=timeout_minutes)
@@ -31,31 +122,293 @@ class Session:
         if not self.conversation_history:
             return "New session started."
         
-        recent = self.conversation_history[-5:]
+        recent = list(islice(reversed(self.conversation_history), 5))[::-1]
         summary = f"Current topic: {self.current_topic or 'General'}\n"
         summary += f"Recent messages ({len(recent)}):\n"
         for msg in recent:
-            summary += f"- {msg['role']}: {msg['content'][:50]}...\n"
+            summary += f"- {msg.role}: {msg.content[:50]}...\n"
         return summary
 
+class SQLiteSessionStore:
+    """Sessions in a SQLite file that several worker processes share
+
+    One row per student holds their current session as JSON plus a version
+    that every save increments, so a worker can tell with one primary key
+    lookup whether its copy is still current. A save given the version the
+    session was loaded at is refused once another worker has saved since.
+    The database is opened on first use.
+    """
+    
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        student_id TEXT PRIMARY KEY,
+        session_id TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        last_activity REAL NOT NULL,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_sessions_activity ON sessions(last_activity);
+    """
+    
+    def __init__(self, db_path: str = "./data/sessions.db"):
+        self.db_path = Path(db_path)
+        self._conn = None
+        self._lock = threading.Lock()
+    
+    def _connection(self):
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            self._conn = conn
+        return self._conn
+    
+    def version(self, student_id: str):
+        """(session id, version) of the student's stored session, or None"""
+        with self._lock:
+            return self._connection().execute(
+                "SELECT session_id, version FROM sessions WHERE student_id = ?", (student_id,)
+            ).fetchone()
+    
+    def load(self, student_id: str):
+        """(version, session dict) of the student's stored session, or None"""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT version, data FROM sessions WHERE student_id = ?", (student_id,)
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row is not None else None
+    
+    def save(self, session: Session, expected_version: int = None):
+        """Store the session, returns its new version
+
+        With expected_version the session is only written if the stored
+        version is still that one, None is returned otherwise.
+        """
+        data = json.dumps(session.to_dict(), separators=(',', ':'))
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT version FROM sessions WHERE student_id = ?", (session.student_id,)
+                ).fetchone()
+                current = row[0] if row is not None else 0
+                # a session deleted meanwhile (expired) is simply written again
+                if expected_version is not None and row is not None and current != expected_version:
+                    conn.execute("ROLLBACK")
+                    return None
+                version = current + 1
+                conn.execute(
+                    "INSERT OR REPLACE INTO sessions (student_id, session_id, version, "
+                    "last_activity, data) VALUES (?, ?, ?, ?, ?)",
+                    (session.student_id, session.session_id, version,
+                     session.last_activity.timestamp(), data)
+                )
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        return version
+    
+    def delete_expired(self, cutoff: float) -> int:
+        """Remove sessions idle since before cutoff (epoch seconds)"""
+        with self._lock:
+            return self._connection().execute(
+                "DELETE FROM sessions WHERE last_activity <= ?", (cutoff,)
+            ).rowcount
+    
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
 class SessionService:
-    """Manages multiple sessions"""
+    """Manages multiple sessions
+
+    ``_active`` maps each student to their current session so lookups are
+    O(1). ``_expiry`` is a min-heap of ``(last_activity, session_id)``; entries
+    go stale when a session sees new activity and are re-pushed lazily when
+    the sweeper pops them.
+    
+    With a ``store`` (built by ``store_factory`` on first use) sessions are
+    shared with other worker processes: each lookup checks the stored
+    version and reloads the session when another worker saved a newer one.
+    Changes go through ``update``, which saves only if no other worker
+    saved the session meanwhile and otherwise reapplies the change to the
+    reloaded session.
+    """
     
-    def __init__(self):
+    def __init__(self, timeout_minutes: int = 30, sweep_interval_seconds: float = 60,
+                 max_history: int = 50, cold_store=None, store=None, store_factory=None,
+                 update_retries: int = 5):
+        self.timeout_minutes = timeout_minutes
+        self.update_retries = update_retries
+        self.max_history = max_history
+        self.cold_store = cold_store
+        self._store = store
+        self._store_factory = store_factory
+        self.sweep_interval_seconds = sweep_interval_seconds
         self.sessions = {}
+        self._active = {}
+        self._expiry = []
+        self._lock = threading.Lock()
+        self._sweeper = None
+    
+    @property
+    def store(self):
+        if self._store_factory is not None:
+            with self._lock:
+                if self._store_factory is not None:
+                    self._store = self._store_factory()
+                    self._store_factory = None
+        return self._store
     
     def create_session(self, student_id: str) -> Session:
         """Create new session"""
         session_id = f"session_{student_id}_{datetime.now().timestamp()}"
-        session = Session(session_id, student_id)
-        self.sessions[session_id] = session
+        session = Session(session_id, student_id, self.max_history, self.cold_store)
+        with self._lock:
+            previous = self._active.get(student_id)
+            if previous is not None:
+                self.sessions.pop(previous.session_id, None)
+            self.sessions[session_id] = session
+            self._active[student_id] = session
+            heapq.heappush(self._expiry, (session.last_activity.timestamp(), session_id))
+        self.save(session)
+        self._start_sweeper()
         return session
     
     def get_or_create_session(self, student_id: str) -> Session:
         """Get active session or create new"""
-        for session in self.sessions.values():
-            if session.student_id == student_id and not session.is_expired():
+        session = self._active.get(student_id)
+        if self.store is None and session is not None and not session.is_expired(self.timeout_minutes):
+            return session
+        # concurrent first requests of one student must end up with the same session
+        with student_locks.lock_for(student_id):
+            session = self._active.get(student_id)
+            if self.store is not None:
+                session = self._sync(student_id, session)
+            if session is not None and not session.is_expired(self.timeout_minutes):
                 return session
-        return self.create_session(student_id)
+            return self.create_session(student_id)
+    
+    def save(self, session: Session):
+        """Make the session visible to other workers as it is, no-op without a store"""
+        store = self.store
+        if store is not None:
+            with student_locks.lock_for(session.student_id):
+                session.version = store.save(session)
+    
+    def update(self, student_id: str, change):
+        """Apply change(session) to the student's current session and save it
+
+        Returns what change returns. When another worker saved the session
+        since it was loaded, it is reloaded and change applied again.
+        """
+        for _ in range(self.update_retries):
+            with student_locks.lock_for(student_id):
+                session = self.get_or_create_session(student_id)
+                result = change(session)
+                store = self.store
+                if store is None:
+                    return result
+                version = store.save(session, session.version)
+                if version is not None:
+                    session.version = version
+                    return result
+            conflicts.inc()
+        raise VersionConflictError(f"Session of {student_id} kept changing, gave up after "
+                                   f"{self.update_retries} attempts")
+    
+    def _sync(self, student_id: str, session):
+        """The local session, or the stored one when another worker saved a newer one"""
+        stored = self.store.version(student_id)
+        if stored is None or (session is not None and
+                              (session.session_id, session.version) == tuple(stored)):
+            return session
+        loaded = self.store.load(student_id)
+        if loaded is None:
+            return session
+        version, data = loaded
+        fresh = Session.from_dict(data, self.max_history, self.cold_store)
+        fresh.version = version
+        reloads.inc()
+        with self._lock:
+            if session is not None:
+                self.sessions.pop(session.session_id, None)
+            self.sessions[fresh.session_id] = fresh
+            self._active[student_id] = fresh
+            heapq.heappush(self._expiry, (fresh.last_activity.timestamp(), fresh.session_id))
+        self._start_sweeper()
+        return fresh
+    
+    def active_count(self) -> int:
+        """Number of students with a live session"""
+        return len(self._active)
+    
+    def sweep_expired(self) -> int:
+        """Drop expired sessions, returns how many were removed"""
+        cutoff = (datetime.now() - timedelta(minutes=self.timeout_minutes)).timestamp()
+        removed = 0
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= cutoff:
+                _, session_id = heapq.heappop(self._expiry)
+                session = self.sessions.get(session_id)
+                if session is None:
+                    continue
+                last_activity = session.last_activity.timestamp()
+                if last_activity > cutoff:
+                    # touched since this entry was pushed, track its new deadline
+                    heapq.heappush(self._expiry, (last_activity, session_id))
+                    continue
+                del self.sessions[session_id]
+                if self._active.get(session.student_id) is session:
+                    del self._active[session.student_id]
+                removed += 1
+        if self.store is not None:
+            self.store.delete_expired(cutoff)
+        if removed:
+            logger.info(f"Expired {removed} sessions")
+        return removed
+    
+    def _start_sweeper(self):
+        """Start the background sweeper on first use"""
+        if self._sweeper is not None or not self.sweep_interval_seconds:
+            return
+        with self._lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(
+                    target=self._sweep_loop, name="session-sweeper", daemon=True
+                )
+                self._sweeper.start()
+    
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval_seconds)
+            try:
+                self.sweep_expired()
+            except Exception as e:
+                logger.error(f"Session sweep failed: {e}")
+
+def store_from_config():
+    """The session store selected by Config.SESSION_BACKEND, None keeps sessions in this process"""
+    Config.load()
+    if Config.SESSION_BACKEND == "sqlite":
+        return SQLiteSessionStore(Config.SESSION_DB_PATH)
+    if Config.SESSION_BACKEND != "memory":
+        raise ValueError(f"Unknown session backend: {Config.SESSION_BACKEND}")
+    return None
+
+session_service = SessionService(
+    timeout_minutes=Config.SESSION_TIMEOUT_MINUTES,
+    sweep_interval_seconds=Config.SESSION_SWEEP_INTERVAL_SECONDS,
+    max_history=Config.MAX_CONTEXT_MESSAGES,
+    cold_store=JsonlColdStore(Config.HISTORY_COLD_STORE_DIR) if Config.HISTORY_COLD_STORE_DIR else None,
+    store_factory=store_from_config,
+    update_retries=Config.MEMORY_UPDATE_RETRIES
+)
 
-session_service = SessionService()
\ No newline at end of file
+metrics.gauge("active_sessions", "Students with a live session", callback=session_service.active_count)
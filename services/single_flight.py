@@ -0,0 +1,71 @@
+"""Single Flight - Coalesces concurrent identical model calls"""
+import asyncio
+import concurrent.futures
+import threading
+
+class FlightAbandoned(Exception):
+    """The leading call was cancelled before it produced a result"""
+
+class SingleFlight:
+    """At most one in-flight call per key; later callers wait for its result
+
+    Flights are concurrent.futures.Future objects, so callers on different
+    event loops (the async runner and gradio's loop) can share one call.
+    Errors reach every waiter. If the leader is cancelled the waiters are
+    not: they get FlightAbandoned internally and one of them runs the call.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def begin(self, key: str):
+        """Return (flight, is_leader); the leader must call finish()"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            flight = self._flights[key] = concurrent.futures.Future()
+            return flight, True
+
+    def finish(self, key: str, flight, result=None, error: BaseException = None):
+        """Publish the leader's result (or error) to everyone waiting on the flight"""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        if error is None:
+            flight.set_result(result)
+        elif isinstance(error, Exception):
+            flight.set_exception(error)
+        else:
+            # cancellation or shutdown of the leader only
+            flight.set_exception(FlightAbandoned())
+
+    @staticmethod
+    async def wait(flight):
+        """Wait for a flight without cancelling it if this caller is cancelled"""
+        return await asyncio.shield(asyncio.wrap_future(flight))
+
+    async def do(self, key: str, call):
+        """Run call() (a coroutine function) once for all concurrent callers of key"""
+        while True:
+            flight, leader = self.begin(key)
+            if leader:
+                break
+            try:
+                return await self.wait(flight)
+            except FlightAbandoned:
+                continue
+        try:
+            result = await call()
+        except BaseException as e:
+            self.finish(key, flight, error=e)
+            raise
+        self.finish(key, flight, result=result)
+        return result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
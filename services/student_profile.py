@@ -0,0 +1,102 @@
+"""Student Profile - Shared profile layout and update rules"""
+from datetime import datetime
+
+STRONG_THRESHOLD = 0.8
+WEAK_THRESHOLD = 0.6
+ROLLING_WINDOW = 5
+
+def new_profile(student_id: str) -> dict:
+    """Build an empty student profile"""
+    return {
+        "id": student_id,
+        "created_at": datetime.now().isoformat(),
+        "topics_covered": [],
+        "quiz_history": [],
+        "weak_areas": [],
+        "strong_areas": [],
+        "preferences": {
+            "learning_style": "visual",
+            "difficulty_level": "medium"
+        },
+        "version": 0,
+        "stats": {
+            "total_topics": 0,
+            "total_quizzes": 0,
+            "average_score": 0.0,
+            "latest_score": None,
+            "recent_scores": [],
+            "rolling_average": 0.0
+        },
+        "topic_stats": {}
+    }
+
+def new_topic_stats() -> dict:
+    """Build the per-topic aggregate record"""
+    return {
+        "attempts": 0,
+        "best_score": 0.0,
+        "latest_score": None,
+        "strong": False,
+        "weak": False
+    }
+
+def classify_score(score: float):
+    """Return 'strong', 'weak' or None for a quiz score"""
+    if score >= STRONG_THRESHOLD:
+        return "strong"
+    if score < WEAK_THRESHOLD:
+        return "weak"
+    return None
+
+def push_recent_score(recent_scores: list, score: float) -> float:
+    """Add a score to the rolling window and return the window average"""
+    recent_scores.append(score)
+    if len(recent_scores) > ROLLING_WINDOW:
+        del recent_scores[0]
+    return sum(recent_scores) / len(recent_scores)
+
+def ensure_aggregates(profile: dict):
+    """Backfill incremental aggregates on profiles saved before they existed"""
+    if "topic_stats" in profile:
+        return
+    history = profile["quiz_history"]
+    profile["quiz_history"] = []
+    profile["topics_covered"] = []
+    profile["strong_areas"] = []
+    profile["weak_areas"] = []
+    profile["stats"] = new_profile(profile["id"])["stats"]
+    profile["topic_stats"] = {}
+    for quiz_entry in history:
+        apply_quiz_result(profile, quiz_entry)
+
+def apply_quiz_result(profile: dict, quiz_entry: dict):
+    """Update a profile in place with a quiz entry in O(1)"""
+    ensure_aggregates(profile)
+    topic = quiz_entry["topic"]
+    score = quiz_entry["score"]
+    stats = profile["stats"]
+
+    profile["quiz_history"].append(quiz_entry)
+    profile["version"] = profile.get("version", 0) + 1
+    stats["total_quizzes"] += 1
+
+    # running mean and rolling window
+    stats["average_score"] += (score - stats["average_score"]) / stats["total_quizzes"]
+    stats["latest_score"] = score
+    stats["rolling_average"] = push_recent_score(stats["recent_scores"], score)
+
+    # Update topic progress
+    topic_stats = profile["topic_stats"].get(topic)
+    if topic_stats is None:
+        topic_stats = profile["topic_stats"][topic] = new_topic_stats()
+        profile["topics_covered"].append(topic)
+        stats["total_topics"] += 1
+    topic_stats["attempts"] += 1
+    topic_stats["best_score"] = max(topic_stats["best_score"], score)
+    topic_stats["latest_score"] = score
+
+    # Categorize strength
+    area = classify_score(score)
+    if area is not None and not topic_stats[area]:
+        topic_stats[area] = True
+        profile[f"{area}_areas"].append(topic)
@@ -0,0 +1,315 @@
+"""Topic Index - Maps paraphrased questions to one canonical topic
+
+"explain the water cycle", "what is the water cycle?", "explain the water
+cycle please" and "How does the water cycle work?" all normalize to the
+same key and are matched exactly. Misspelled paraphrases ("celular
+respiration") are found through MinHash signatures of character shingles,
+bucketed with LSH, confirmed by the exact Jaccard similarity of the shingle
+sets and then word by word: only topics with the same words, up to a
+one-letter typo, are merged. A typo in a short topic changes too many
+shingles to reach the threshold, so "water cycel" stays its own topic.
+"""
+import atexit
+import json
+import logging
+import random
+import re
+import threading
+import time
+import zlib
+from pathlib import Path
+from config import Config
+from .journal import file_lock, write_atomic
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+lookups = metrics.counter("topic_index_lookups_total",
+                          "Topic lookups by result (exact, similar, new)", ("result",))
+lookup_latency = metrics.histogram("topic_index_lookup_seconds", "Time to resolve a topic",
+                                   buckets=(0.00001, 0.00005, 0.0001, 0.00025, 0.0005,
+                                            0.001, 0.0025, 0.005, 0.01))
+
+# function words, dropped anywhere in a topic
+STOP_WORDS = frozenset("""
+a an the of and or to in on at by for from into with about as is are was were be been do does did
+can could would should will me my i you your us we our it its this that these those
+how what why when where which who
+""".split())
+
+# the request around a topic, dropped only before it ("can you explain ...")
+REQUEST_WORDS = frozenset("""
+explain describe tell teach show help understand learn define please give
+""".split())
+
+# the end of a request, dropped only after the topic ("... please")
+TRAILING_WORDS = frozenset("please explained again thanks".split())
+
+# verbs that end a question opened by these words ("how does ... work?"),
+# so "work and energy" or "energy and work" keep their "work"
+QUESTION_ENDINGS = {
+    "how": frozenset("work works happen happens".split()),
+    "what": frozenset("mean means".split()),
+}
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+_MERSENNE = (1 << 61) - 1
+
+def _token(word: str) -> str:
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def _topic_words(message: str) -> list:
+    """Word matches of the topic itself, without the request around it or function words"""
+    words = list(_WORD.finditer(message.lower()))
+    trailing = TRAILING_WORDS
+    for word in words[:3]:
+        if word.group() in QUESTION_ENDINGS:
+            trailing = trailing | QUESTION_ENDINGS[word.group()]
+            break
+    start = 0
+    while start < len(words) and (words[start].group() in REQUEST_WORDS
+                                  or words[start].group() in STOP_WORDS):
+        start += 1
+    words = [m for m in words[start:] if m.group() not in STOP_WORDS]
+    end = len(words)
+    while end > 1 and words[end - 1].group() in trailing:
+        end -= 1
+    return words[:end]
+
+def topic_tokens(topic: str) -> tuple:
+    """Meaningful words of a topic, singularized, in order"""
+    return tuple(_token(m.group()) for m in _topic_words(topic))
+
+def topic_key(topic: str) -> str:
+    return " ".join(topic_tokens(topic))
+
+def display_topic(message: str) -> str:
+    """The message without the filler words around the topic, in its own casing"""
+    words = _topic_words(message)
+    if not words:
+        return message.strip()
+    return message[words[0].start():words[-1].end()]
+
+def _typo(a: str, b: str) -> bool:
+    """True when two words differ by one edit or swapped neighbours, past the first letter
+
+    Short words and different first letters are never typos of each other
+    ("RNA"/"DNA", "revolution"/"evolution").
+    """
+    if a[0] != b[0] or min(len(a), len(b)) < 5 or abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diffs = [i for i in range(len(a)) if a[i] != b[i]]
+        return len(diffs) == 1 or (len(diffs) == 2 and diffs[1] == diffs[0] + 1
+                                   and a[diffs[0]] == b[diffs[1]] and a[diffs[1]] == b[diffs[0]])
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+def same_words(key: str, other: str) -> bool:
+    """True when two keys name the same topic: the same words, one of them possibly misspelled
+
+    "aerobic respiration" and "anaerobic respiration", or "hydrogen bond"
+    and "hydrogen", are different topics however many letters they share.
+    """
+    words, other_words = key.split(), other.split()
+    if sorted(words) == sorted(other_words):
+        return True
+    if len(words) != len(other_words):
+        return False
+    differing = [(a, b) for a, b in zip(words, other_words) if a != b]
+    return len(differing) == 1 and _typo(*differing[0])
+
+def shingles(key: str, size: int = 3) -> frozenset:
+    """Hashed character n-grams of a key"""
+    text = " " + key + " "
+    if len(text) <= size:
+        return frozenset([zlib.crc32(text.encode())])
+    return frozenset(zlib.crc32(text[i:i + size].encode()) for i in range(len(text) - size + 1))
+
+class TopicIndex:
+    """Canonical topics with an exact-key dict and a MinHash/LSH index
+
+    resolve() returns the canonical topic for a message, registering the
+    message as a new one when nothing is similar enough. threshold is the
+    minimum Jaccard similarity of the shingle sets for a paraphrase to be
+    merged, and its words must match too (see same_words). Topics that
+    differ in a number ("algebra 1" and "algebra 2") are never merged.
+    """
+
+    def __init__(self, path: str = "./data/topic_index.json", threshold: float = 0.75,
+                 num_perm: int = 32, bands: int = 16, max_topics: int = 50000,
+                 save_every: int = 50):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = Path(path)
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_topics = max_topics
+        self.save_every = save_every
+        rng = random.Random(1)
+        self._perms = [(rng.randrange(1, _MERSENNE), rng.randrange(_MERSENNE))
+                       for _ in range(num_perm)]
+        self._topics = []
+        self._by_key = {}
+        self._buckets = {}
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._unsaved = 0
+        self._exit_hook = False
+        self.counts = {"exact": 0, "similar": 0, "new": 0}
+        self._seconds = 0.0
+
+    def signature(self, grams: frozenset) -> tuple:
+        """MinHash signature: the smallest permuted hash per permutation"""
+        return tuple(min((a * g + b) % _MERSENNE for g in grams) for a, b in self._perms)
+
+    def _bands(self, signature: tuple):
+        rows = self.rows
+        for band in range(self.bands):
+            yield (band,) + signature[band * rows:(band + 1) * rows]
+
+    def _add(self, display: str, key: str, grams: frozenset) -> int:
+        topic_id = len(self._topics)
+        self._topics.append((display, key, grams))
+        self._by_key[key] = topic_id
+        for band in self._bands(self.signature(grams)):
+            self._buckets.setdefault(band, []).append(topic_id)
+        return topic_id
+
+    def _load(self):
+        """Read saved topics on first use"""
+        if self._loaded:
+            return
+        self._loaded = True
+        self._merge(self._read())
+
+    def _read(self) -> list:
+        """Topics saved on disk, by any worker"""
+        if not self.path.exists():
+            return []
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f).get("topics", [])
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load topic index: {e}")
+            return []
+
+    def _merge(self, saved: list):
+        """Add saved topics this process does not know yet"""
+        for display in saved:
+            if len(self._topics) >= self.max_topics:
+                break
+            key = topic_key(display)
+            if key and key not in self._by_key:
+                self._add(display, key, shingles(key))
+
+    def _similar(self, key: str, grams: frozenset):
+        """Best (topic id, similarity) at or above the threshold, or None"""
+        candidates = set()
+        for band in self._bands(self.signature(grams)):
+            candidates.update(self._buckets.get(band, ()))
+        best = None
+        for topic_id in candidates:
+            _, other_key, other = self._topics[topic_id]
+            similarity = len(grams & other) / len(grams | other)
+            if similarity < self.threshold or not same_words(key, other_key):
+                continue
+            if best is None or similarity > best[1]:
+                best = (topic_id, similarity)
+        return best
+
+    def match(self, message: str):
+        """(canonical topic, confidence) for a message, None when there is no match"""
+        key = topic_key(message)
+        if not key:
+            return None
+        with self._lock:
+            self._load()
+            topic_id = self._by_key.get(key)
+            if topic_id is not None:
+                return self._topics[topic_id][0], 1.0
+            best = self._similar(key, shingles(key))
+            if best is None:
+                return None
+            return self._topics[best[0]][0], round(best[1], 3)
+
+    def resolve(self, message: str) -> str:
+        """Canonical topic for a message, which becomes one itself when nothing matches"""
+        started = time.perf_counter()
+        key = topic_key(message)
+        if not key:
+            return message
+        due = False
+        with self._lock:
+            self._load()
+            topic_id = self._by_key.get(key)
+            if topic_id is not None:
+                result = "exact"
+            else:
+                grams = shingles(key)
+                best = self._similar(key, grams)
+                if best is not None:
+                    topic_id, result = best[0], "similar"
+                    # the next identical paraphrase is an exact hit
+                    self._by_key[key] = topic_id
+                elif len(self._topics) < self.max_topics:
+                    topic_id, result = self._add(display_topic(message), key, grams), "new"
+                    due = self._mark_unsaved()
+                else:
+                    result = "new"
+            display = self._topics[topic_id][0] if topic_id is not None else display_topic(message)
+            elapsed = time.perf_counter() - started
+            self.counts[result] += 1
+            self._seconds += elapsed
+        lookups.inc(result=result)
+        lookup_latency.observe(elapsed)
+        if due:
+            self.save()
+        return display
+
+    def _mark_unsaved(self) -> bool:
+        """Count an unsaved topic, True when it is time to write the file"""
+        self._unsaved += 1
+        if not self._exit_hook:
+            self._exit_hook = True
+            atexit.register(self.save)
+        return self._unsaved >= self.save_every
+
+    def save(self):
+        """Write the canonical topics to disk if new ones were added
+
+        Topics other workers saved meanwhile are merged in first, so no
+        worker's topics are lost.
+        """
+        with self._lock:
+            if not self._unsaved:
+                return
+            self._unsaved = 0
+        with file_lock(self.path):
+            saved = self._read()
+            with self._lock:
+                self._merge(saved)
+                data = json.dumps({"topics": [display for display, _, _ in self._topics]})
+            write_atomic(self.path, data, fsync=False)
+
+    def stats(self) -> dict:
+        """Topic count, lookups by result, hit rate and mean lookup time"""
+        with self._lock:
+            total = sum(self.counts.values())
+            hits = self.counts["exact"] + self.counts["similar"]
+            return {
+                "topics": len(self._topics),
+                **self.counts,
+                "hit_rate": round(hits / total, 3) if total else 0.0,
+                "mean_lookup_us": round(self._seconds / total * 1e6, 1) if total else 0.0,
+            }
+
+topic_index = TopicIndex(Config.TOPIC_INDEX_PATH, threshold=Config.TOPIC_MATCH_THRESHOLD)
@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from services.analytics import (QuizHistory, at_risk_students, cohort_report, score_distribution,
+                                student_trends, topic_difficulty, weak_area_clusters)
+
+def rows(seed=0, students=30, topics=("algebra", "geometry", "biology", "history")):
+    rng = random.Random(seed)
+    result = []
+    for index in range(students):
+        for quiz in range(rng.randint(1, 8)):
+            score = round(rng.random(), 2)
+            result.append((f"s{index}", f"2026-01-{quiz + 1:02d}T10:00:00",
+                           rng.choice(topics), score, 5, round(score * 5)))
+    # interleave the students, as several sources would
+    rng.shuffle(result)
+    return result
+
+def test_topic_difficulty_matches_a_plain_computation():
+    data = rows()
+    history = QuizHistory.from_rows(data)
+    for row in topic_difficulty(history):
+        scores = np.array([r[3] for r in data if r[2] == row["topic"]], dtype=np.float32)
+        assert row["attempts"] == len(scores)
+        assert row["students"] == len({r[0] for r in data if r[2] == row["topic"]})
+        assert row["mean"] == pytest.approx(scores.mean(), abs=1e-4)
+        for pct in (10, 50, 90):
+            assert row[f"p{pct}"] == pytest.approx(np.percentile(scores, pct), abs=1e-4)
+    means = [row["mean"] for row in topic_difficulty(history)]
+    assert means == sorted(means)
+
+def test_student_trends_match_a_least_squares_fit():
+    data = rows()
+    history = QuizHistory.from_rows(data)
+    trends = student_trends(history, window=3)
+    for code, student_id in enumerate(history.students):
+        # rows keep their order within a student
+        scores = [r[3] for r in data if r[0] == student_id]
+        assert trends["attempts"][code] == len(scores)
+        assert trends["recent_mean"][code] == pytest.approx(np.mean(scores[-3:]), abs=1e-5)
+        expected = np.polyfit(range(len(scores)), scores, 1)[0] if len(scores) > 1 else 0.0
+        assert trends["slope"][code] == pytest.approx(expected, abs=1e-5)
+
+def test_falling_and_weak_students_are_at_risk():
+    data = [("falling", f"2026-01-0{i + 1}", "algebra", score, 5, 0)
+            for i, score in enumerate([1.0, 0.9, 0.75, 0.7])]
+    data += [("weak", f"2026-01-0{i + 1}", "algebra", 0.2, 5, 1) for i in range(3)]
+    data += [("steady", f"2026-01-0{i + 1}", "algebra", 0.9, 5, 4) for i in range(3)]
+    data += [("new", "2026-01-01", "algebra", 0.0, 5, 0)]
+    flagged = [s["student_id"] for s in at_risk_students(QuizHistory.from_rows(data))]
+    assert flagged == ["weak", "falling"]
+
+def test_weak_area_clusters_group_students_by_weak_topics():
+    data = [(f"math{i}", "2026-01-01", topic, 0.1, 5, 0)
+            for i in range(4) for topic in ("algebra", "geometry")]
+    data += [(f"bio{i}", "2026-01-01", "biology", 0.1, 5, 0) for i in range(2)]
+    data += [("strong", "2026-01-01", "algebra", 1.0, 5, 5)]
+    groups = weak_area_clusters(QuizHistory.from_rows(data), clusters=2)
+    assert [(g["size"], sorted(g["topics"])) for g in groups] == [
+        (4, ["algebra", "geometry"]), (2, ["biology"])]
+
+def test_columns_survive_save_and_load(tmp_path):
+    history = QuizHistory.from_rows(rows())
+    history.save(str(tmp_path / "history.npz"))
+    loaded = QuizHistory.load(str(tmp_path / "history.npz"))
+    assert loaded.students == history.students and loaded.topics == history.topics
+    for name in QuizHistory.COLUMNS:
+        assert (getattr(loaded, name) == getattr(history, name)).all()
+
+def test_report_of_an_empty_history():
+    report = cohort_report(QuizHistory.from_rows([]))
+    assert report["quizzes"] == 0 and report["topics"] == [] and report["at_risk"] == []
+    assert sum(score_distribution(QuizHistory.from_rows(rows()))["counts"]) == len(rows())
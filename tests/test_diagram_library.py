@@ -0,0 +1,27 @@
+from tools.diagram_library import DiagramLibrary
+
+CODE = "graph TD\n    A[Start] --> B[End]"
+
+def test_curated_entries_need_their_full_key(tmp_path):
+    library = DiagramLibrary(str(tmp_path / "diagrams.json"))
+    assert library.lookup("photosynthesis") is not None
+    assert library.lookup("The Water Cycle") is not None
+    assert library.lookup("photosynthesis vs chemosynthesis") is None
+    assert library.lookup("water cycle politics") is None
+
+def test_learned_entries_match_by_their_words(tmp_path):
+    library = DiagramLibrary(str(tmp_path / "diagrams.json"))
+    assert library.add("solar system", CODE)
+    assert library.add("system", CODE)
+    assert library.lookup("the solar system planets") is not None
+    assert library.lookup("immune system") is None
+
+def test_save_merges_diagrams_other_workers_saved(tmp_path):
+    path = str(tmp_path / "diagrams.json")
+    first, second = DiagramLibrary(path), DiagramLibrary(path)
+    first.add("glacier formation", CODE)
+    second.add("roman roads", CODE)
+    first.save()
+    second.save()
+    reloaded = DiagramLibrary(path)
+    assert reloaded.lookup("glacier formation") and reloaded.lookup("roman roads")
@@ -0,0 +1,41 @@
+import pytest
+from services.intent_router import IntentRouter
+
+@pytest.fixture
+def router():
+    return IntentRouter()
+
+@pytest.mark.parametrize("message, intent", [
+    ("Explain photosynthesis", "explain"),
+    ("How am I doing?", "progress"),
+    ("show my stats", "progress"),
+    ("Quiz me on algebra", "quiz"),
+    ("I want practice questions", "quiz"),
+    ("quiz me on my progress", "progress"),  # earlier rules win
+    ("statistics", "explain"),  # whole words only
+])
+def test_intents(router, message, intent):
+    assert router.classify(message).intent == intent
+
+@pytest.mark.parametrize("message, topic", [
+    ("Quiz me on the water cycle", "the water cycle"),
+    ("test me about fractions please", "fractions"),
+    ("give me a quick algebra quiz", "algebra"),
+    ("photosynthesis quiz!", "photosynthesis"),
+    ("quiz about plate tectonics?", "plate tectonics"),
+    ("quiz", None),
+])
+def test_quiz_topics(router, message, topic):
+    assert router.classify(message).topic == topic
+
+def test_answers_count_only_while_a_quiz_waits(router):
+    route = router.classify("1.A 2. b 3)C")
+    assert route.answers == {1: "A", 2: "B", 3: "C"}
+    assert route.target(quiz_active=True) == "answers"
+    assert route.target(quiz_active=False) == "explain"
+
+def test_added_rules_keep_their_priority(router):
+    router.add_rule("greeting", ["hello"], priority=0)
+    assert router.classify("hello, quiz me").intent == "greeting"
+    router.add_rule("farewell", ["bye"])
+    assert router.classify("quiz then bye").intent == "quiz"
@@ -0,0 +1,93 @@
+import json
+import threading
+
+from services import journal as journal_module
+from services.journal import Journal
+
+def journal_at(tmp_path):
+    return Journal(tmp_path / "state.json", threading.RLock(), name="test")
+
+def replay(journal, start_seq=0):
+    seen = []
+    journal.replay(start_seq, seen.append)
+    return [record["value"] for record in seen]
+
+def test_replay_skips_records_the_snapshot_covers(tmp_path):
+    journal = journal_at(tmp_path)
+    for value in "abc":
+        journal.append({"value": value})
+    journal.close()
+    assert replay(journal_at(tmp_path)) == ["a", "b", "c"]
+    assert replay(journal_at(tmp_path), start_seq=2) == ["c"]
+
+def test_torn_last_line_is_dropped_and_appends_continue(tmp_path):
+    journal = journal_at(tmp_path)
+    journal.append({"value": "a"})
+    journal.close()
+    with open(journal.path, 'a') as f:
+        f.write('{"value": "b", "se')  # crash mid-append
+
+    recovered = journal_at(tmp_path)
+    assert replay(recovered) == ["a"]
+    recovered.append({"value": "c"})
+    recovered.close()
+    assert replay(journal_at(tmp_path)) == ["a", "c"]
+
+def test_compaction_writes_the_snapshot_and_drops_the_journal(tmp_path):
+    journal = journal_at(tmp_path)
+    values = []
+    for value in "ab":
+        journal.append({"value": value})
+        values.append(value)
+    assert journal.compaction_due(2)
+    assert journal.compact(lambda: json.dumps({"seq": journal.seq, "values": values}))
+    assert journal.records == 0
+    assert not journal.path.exists() and not journal.interrupted()
+    assert json.loads(journal.snapshot_path.read_text()) == {"seq": 2, "values": ["a", "b"]}
+
+def test_interrupted_compaction_is_replayed(tmp_path):
+    journal = journal_at(tmp_path)
+    journal.append({"value": "a"})
+    journal.close()
+    journal._rotate()  # moved aside, then the process died before the snapshot
+    journal.append({"value": "b"})
+    journal.close()
+
+    recovered = journal_at(tmp_path)
+    assert recovered.interrupted()
+    assert replay(recovered) == ["a", "b"]
+
+def test_overlapping_compaction_waits_for_the_running_one(tmp_path, monkeypatch):
+    journal = journal_at(tmp_path)
+    values = []
+    def snapshot():
+        return json.dumps({"seq": journal.seq, "values": list(values)})
+    def add(value):
+        with journal.lock:
+            journal.append({"value": value})
+            values.append(value)
+
+    writing, release = threading.Event(), threading.Event()
+    write_atomic = journal_module.write_atomic
+    def slow_write(path, data, fsync=True):
+        writing.set()
+        release.wait(5)
+        write_atomic(path, data, fsync)
+    monkeypatch.setattr(journal_module, "write_atomic", slow_write)
+
+    add("a")
+    first = threading.Thread(target=journal.compact, args=(snapshot,))
+    first.start()
+    assert writing.wait(5)
+    add("b")
+    assert not journal.compact(snapshot)  # the first still writes its snapshot
+    release.set()
+    first.join(5)
+
+    assert journal.records == 1
+    saved = json.loads(journal.snapshot_path.read_text())
+    assert saved == {"seq": 1, "values": ["a"]}
+    assert replay(journal_at(tmp_path), start_seq=saved["seq"]) == ["b"]
+    assert journal.compact(snapshot)
+    assert json.loads(journal.snapshot_path.read_text()) == {"seq": 2, "values": ["a", "b"]}
+    assert not list(tmp_path.glob("*.tmp"))
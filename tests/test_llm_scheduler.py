@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+import pytest
+
+from services.llm_scheduler import (CircuitOpenError, LLMScheduler, PRIORITY_BACKGROUND,
+                                    PRIORITY_INTERACTIVE, TokenBucket)
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(60)  # one per second
+    now = bucket.updated
+    assert bucket.wait_time(1, now) == 0
+    bucket.take(60)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 0.5) == pytest.approx(0.5)
+    assert bucket.wait_time(1, now + 1.0) == 0
+
+def test_interactive_calls_go_ahead_of_queued_background_calls():
+    scheduler = LLMScheduler(requests_per_minute=600, max_concurrency=1)
+    admitted = []
+
+    async def call(name, priority):
+        await scheduler.acquire(priority)
+        admitted.append(name)
+        scheduler.release(priority)
+
+    async def main():
+        await scheduler.acquire(PRIORITY_INTERACTIVE)  # the only slot is taken
+        waiting = [asyncio.create_task(call("background", PRIORITY_BACKGROUND)),
+                   asyncio.create_task(call("interactive", PRIORITY_INTERACTIVE))]
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth() == {"interactive": 1, "background": 1}
+        scheduler.release(PRIORITY_INTERACTIVE)
+        await asyncio.gather(*waiting)
+
+    asyncio.run(main())
+    assert admitted == ["interactive", "background"]
+
+def test_circuit_opens_after_repeated_failures_and_half_opens_after_the_reset():
+    scheduler = LLMScheduler(requests_per_minute=600, max_retries=0,
+                             breaker_threshold=3, breaker_reset_seconds=0.05)
+    calls = []
+
+    async def failing():
+        calls.append("failing")
+        raise TimeoutError("model timed out")
+
+    async def working():
+        calls.append("working")
+        return "ok"
+
+    for _ in range(3):
+        with pytest.raises(TimeoutError):
+            asyncio.run(scheduler.run(failing))
+    assert scheduler.circuit_state == "open"
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(scheduler.run(working))
+    assert calls == ["failing"] * 3  # rejected without calling the model
+
+    time.sleep(0.06)
+    assert scheduler.circuit_state == "half-open"
+    assert asyncio.run(scheduler.run(working)) == "ok"
+    assert scheduler.circuit_state == "closed"
@@ -0,0 +1,139 @@
+import threading
+
+from services import journal
+from services.memory_storage import JsonStorage, ShardedJsonStorage, SQLiteStorage
+from services.student_profile import new_profile
+
+def quiz(topic, score):
+    return {"timestamp": "2026-01-01T00:00:00", "topic": topic, "score": score,
+            "total_questions": 5, "correct_answers": round(score * 5)}
+
+def test_failed_compaction_keeps_its_records(tmp_path, monkeypatch):
+    path = tmp_path / "memory_bank.json"
+    storage = JsonStorage(str(path), compact_every=1000)
+    storage.create_profile(new_profile("ada"))
+    storage.add_quiz_result("ada", quiz("algebra", 0.4))
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(journal, "write_atomic", fail)
+        storage.compact()
+    assert storage.journal.records == 2
+
+    # the next compaction must not replace the records the failed one set aside
+    storage.add_quiz_result("ada", quiz("geometry", 1.0))
+    with monkeypatch.context() as patch:
+        patch.setattr(journal, "write_atomic", fail)
+        storage.compact()
+    storage.close()
+
+    reloaded = JsonStorage(str(path))
+    history = reloaded.get_profile("ada")["quiz_history"]
+    assert [entry["topic"] for entry in history] == ["algebra", "geometry"]
+
+def test_journal_is_replayed_over_the_snapshot(tmp_path):
+    path = tmp_path / "memory_bank.json"
+    storage = JsonStorage(str(path), compact_every=1000)
+    storage.create_profile(new_profile("ada"))
+    storage.add_quiz_result("ada", quiz("algebra", 0.4))
+    storage.compact()
+    storage.add_quiz_result("ada", quiz("geometry", 1.0))
+    storage.close()
+    assert storage.journal.path.exists()
+
+    reloaded = JsonStorage(str(path))
+    history = reloaded.get_profile("ada")["quiz_history"]
+    assert [entry["topic"] for entry in history] == ["algebra", "geometry"]
+
+def test_torn_journal_record_is_ignored(tmp_path):
+    path = tmp_path / "memory_bank.json"
+    storage = JsonStorage(str(path), compact_every=1000)
+    storage.create_profile(new_profile("ada"))
+    storage.add_quiz_result("ada", quiz("algebra", 0.4))
+    storage.close()
+    with open(storage.journal.path, 'a') as f:
+        f.write('{"op": "quiz", "student_id": "ada"')
+
+    reloaded = JsonStorage(str(path))
+    assert [e["topic"] for e in reloaded.get_profile("ada")["quiz_history"]] == ["algebra"]
+
+def fill(storage):
+    for student_id in ("ada", "bob"):
+        storage.create_profile(new_profile(student_id))
+    storage.add_quiz_result("ada", quiz("algebra", 0.4))
+    storage.add_quiz_result("ada", quiz("geometry", 1.0))
+    storage.add_quiz_result("bob", quiz("algebra", 0.2))
+    storage.add_quiz_result("ada", quiz("algebra", 0.6))
+
+def test_sqlite_backend_matches_the_json_backend(tmp_path):
+    json_storage = JsonStorage(str(tmp_path / "memory_bank.json"))
+    sqlite_storage = SQLiteStorage(str(tmp_path / "memory_bank.db"))
+    fill(json_storage)
+    fill(sqlite_storage)
+
+    for student_id in ("ada", "bob"):
+        expected, actual = json_storage.get_profile(student_id), sqlite_storage.get_profile(student_id)
+        for profile in (expected, actual):
+            del profile["created_at"]
+            profile.pop("version", None)
+        assert actual == expected
+    assert (sqlite_storage.get_recent_quizzes("ada", 2) ==
+            json_storage.get_recent_quizzes("ada", 2))
+    assert (sorted(sqlite_storage.find_students_weak_in("algebra")) ==
+            sorted(json_storage.find_students_weak_in("algebra")))
+    assert sqlite_storage.get_popular_topics(1) == json_storage.get_popular_topics(1)
+    assert sqlite_storage.quiz_rows() == json_storage.quiz_rows()
+
+def test_sqlite_results_from_two_workers_are_all_counted(tmp_path):
+    path = str(tmp_path / "memory_bank.db")
+    workers = [SQLiteStorage(path), SQLiteStorage(path)]
+    workers[0].create_profile(new_profile("ada"))
+
+    def take_quizzes(storage):
+        for _ in range(25):
+            storage.add_quiz_result("ada", quiz("algebra", 0.5))
+
+    threads = [threading.Thread(target=take_quizzes, args=(storage,)) for storage in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    profile = workers[1].get_profile("ada")
+    assert profile["stats"]["total_quizzes"] == len(profile["quiz_history"]) == 50
+    assert profile["topic_stats"]["algebra"]["attempts"] == 50
+    assert workers[0].profile_version("ada") == 50
+
+def test_sharded_lru_writes_back_evicted_profiles_and_reloads_them(tmp_path):
+    storage = ShardedJsonStorage(str(tmp_path / "students"), cache_size=1, flush_interval=0)
+    storage.create_profile(new_profile("ada"))
+    storage.add_quiz_result("ada", quiz("algebra", 0.4))
+    assert not storage._profile_path("ada").exists()
+
+    storage.create_profile(new_profile("bob"))  # evicts ada, which is dirty
+    assert list(storage._cache) == ["bob"]
+    assert storage._profile_path("ada").exists()
+    storage.add_quiz_result("ada", quiz("geometry", 1.0))  # reloads ada, evicts bob
+    assert list(storage._cache) == ["ada"]
+    storage.close()
+
+    reopened = ShardedJsonStorage(str(tmp_path / "students"), flush_interval=0)
+    history = reopened.get_profile("ada")["quiz_history"]
+    assert [entry["topic"] for entry in history] == ["algebra", "geometry"]
+    assert reopened.get_profile("bob")["id"] == "bob"
+
+def test_sqlite_data_survives_a_reopen(tmp_path):
+    path = str(tmp_path / "memory_bank.db")
+    storage = SQLiteStorage(path)
+    fill(storage)
+    profile = storage.get_profile("ada")
+    storage.close()
+    assert SQLiteStorage(path).get_profile("ada") == profile
+
+def test_profile_without_history_skips_the_quiz_rows(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "memory_bank.db"))
+    fill(storage)
+    profile = storage.get_profile("ada", include_history=False)
+    assert not profile.get("quiz_history")
+    assert profile["stats"]["total_quizzes"] == 3
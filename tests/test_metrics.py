@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from services.metrics import MetricsRegistry, timed
+
+def test_render_uses_the_prometheus_text_format():
+    registry = MetricsRegistry(prefix="test_")
+    requests = registry.counter("requests_total", "Requests by route", ("route",))
+    requests.inc(route="quiz")
+    requests.inc(2, route='say "hi"')
+    registry.gauge("queue_depth", "Waiting calls", callback=lambda: 3)
+    latency = registry.histogram("latency_seconds", "Call time", buckets=(0.1, 1))
+    latency.observe(0.05)
+    latency.observe(0.5)
+
+    assert registry.render().splitlines() == [
+        "# HELP test_requests_total Requests by route",
+        "# TYPE test_requests_total counter",
+        'test_requests_total{route="quiz"} 1',
+        'test_requests_total{route="say \\"hi\\""} 2',
+        "# HELP test_queue_depth Waiting calls",
+        "# TYPE test_queue_depth gauge",
+        "test_queue_depth 3",
+        "# HELP test_latency_seconds Call time",
+        "# TYPE test_latency_seconds histogram",
+        'test_latency_seconds_bucket{le="0.1"} 1',
+        'test_latency_seconds_bucket{le="1"} 2',
+        'test_latency_seconds_bucket{le="+Inf"} 2',
+        "test_latency_seconds_sum 0.55",
+        "test_latency_seconds_count 2",
+    ]
+
+def test_empty_and_failing_metrics_can_be_skipped():
+    registry = MetricsRegistry(prefix="test_")
+    registry.counter("unused_total", "Never incremented")
+    registry.gauge("broken", "Callback raises", callback=lambda: 1 / 0)
+    assert registry.render(skip_empty=True) == "\n"
+
+def test_labels_must_match_the_declared_names():
+    registry = MetricsRegistry(prefix="test_")
+    counter = registry.counter("requests_total", "Requests by route", ("route",))
+    with pytest.raises(ValueError):
+        counter.inc(kind="quiz")
+    with pytest.raises(ValueError):
+        registry.gauge("requests_total", "Same name, other kind")
+
+def test_timed_observes_coroutines_and_async_generators():
+    registry = MetricsRegistry(prefix="test_")
+    latency = registry.histogram("agent_seconds", "Agent time", ("method",))
+
+    @timed(latency, method="explain")
+    async def explain():
+        return "answer"
+
+    @timed(latency, method="stream")
+    async def stream():
+        yield "a"
+        yield "b"
+
+    async def main():
+        return await explain(), [chunk async for chunk in stream()]
+
+    assert asyncio.run(main()) == ("answer", ["a", "b"])
+    assert latency.count(method="explain") == 1 and latency.count(method="stream") == 1
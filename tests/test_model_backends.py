@@ -0,0 +1,20 @@
+import asyncio
+import time
+
+import pytest
+
+from services.model_backends import FakeBackend, FakeModelError
+
+def test_fake_usage_has_every_token_count():
+    model = FakeBackend(latency="constant", latency_median=0).create("fake")
+    response = asyncio.run(model.generate_content_async("Explain photosynthesis"))
+    usage = response.usage_metadata
+    assert usage.prompt_token_count > 0 and usage.candidates_token_count > 0
+    assert usage.total_token_count == usage.prompt_token_count + usage.candidates_token_count
+
+def test_fake_failures_take_the_call_latency():
+    model = FakeBackend(latency="constant", latency_median=0.05, error_rate=1.0).create("fake")
+    started = time.monotonic()
+    with pytest.raises(FakeModelError):
+        asyncio.run(model.generate_content_async("Explain photosynthesis"))
+    assert time.monotonic() - started >= 0.05
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+from services.quiz import Quiz, QuizStreamParser
+
+QUESTIONS = [
+    {"question": "2 + 2?", "options": ["3", "4", "5", "6"], "answer": "B"},
+    {"question": "3 x 3?", "options": ["9", "6", "12", "3"], "answer": "a"},
+]
+REPLY = json.dumps({"questions": QUESTIONS})
+
+LEGACY = """Here is your quiz:
+Q1: 2 + 2?
+A) 3
+B) 4
+C) 5
+D) 6
+Correct: B
+
+Q2. 3 x 3?
+A) 9
+B) 6
+C) 12
+D) 3
+Correct: a
+"""
+
+@pytest.mark.parametrize("text", [REPLY, f"```json\n{REPLY}\n```", json.dumps(QUESTIONS), LEGACY])
+def test_replies_parse_to_the_same_quiz(text):
+    quiz = Quiz.parse("arithmetic", text)
+    assert [q.text for q in quiz.questions] == ["2 + 2?", "3 x 3?"]
+    assert quiz.answer_key == ("B", "A")
+    assert quiz.id == Quiz.parse("arithmetic", REPLY).id
+
+def test_broken_json_falls_back_to_no_questions():
+    assert len(Quiz.parse("arithmetic", '{"questions": [{"question": "2 + 2?"')) == 0
+
+def test_quiz_round_trips_and_grades():
+    quiz = Quiz.from_dict(Quiz.parse("arithmetic", REPLY).to_dict())
+    assert quiz.answer_key == ("B", "A")
+    assert quiz.grade({1: "B"}) == [("B", "B"), ("?", "A")]
+    assert "**Q2.** 3 x 3?" in quiz.render() and "Correct" not in quiz.render()
+
+def test_stream_parser_yields_each_question_once_it_is_complete():
+    parser = QuizStreamParser()
+    cut = REPLY.index("}") + 1  # just after the first question
+    completed = [parser.feed(REPLY[:10]), parser.feed(REPLY[10:cut - 1]),
+                 parser.feed(REPLY[cut - 1:cut]), parser.feed(REPLY[cut:])]
+    assert [[q.text for q in found] for found in completed] == [[], [], ["2 + 2?"], ["3 x 3?"]]
+    assert len(parser.questions) == 2
+
+def test_stream_parser_one_character_at_a_time():
+    parser = QuizStreamParser()
+    for char in f"```json\n{REPLY}\n```":
+        parser.feed(char)
+    assert [q.answer for q in parser.questions] == ["B", "A"]
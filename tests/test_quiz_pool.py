@@ -0,0 +1,63 @@
+from config import Config
+from services.quiz import Question, Quiz
+from services.quiz_pool import QuizPool, SQLitePoolStore
+
+def make_quiz(topic, n):
+    return Quiz(topic, [Question(f"{topic} question {n}", ["yes", "no"], "A")])
+
+def worker(tmp_path):
+    return QuizPool(str(tmp_path / "quiz_pool.json"), depth=3,
+                    store=SQLitePoolStore(str(tmp_path / "state.db")))
+
+def test_workers_share_one_pool(tmp_path):
+    first, second = worker(tmp_path), worker(tmp_path)
+    quizzes = [make_quiz("algebra", n) for n in range(3)]
+    for quiz in quizzes:
+        assert first.add("Algebra", quiz)
+    assert not second.add("algebra", make_quiz("algebra", 9))  # full
+    assert second.size("algebra") == 3
+
+    served = [first.take("algebra", "ada").id, second.take("algebra", "bob").id]
+    assert served == [quizzes[0].id, quizzes[1].id]
+    assert first.size("algebra") == 1
+
+def test_seen_quizzes_are_shared(tmp_path):
+    first, second = worker(tmp_path), worker(tmp_path)
+    quiz = make_quiz("algebra", 0)
+    first.mark_seen("ada", quiz)
+    assert second.has_seen("ada", quiz)
+    second.add("algebra", quiz)
+    assert second.take("algebra", "ada") is None
+    assert first.take("algebra", "bob").id == quiz.id
+
+def test_seen_list_is_trimmed(tmp_path):
+    store = SQLitePoolStore(str(tmp_path / "state.db"))
+    for n in range(5):
+        store.mark_seen("ada", f"quiz{n}", keep=2)
+    assert [store.has_seen("ada", f"quiz{n}") for n in range(5)] == [False] * 3 + [True] * 2
+
+def test_only_one_worker_holds_the_refill_lease(tmp_path):
+    store = SQLitePoolStore(str(tmp_path / "state.db"))
+    other = SQLitePoolStore(str(tmp_path / "state.db"))
+    assert store.claim("refill", "host:1", 60)
+    assert not other.claim("refill", "host:2", 60)
+    assert store.claim("refill", "host:1", 60)  # renewed by its holder
+    assert other.claim("refill", "host:2", -1) is False
+    store.claim("refill", "host:1", -1)  # expired
+    assert other.claim("refill", "host:2", 60)
+
+def test_requested_topics_reach_the_refilling_worker(tmp_path):
+    first, second = worker(tmp_path), worker(tmp_path)
+    assert first.take("geometry", "ada") is None
+    assert second.store.pop_requested() == ["geometry"]
+    assert second.store.pop_requested() == []
+
+def test_refill_stays_within_its_share_of_the_quota(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "LLM_REQUESTS_PER_MINUTE", 12)
+    pool = QuizPool(str(tmp_path / "quiz_pool.json"), depth=3, refill_interval=60, rpm_share=0.25)
+    made = []
+    pool._generator = lambda topic: made.append(topic) or make_quiz(topic, len(made))
+    monkeypatch.setattr(pool, "_targets", lambda: ["algebra", "geometry"])
+    pool.refill()
+    assert len(made) == 3  # 0.25 x 12 per minute over a 60 second interval
+    assert pool.size("algebra") == 3 and pool.size("geometry") == 0
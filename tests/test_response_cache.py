@@ -0,0 +1,37 @@
+from services.response_cache import ResponseCache
+
+def cache_at(tmp_path, **kwargs):
+    return ResponseCache(tmp_path / "responses.db", **kwargs)
+
+def test_memory_misses_fall_back_to_the_disk_tier(tmp_path):
+    cache = cache_at(tmp_path, memory_items=1)
+    cache.set("a", "first")
+    cache.set("b", "second")  # pushes "a" out of memory
+    assert cache.get("b") == "second"
+    assert cache.get("a") == "first"
+    assert cache.get("missing") is None
+    assert cache.stats()["memory_hits"] == 1 and cache.stats()["disk_hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+    reopened = cache_at(tmp_path)
+    assert reopened.get("b") == "second"
+    assert reopened.stats()["disk_hits"] == 1
+
+def test_expired_entries_are_dropped_from_both_tiers(tmp_path):
+    cache = cache_at(tmp_path, ttl_seconds=-1)
+    cache.set("a", "stale")
+    assert cache.get("a") is None
+    assert cache.stats()["memory_entries"] == 0 and cache.stats()["disk_bytes"] == 0
+
+def test_disk_tier_evicts_the_least_recently_used_entries(tmp_path):
+    cache = cache_at(tmp_path, memory_items=1, max_disk_bytes=25)
+    for key in "abc":
+        cache.set(key, "x" * 10)
+    assert cache.stats()["disk_bytes"] <= 25
+    assert cache_at(tmp_path).get("a") is None
+    assert cache_at(tmp_path).get("c") == "x" * 10
+
+def test_keys_ignore_whitespace_and_case():
+    key = ResponseCache.make_key("gemini", 0.7, "Explain  photosynthesis\n")
+    assert key == ResponseCache.make_key("gemini", 0.7, "explain photosynthesis")
+    assert key != ResponseCache.make_key("gemini", 0.2, "explain photosynthesis")
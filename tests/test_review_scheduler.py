@@ -0,0 +1,80 @@
+import heapq
+import random
+
+import pytest
+from services.review_scheduler import (DAY, MIN_EASINESS, ReviewItem, ReviewScheduler,
+                                       SQLiteReviewStore, _walk, quality)
+
+def worker(tmp_path, history=None):
+    scheduler = ReviewScheduler(str(tmp_path / "review_schedule.json"),
+                                store=SQLiteReviewStore(str(tmp_path / "state.db")))
+    if history is not None:
+        scheduler.set_history(history)
+    return scheduler
+
+def test_workers_share_one_schedule(tmp_path):
+    first, second = worker(tmp_path), worker(tmp_path)
+    first.record("ada", "algebra", 1.0, reviewed_at=0)
+    second.record("ada", "algebra", 1.0, reviewed_at=DAY)  # second pass: 6 days
+    second.record("bob", "geometry", 0.2, reviewed_at=0)
+    assert first.next_reviews("ada") == [("algebra", 7 * DAY)]
+    assert first.due_within(2 * DAY, now=0) == [("bob", "geometry", DAY)]
+    assert first.due_topics(10 * DAY) == ["geometry", "algebra"]
+    assert second.size() == 2
+
+def test_history_is_scheduled_once(tmp_path):
+    history = lambda: [("ada", "1970-01-01T00:00:00+00:00", "algebra", 1.0)]
+    first = worker(tmp_path, history)
+    assert first.next_reviews("ada") == [("algebra", DAY)]
+    second = worker(tmp_path, history)
+    assert second.next_reviews("ada") == [("algebra", DAY)]
+    assert not (tmp_path / "review_schedule.json").exists()
+
+def test_sm2_intervals():
+    item = ReviewItem("ada", "algebra")
+    intervals = []
+    for score in (1.0, 1.0, 1.0, 1.0):
+        item.review(score, reviewed_at=0)
+        intervals.append(item.interval)
+    # then the interval grows by the easiness, which perfect scores raise by 0.1
+    assert intervals == pytest.approx([1.0, 6.0, 6.0 * 2.7, 6.0 * 2.7 * 2.8])
+    assert item.easiness == pytest.approx(2.9)
+
+    item.review(0.2, reviewed_at=100)  # a failed quiz starts over the next day
+    assert (item.repetitions, item.interval, item.due) == (0, 1.0, 100 + DAY)
+    for _ in range(20):
+        item.review(0.0, reviewed_at=0)
+    assert item.easiness == MIN_EASINESS
+
+def test_quality_of_scores():
+    assert [quality(score) for score in (0.0, 0.5, 0.59, 0.6, 1.0, 1.2)] == [0, 2, 3, 3, 5, 5]
+
+def test_walk_yields_live_items_soonest_first_without_popping():
+    random.seed(3)
+    items = [ReviewItem("ada", f"topic{i}", due=random.random()) for i in range(200)]
+    heap = []
+    for seq, item in enumerate(items):
+        item.seq = seq
+        heapq.heappush(heap, (item.due, item.seq, item))
+    stale = items[:50]
+    for seq, item in enumerate(stale, start=len(items)):
+        item.seq = seq  # rescheduled: their old heap entries are stale now
+    size = len(heap)
+
+    walked = list(_walk(heap, until=0.5))
+    expected = sorted((item for item in items[50:] if item.due <= 0.5), key=lambda i: i.due)
+    assert walked == expected
+    assert len(heap) == size
+    assert list(_walk([], until=1.0)) == []
+
+def test_json_schedule_survives_a_restart(tmp_path):
+    path = str(tmp_path / "review_schedule.json")
+    scheduler = ReviewScheduler(path)
+    scheduler.record("ada", "algebra", 1.0, reviewed_at=0)
+    scheduler.record("ada", "geometry", 0.2, reviewed_at=0)
+    scheduler.record("ada", "algebra", 1.0, reviewed_at=DAY)
+    scheduler.close()
+    reloaded = ReviewScheduler(path)
+    assert reloaded.next_reviews("ada") == [("geometry", DAY), ("algebra", 7 * DAY)]
+    reloaded.compact()
+    assert ReviewScheduler(path).next_reviews("ada") == reloaded.next_reviews("ada")
@@ -0,0 +1,59 @@
+import json
+import time
+
+from services.session_service import JsonlColdStore, Session, SessionService, SQLiteSessionStore
+
+def worker(path):
+    return SessionService(sweep_interval_seconds=0, store=SQLiteSessionStore(str(path)))
+
+def test_updates_from_two_workers_are_both_kept(tmp_path):
+    path = tmp_path / "sessions.db"
+    first, second = worker(path), worker(path)
+    first.get_or_create_session("ada")
+    second.get_or_create_session("ada")
+
+    first.update("ada", lambda s: s.add_message("student", "from the first worker"))
+    # the second worker's copy is now stale: its save is refused and the change reapplied
+    second.update("ada", lambda s: s.add_message("student", "from the second worker"))
+
+    contents = [m.content for m in first.get_or_create_session("ada").conversation_history]
+    assert contents == ["from the first worker", "from the second worker"]
+
+def test_stale_save_is_refused(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    service = SessionService(sweep_interval_seconds=0, store=store)
+    session = service.get_or_create_session("ada")
+    stale = session.version
+    assert store.save(session, stale) == stale + 1
+    assert store.save(session, stale) is None
+
+def test_update_without_store_changes_the_live_session():
+    service = SessionService(sweep_interval_seconds=0)
+    assert service.update("ada", lambda s: s.add_message("student", "hi") or "done") == "done"
+    assert len(service.get_or_create_session("ada").conversation_history) == 1
+
+def test_sweeper_drops_expired_sessions_and_keeps_active_ones():
+    service = SessionService(timeout_minutes=0.001, sweep_interval_seconds=0.02)  # 60 ms
+    expired = service.get_or_create_session("ada")
+    active = service.get_or_create_session("bob")
+    deadline = time.monotonic() + 0.3
+    while time.monotonic() < deadline:
+        active.add_message("student", "still here")
+        time.sleep(0.01)
+
+    assert service.active_count() == 1
+    assert expired.session_id not in service.sessions
+    assert service.sessions[active.session_id] is active
+
+def test_history_keeps_the_last_messages_and_moves_older_ones_to_the_cold_store(tmp_path):
+    session = Session("session_ada", "ada", max_history=3, cold_store=JsonlColdStore(str(tmp_path)))
+    for turn in range(5):
+        session.add_message("student", f"message {turn}")
+
+    assert [m.content for m in session.conversation_history] == ["message 2", "message 3", "message 4"]
+    assert session.message_count == 5
+    cold = (tmp_path / "session_ada.jsonl").read_text().splitlines()
+    assert [json.loads(line)["content"] for line in cold] == ["message 0", "message 1"]
+
+    restored = Session.from_dict(session.to_dict(), max_history=2)
+    assert [m.content for m in restored.conversation_history] == ["message 3", "message 4"]
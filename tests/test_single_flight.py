@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from services.single_flight import SingleFlight
+
+def test_concurrent_identical_calls_make_one_backend_call():
+    flights = SingleFlight()
+    calls = []
+
+    async def backend():
+        calls.append("explain photosynthesis")
+        await asyncio.sleep(0.01)
+        return "Plants turn light into sugar"
+
+    async def main():
+        return await asyncio.gather(*(flights.do("photosynthesis", backend) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["Plants turn light into sugar"] * 5
+    assert len(calls) == 1
+    assert flights.coalesced == 4 and flights.in_flight() == 0
+
+def test_an_error_reaches_every_waiter_and_the_next_call_runs_again():
+    flights = SingleFlight()
+    calls = []
+
+    async def backend():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        if len(calls) == 1:
+            raise ConnectionError("model unavailable")
+        return "ok"
+
+    async def main():
+        return await asyncio.gather(*(flights.do("key", backend) for _ in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert asyncio.run(flights.do("key", backend)) == "ok"
+    assert len(calls) == 2
+
+def test_waiters_take_over_when_the_leader_is_cancelled():
+    flights = SingleFlight()
+    calls = []
+
+    async def backend():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    async def main():
+        leader = asyncio.create_task(flights.do("key", backend))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.do("key", backend))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == "ok"
+    assert len(calls) == 2
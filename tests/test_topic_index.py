@@ -0,0 +1,79 @@
+import pytest
+from services.topic_index import TopicIndex, display_topic, same_words, topic_key
+
+@pytest.fixture
+def index(tmp_path):
+    index = TopicIndex(str(tmp_path / "topic_index.json"))
+    for topic in ["evolution", "nuclear fission", "aerobic respiration", "DNA replication",
+                  "hydrogen", "prime numbers", "energy", "power", "photosynthesis",
+                  "cellular respiration", "algebra 1"]:
+        index.resolve(topic)
+    return index
+
+@pytest.mark.parametrize("message", [
+    "revolution", "nuclear fusion", "anaerobic respiration", "RNA replication",
+    "hydrogen bonds", "prime number theorem", "work and energy", "algebra 2",
+])
+def test_different_topics_are_not_merged(index, message):
+    assert index.match(message) is None
+    assert index.resolve(message) == display_topic(message)
+
+@pytest.mark.parametrize("message, topic", [
+    ("What is photosynthesis?", "photosynthesis"),
+    ("Explain photosynthesi", "photosynthesis"),
+    ("explain celular respiration", "cellular respiration"),
+    ("can you explain DNA replication", "DNA replication"),
+])
+def test_paraphrases_resolve_to_the_known_topic(index, message, topic):
+    assert index.resolve(message) == topic
+
+def test_keys_keep_content_words_in_order():
+    assert topic_key("work and energy") == "work energy"
+    assert topic_key("explain how power works") == "power"
+    assert topic_key("energy and work") == "energy work"
+    assert display_topic("Please explain the Water Cycle step by step") == "Water Cycle step by step"
+
+def test_same_words():
+    assert same_words("water cycle", "water cylce")
+    assert same_words("cycle water", "water cycle")
+    assert not same_words("evolution", "revolution")
+    assert not same_words("rna replication", "dna replication")
+    assert not same_words("hydrogen bond", "hydrogen")
+
+def test_saved_topics_are_reloaded(tmp_path):
+    path = str(tmp_path / "topics.json")
+    index = TopicIndex(path, save_every=1)
+    index.resolve("the water cycle")
+    assert TopicIndex(path).match("water cycle") == ("water cycle", 1.0)
+
+def test_save_merges_topics_other_workers_saved(tmp_path):
+    path = str(tmp_path / "topics.json")
+    first, second = TopicIndex(path), TopicIndex(path)
+    first.resolve("explain photosynthesis")
+    second.resolve("explain the french revolution")
+    first.save()
+    second.save()
+    reloaded = TopicIndex(path)
+    assert reloaded.match("photosynthesis") is not None
+    assert reloaded.stats()["topics"] == 2
+
+@pytest.mark.parametrize("message", [
+    "Explain the water cycle", "What is the water cycle?", "explain the water cycle please",
+    "Tell me about the water cycle", "How does the water cycle work?",
+    "how the water cycle works", "the water cycle explained",
+])
+def test_request_words_around_the_topic_are_dropped(message):
+    assert topic_key(message) == "water cycle"
+    assert display_topic(message) == "water cycle"
+
+def test_trailing_words_inside_a_topic_are_kept():
+    assert topic_key("explain energy and work please") == "energy work"
+    assert topic_key("what does entropy mean?") == "entropy"
+
+def test_loadgen_phrasings_resolve_to_one_topic_each(tmp_path):
+    from benchmarks.loadgen import EXPLAIN_TEMPLATES, TOPICS
+    index = TopicIndex(str(tmp_path / "topics.json"))
+    for template in EXPLAIN_TEMPLATES:
+        for topic in TOPICS:
+            index.resolve(template.format(topic))
+    assert index.stats()["topics"] == len(TOPICS)
@@ -1,5 +1,6 @@
 """EternaLearn Tools"""
 from .search_tool import search_tool
 from .visual_tool import visual_tool
+from .diagram_library import diagram_library, DiagramLibrary
 
-__all__ = ['search_tool', 'visual_tool']
\ No newline at end of file
+__all__ = ['search_tool', 'visual_tool', 'diagram_library', 'DiagramLibrary']
\ No newline at end of file
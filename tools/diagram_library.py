@@ -0,0 +1,272 @@
+"""Diagram Library - Mermaid diagrams looked up by topic before asking the model"""
+import atexit
+import json
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from config import Config
+from services.journal import file_lock, write_atomic
+from services.metrics import metrics
+from services.topic_index import topic_tokens, topic_key
+
+logger = logging.getLogger(__name__)
+
+lookups = metrics.counter("diagram_library_lookups_total",
+                          "Diagram lookups answered from the library (hit) or not (miss)",
+                          ("result",))
+
+# curated diagrams; every key is an alias for the same template
+SEED_TEMPLATES = [
+    (["water cycle", "hydrologic cycle"], """graph TD
+A[Evaporation] --> B[Condensation]
+B --> C[Precipitation]
+C --> D[Collection]
+D --> A"""),
+    (["photosynthesis"], """graph LR
+A[Sunlight] --> B[Chlorophyll]
+C[Water] --> B
+D[CO2] --> B
+B --> E[Glucose]
+B --> F[Oxygen]"""),
+    (["cellular respiration", "aerobic respiration"], """graph LR
+A[Glucose] --> B[Glycolysis]
+B --> C[Krebs Cycle]
+C --> D[Electron Transport Chain]
+E[Oxygen] --> D
+D --> F[ATP]
+D --> G[Water and CO2]"""),
+    (["carbon cycle"], """graph TD
+A[Atmospheric CO2] --> B[Photosynthesis]
+B --> C[Plants and Animals]
+C --> D[Respiration and Decay]
+D --> A
+C --> E[Fossil Fuels]
+E --> A"""),
+    (["nitrogen cycle"], """graph TD
+A[Atmospheric Nitrogen] --> B[Nitrogen Fixation]
+B --> C[Nitrification]
+C --> D[Plant Uptake]
+D --> E[Decomposition]
+E --> F[Denitrification]
+F --> A"""),
+    (["rock cycle"], """graph TD
+A[Igneous Rock] --> B[Weathering and Erosion]
+B --> C[Sedimentary Rock]
+C --> D[Heat and Pressure]
+D --> E[Metamorphic Rock]
+E --> F[Melting]
+F --> A"""),
+    (["plate tectonics"], """graph TD
+A[Mantle Convection] --> B[Plate Movement]
+B --> C[Divergent Boundary]
+B --> D[Convergent Boundary]
+B --> E[Transform Boundary]
+D --> F[Mountains and Volcanoes]"""),
+    (["electric circuit", "electrical circuit"], """graph LR
+A[Battery] --> B[Switch]
+B --> C[Wire]
+C --> D[Bulb]
+D --> E[Return Wire]
+E --> A"""),
+    (["food chain", "food web", "ecosystem"], """graph LR
+A[Sun] --> B[Producers]
+B --> C[Primary Consumers]
+C --> D[Secondary Consumers]
+D --> E[Decomposers]
+E --> B"""),
+    (["chemical reaction"], """graph LR
+A[Reactants] --> B[Activation Energy]
+B --> C[Bonds Break and Form]
+C --> D[Products]
+C --> E[Energy Released or Absorbed]"""),
+    (["mitosis", "cell division"], """graph LR
+A[Interphase] --> B[Prophase]
+B --> C[Metaphase]
+C --> D[Anaphase]
+D --> E[Telophase]
+E --> F[Cytokinesis]"""),
+    (["digestive system", "digestion"], """graph TD
+A[Mouth] --> B[Esophagus]
+B --> C[Stomach]
+C --> D[Small Intestine]
+D --> E[Large Intestine]
+D --> F[Nutrients to Blood]"""),
+    (["blood circulation", "circulatory system"], """graph LR
+A[Right Heart] --> B[Lungs]
+B --> C[Left Heart]
+C --> D[Body]
+D --> A"""),
+    (["scientific method"], """graph TD
+A[Question] --> B[Hypothesis]
+B --> C[Experiment]
+C --> D[Analysis]
+D --> E[Conclusion]
+E --> A"""),
+    (["butterfly life cycle", "metamorphosis"], """graph LR
+A[Egg] --> B[Larva]
+B --> C[Pupa]
+C --> D[Adult]
+D --> A"""),
+]
+
+def clean_mermaid(text: str):
+    """Tidy a model reply into a Mermaid graph, None when it is not a usable one"""
+    code = text.strip().replace("```mermaid", "").replace("```", "").strip()
+    code = code.replace("flowchart TD", "graph TD").replace("flowchart LR", "graph LR")
+    lines = [line.strip() for line in code.split('\n')]
+    code = '\n'.join(line for line in lines
+                     if line.startswith('graph ') or '-->' in line or line == '').strip()
+    if not code.startswith('graph '):
+        logger.warning(f"Invalid Mermaid start: {code[:50]}")
+        return None
+    if '-->' not in code:
+        logger.warning("No arrows found in Mermaid code")
+        return None
+    return code
+
+def render_diagram(code: str) -> str:
+    return f"\n\n**Visual Diagram:**\n```mermaid\n{code}\n```"
+
+class DiagramLibrary:
+    """Topic-keyed Mermaid templates with an exact and a token index
+
+    Lookups try the normalized topic first, then the token index: the
+    learned entry whose words all appear in the topic wins, the more
+    specific (longer) entry on ties. Curated templates are built in and
+    only answer their exact keys, so "photosynthesis" does not answer
+    "photosynthesis vs chemosynthesis". Diagrams the model generates are
+    validated, added and saved to path so repeat topics need no model
+    call. A learned one-word entry ("system") only answers that exact
+    topic, so it cannot capture "solar system".
+    """
+
+    def __init__(self, path: str = "./data/diagram_library.json", max_learned: int = 5000,
+                 save_every: int = 20):
+        self.path = Path(path)
+        self.max_learned = max_learned
+        self.save_every = save_every
+        self._entries = {}
+        self._learned = OrderedDict()
+        self._index = {}
+        self._curated = set()
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._unsaved = 0
+        self._exit_hook = False
+        for keys, code in SEED_TEMPLATES:
+            for key in keys:
+                self._put(topic_key(key), code)
+                self._curated.add(topic_key(key))
+
+    def _put(self, key: str, code: str):
+        if not key:
+            return
+        self._entries[key] = code
+        for token in key.split():
+            self._index.setdefault(token, set()).add(key)
+
+    def _remove(self, key: str):
+        self._entries.pop(key, None)
+        for token in key.split():
+            keys = self._index.get(token)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[token]
+
+    def _load(self):
+        """Read learned diagrams on first use"""
+        if self._loaded:
+            return
+        self._loaded = True
+        self._merge(self._read())
+
+    def _read(self) -> dict:
+        """Learned diagrams saved on disk, by any worker"""
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f).get("diagrams", {})
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load diagram library: {e}")
+            return {}
+
+    def _merge(self, learned: dict):
+        """Add saved diagrams this process does not know yet"""
+        for key, code in learned.items():
+            if key not in self._entries:
+                self._learned[key] = code
+                self._put(key, code)
+        while len(self._learned) > self.max_learned:
+            oldest, _ = self._learned.popitem(last=False)
+            self._remove(oldest)
+
+    def lookup(self, topic: str):
+        """Mermaid code for the topic, or None"""
+        tokens = topic_tokens(topic)
+        key = " ".join(tokens)
+        with self._lock:
+            self._load()
+            code = self._entries.get(key)
+            if code is None:
+                best = None
+                present = set(tokens)
+                candidates = set().union(*(self._index.get(t, ()) for t in present)) if present else ()
+                for candidate in candidates:
+                    words = candidate.split()
+                    if len(words) < 2 or candidate in self._curated:
+                        continue
+                    if all(word in present for word in words):
+                        if best is None or len(words) > len(best.split()):
+                            best = candidate
+                code = self._entries[best] if best is not None else None
+        lookups.inc(result="hit" if code is not None else "miss")
+        return code
+
+    def add(self, topic: str, code: str) -> bool:
+        """Keep a validated diagram for the topic, returns False if it was rejected"""
+        key = topic_key(topic)
+        code = clean_mermaid(code) if code else None
+        if not key or code is None:
+            return False
+        with self._lock:
+            self._load()
+            if key in self._curated:
+                # curated templates are not overwritten
+                return False
+            self._learned[key] = code
+            self._learned.move_to_end(key)
+            self._put(key, code)
+            while len(self._learned) > self.max_learned:
+                oldest, _ = self._learned.popitem(last=False)
+                self._remove(oldest)
+            self._unsaved += 1
+            if not self._exit_hook:
+                self._exit_hook = True
+                atexit.register(self.save)
+            due = self._unsaved >= self.save_every
+        if due:
+            self.save()
+        return True
+
+    def save(self):
+        """Write the learned diagrams to disk if any were added, merged with other workers' saves"""
+        with self._lock:
+            if not self._unsaved:
+                return
+            self._unsaved = 0
+        with file_lock(self.path):
+            saved = self._read()
+            with self._lock:
+                self._merge(saved)
+                data = json.dumps({"diagrams": dict(self._learned)})
+            write_atomic(self.path, data, fsync=False)
+
+    def size(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self._entries)
+
+diagram_library = DiagramLibrary(Config.DIAGRAM_LIBRARY_PATH)